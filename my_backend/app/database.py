@@ -1,24 +1,53 @@
 from dotenv import load_dotenv
 import os
+import threading
 from pathlib import Path
-from supabase import create_client
 
 # Always load .env from correct location
 BASE_DIR = Path(__file__).resolve().parent.parent   # my_backend/
 ENV_PATH = BASE_DIR / ".env"
 
-print("🔍 Loading .env from:", ENV_PATH)
-
 load_dotenv(dotenv_path=ENV_PATH)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_supabase():
+    """
+    Shared Supabase client, created on first use instead of at import so
+    workers (and anything importing the app) start without a network client.
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            SUPABASE_URL = os.getenv("SUPABASE_URL")
+            SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+            if not SUPABASE_URL or not SUPABASE_KEY:
+                raise Exception(f"❌ Supabase env variables not loaded. Check .env file ({ENV_PATH}).")
+
+            # Imported here: the supabase package itself is slow to import
+            from supabase import create_client
+
+            print("🔍 Connecting to Supabase:", SUPABASE_URL)
+            _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _client
+
+
+def ping() -> None:
+    """One tiny PostgREST query; raises when the database cannot be reached."""
+    get_supabase().table("Clients").select("Client_id").limit(1).execute()
+
+
+class _LazyClient:
+    """Stands in for the client so `from app.database import supabase` stays lazy."""
 
-print("SUPABASE_URL =", SUPABASE_URL)
-print("SUPABASE_KEY =", SUPABASE_KEY[:6] + "..." if SUPABASE_KEY else None)
+    def __getattr__(self, name):
+        return getattr(get_supabase(), name)
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise Exception("❌ Supabase env variables not loaded. Check .env file.")
 
-# Create supabase client ONCE
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = _LazyClient()
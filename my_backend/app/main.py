@@ -1,36 +1,122 @@
-from fastapi import FastAPI
+import os
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import reports, purchase_orders, clients, stock_counts, stock_products, reserved_stock, scan, returns, dashboard, auth
-
-app = FastAPI()
-
-# ✅ CORS CONFIG
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173",
-        "https://localhost:5173",
-        "http://127.0.0.1:5173",
-        "http://localhost:5174",
-        "https://localhost:5174",
-        "http://127.0.0.1:5174",
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(reports.router)
-app.include_router(purchase_orders.router)
-app.include_router(clients.router)
-app.include_router(stock_counts.router)
-app.include_router(stock_products.router)
-app.include_router(reserved_stock.router)
-app.include_router(scan.router)
-app.include_router(returns.router)
-app.include_router(dashboard.router)
-app.include_router(auth.router)
-
-@app.get("/")
-def home():
-    return {"message": "Backend is running!"}
+
+# Warn when building the app takes longer than this (worker restarts / scale-out)
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+
+def create_app() -> FastAPI:
+    """
+    Build the FastAPI app. Routers and utils are imported here, not when this
+    module is imported, and no database client is created (the shared Supabase
+    client is constructed on first use, see app/database.py).
+
+    Run with `uvicorn app.main:create_app --factory`; `app.main:app` also
+    works and builds the app on first access.
+    """
+    build_started = time.perf_counter()
+
+    from app.database import ping
+    from app.utils.security import AUTH_REQUIRED, get_current_user
+    from app.utils import in_query, movement_log, batch_reconcile, lookup_cache, invalidation_bus, lanes, stock_events
+    from app.utils import report_jobs as report_job_runner
+    from app.routers import reports, purchase_orders, clients, stock_counts, stock_products, reserved_stock, scan, returns, dashboard, auth, report_jobs, events
+
+    app = FastAPI()
+
+    # ✅ CORS CONFIG
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[
+            "http://localhost:5173",
+            "https://localhost:5173",
+            "http://127.0.0.1:5173",
+            "http://localhost:5174",
+            "https://localhost:5174",
+            "http://127.0.0.1:5174",
+        ],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Every API router needs a valid bearer token unless AUTH_REQUIRED=false (security.py)
+    protected = [Depends(get_current_user)] if AUTH_REQUIRED else []
+
+    app.include_router(report_jobs.router, dependencies=protected)
+    app.include_router(reports.router, dependencies=protected)
+    app.include_router(purchase_orders.router, dependencies=protected)
+    app.include_router(clients.router, dependencies=protected)
+    app.include_router(stock_counts.router, dependencies=protected)
+    app.include_router(stock_products.router, dependencies=protected)
+    app.include_router(reserved_stock.router, dependencies=protected)
+    app.include_router(scan.router, dependencies=protected)
+    app.include_router(returns.router, dependencies=protected)
+    app.include_router(dashboard.router, dependencies=protected)
+    app.include_router(auth.router)
+    app.include_router(events.router)
+
+    @app.on_event("startup")
+    def start_background_jobs():
+        invalidation_bus.start()
+        batch_reconcile.start_schedule()
+
+    @app.on_event("shutdown")
+    def flush_movement_log():
+        movement_log.flush()
+
+    @app.get("/")
+    def home():
+        return {"message": "Backend is running!"}
+
+    @app.get("/ready")
+    def ready(warm: bool = False):
+        # Readiness probe: one tiny query; ?warm=true also bulk-loads the lookup caches first
+        try:
+            ping()
+            warmed = []
+            if warm:
+                lookup_cache.prefetch()
+                warmed = list(lookup_cache.LOOKUPS.keys())
+        except Exception as e:
+            print("Readiness Error:", e)
+            raise HTTPException(status_code=503, detail=str(e))
+        return {"ready": True, "warmed": warmed, "import_ms": getattr(app.state, "import_ms", None)}
+
+    @app.get("/metrics")
+    def metrics():
+        return {
+            "lanes": lanes.get_metrics(),
+            "report_jobs": report_job_runner.get_metrics(),
+            "in_query": in_query.get_metrics(),
+            "movement_log": movement_log.get_metrics(),
+            "batch_reconcile": batch_reconcile.get_metrics(),
+            "invalidation_bus": invalidation_bus.get_metrics(),
+            "stock_events": stock_events.get_metrics(),
+        }
+
+    app.state.import_ms = _module_import_ms + (time.perf_counter() - build_started) * 1000
+    if app.state.import_ms > IMPORT_BUDGET_MS:
+        print(f"⚠️ App import took {app.state.import_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    return app
+
+
+_app = None
+
+
+def __getattr__(name):
+    # `uvicorn app.main:app` keeps working, but importing this module stays cheap
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_module_import_ms = (time.perf_counter() - _import_started) * 1000
@@ -1,16 +1,100 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+import os
+from app.database import supabase
+from app.utils.security import (
+    ACCESS_TOKEN_TTL_SECONDS, hash_password, verify_password, create_access_token,
+    get_current_user, require_admin,
+)
+from app.utils import lanes
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=lanes.route_class("crud"))
+
+# Creates the first account on first login while app_users is empty
+ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
 class LoginRequest(BaseModel):
     email: str
     password: str
 
+class UserCreateSchema(BaseModel):
+    email: str
+    password: str
+    role: Optional[str] = "staff"
+
+def _find_user(email: str):
+    res = supabase.table("app_users") \
+        .select("user_id, email, password_hash, role, is_active") \
+        .eq("email", email.strip().lower()) \
+        .limit(1) \
+        .execute()
+    return res.data[0] if res.data else None
+
+def _bootstrap_admin(email: str, password_hash: str):
+    # Only while no account exists yet
+    existing = supabase.table("app_users").select("user_id").limit(1).execute()
+    if existing.data:
+        return None
+    res = supabase.table("app_users").insert({
+        "email": email.strip().lower(),
+        "password_hash": password_hash,
+        "role": "admin",
+    }).execute()
+    return res.data[0] if res.data else None
+
 @router.post("/login")
-def login(request: LoginRequest):
-    # Hardcoded Admin Check
-    if request.email == "admin@gmail.com" and request.password == "admin123":
-        return {"status": "success", "token": "admin-logged-in"}
-    else:
-        raise HTTPException(status_code=401, detail="Invalid admin credentials")
+async def login(request: LoginRequest):
+    # DB lookups and argon2 run in the threadpool, off the event loop
+    user = await run_in_threadpool(_find_user, request.email)
+
+    if user is None and ADMIN_EMAIL and ADMIN_PASSWORD \
+            and request.email.strip().lower() == ADMIN_EMAIL.lower() and request.password == ADMIN_PASSWORD:
+        password_hash = await run_in_threadpool(hash_password, request.password)
+        user = await run_in_threadpool(_bootstrap_admin, request.email, password_hash)
+
+    # Unknown emails are checked against a dummy hash, so timing does not reveal accounts
+    valid = await run_in_threadpool(verify_password, user["password_hash"] if user else None, request.password)
+    if not user or not user.get("is_active", True) or not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    await run_in_threadpool(
+        lambda: supabase.table("app_users").update({"last_login_at": datetime.now().isoformat()}).eq("user_id", user["user_id"]).execute()
+    )
+
+    return {
+        "status": "success",
+        "token": create_access_token(user),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL_SECONDS,
+        "role": user.get("role"),
+    }
+
+@router.get("/me")
+def get_me(user: dict = Depends(get_current_user)):
+    return {"user_id": int(user["sub"]), "email": user.get("email"), "role": user.get("role")}
+
+@router.post("/users")
+async def create_user(payload: UserCreateSchema, admin: dict = Depends(require_admin)):
+    try:
+        if await run_in_threadpool(_find_user, payload.email):
+            raise HTTPException(status_code=400, detail="User already exists")
+
+        password_hash = await run_in_threadpool(hash_password, payload.password)
+        res = await run_in_threadpool(
+            lambda: supabase.table("app_users").insert({
+                "email": payload.email.strip().lower(),
+                "password_hash": password_hash,
+                "role": payload.role or "staff",
+            }).execute()
+        )
+        created = res.data[0]
+        return {"success": True, "user_id": created["user_id"], "email": created["email"], "role": created["role"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Create User Error:", e)
+        raise HTTPException(status_code=500, detail=str(e))
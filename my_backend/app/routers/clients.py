@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query
 from typing import List, Optional
 from pydantic import BaseModel
 from app.database import supabase
+from app.utils import lookup_cache, data_version, lanes, etag
+from app.utils.rpc import call_rpc
 
-router = APIRouter(prefix="/clients", tags=["Clients"])
+router = APIRouter(prefix="/clients", tags=["Clients"], route_class=lanes.route_class("crud"))
 
 # --- Pydantic Models ---
 
@@ -21,7 +23,7 @@ class ClientSchema(BaseModel):
 
 # --- Endpoints ---
 
-@router.get("/")
+@router.get("/", dependencies=[etag.versioned("Clients")])
 def list_clients():
     try:
         response = supabase.table("Clients").select("*").order("Client_id", desc=False).execute()
@@ -29,6 +31,37 @@ def list_clients():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/search")
+def search_clients(
+    q: str = "",
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    try:
+        # Name / email / contact / VAT match backed by trigram indexes (sql/006_client_search.sql)
+        return call_rpc("search_clients", {"p_query": q, "p_limit": limit, "p_offset": offset}) or []
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{client_id}/summary", dependencies=[etag.versioned("Clients", "Stock_movement")])
+def get_client_summary(client_id: int):
+    try:
+        # Single-row read of the aggregates kept by sql/007_client_activity.sql
+        res = supabase.table("client_activity").select("*").eq("client_id", client_id).limit(1).execute()
+        row = res.data[0] if res.data else {}
+        return {
+            "clientId": client_id,
+            "piecesOut": row.get("pieces_out", 0),
+            "piecesSold": row.get("pieces_sold", 0),
+            "piecesReturned": row.get("pieces_returned", 0),
+            "openDeliveryOrders": row.get("open_delivery_orders", 0),
+            "lastActivityDate": row.get("last_activity_date"),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/")
 def create_client(payload: ClientSchema):
     try:
@@ -37,6 +70,8 @@ def create_client(payload: ClientSchema):
         response = supabase.table("Clients").insert(data).execute()
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create client")
+        lookup_cache.invalidate("clients")
+        data_version.bump("Clients")
         return {"success": True, "data": response.data[0]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -50,6 +85,8 @@ def update_client(client_id: int, payload: ClientSchema):
              # Could mean not found or update returned nothing
              # We can check if it exists first or just assume success if no error
              pass
+        lookup_cache.invalidate("clients")
+        data_version.bump("Clients")
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -58,6 +95,8 @@ def update_client(client_id: int, payload: ClientSchema):
 def delete_client(client_id: int):
     try:
         supabase.table("Clients").delete().eq("Client_id", client_id).execute()
+        lookup_cache.invalidate("clients")
+        data_version.bump("Clients")
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
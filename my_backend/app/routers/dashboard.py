@@ -1,32 +1,35 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Optional, Dict, Any
 from app.database import supabase
+from app.utils.in_query import select_in
+from app.utils.batch_facts import get_batch_facts
+from app.utils import movement_archive, lanes, etag, data_version
+from app.utils.cache import AggregateCache
 from datetime import datetime, timedelta
 
-router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"], route_class=lanes.route_class("dashboard"))
 
-@router.get("/")
+_TABLES = ("Stock_batches", "Purchase_order_items", "Stock_movement", "Products")
+
+# Open dashboards all reload after the same stock event; the first request
+# computes, concurrent ones for the same data versions share its result
+_dashboard_cache = AggregateCache(ttl_seconds=15)
+
+
+@router.get("/", dependencies=[etag.versioned(*_TABLES)])
 def get_dashboard_data():
+    return _dashboard_cache.get_or_compute(data_version.current(*_TABLES), _compute_dashboard)
+
+
+def _compute_dashboard():
     try:
-        # 1. Fetch arrived PO item IDs
-        arrived_items_res = supabase.table("Purchase_order_items").select("Po_item_id").eq("Arrival_status", "Arrived").execute()
-        arrived_ids = [it["Po_item_id"] for it in arrived_items_res.data or []]
-        
-        batches = []
-        if arrived_ids:
-            # 2. Fetch Stock Batches for arrived items
-            b_res = supabase.table("Stock_batches").select("Batch_quantity, Available, Sold, Returned, Po_item_id").in_("Po_item_id", arrived_ids).execute()
-            batches = b_res.data or []
+        # 1. Arrived batches with category (shared, memoized loader)
+        facts = get_batch_facts()
         
-        total_stock = sum(b["Batch_quantity"] for b in batches)
-        available_stock = sum(b.get("Available", 0) for b in batches)
-        sold_stock = sum(b.get("Sold", 0) for b in batches)
-        returned_stock = sum(b.get("Returned", 0) for b in batches)
-        # 2. Fetch Categories for Pie Chart & Stats
-        # We need to map Po_item_id -> Category
-        p_res = supabase.table("Purchase_order_items").select("Po_item_id, Category").execute()
-        po_items = p_res.data or []
-        po_map = {p["Po_item_id"]: p["Category"] for p in po_items}
+        total_stock = sum(facts["batch_quantity"])
+        available_stock = sum(facts["available"])
+        sold_stock = sum(facts["sold"])
+        returned_stock = sum(facts["returned"])
         
         # Thresholds configuration
         THRESHOLDS = {
@@ -40,9 +43,11 @@ def get_dashboard_data():
         # Format: { "Category": { total, available, sold, returned, lowBatches } }
         
         low_stock_count = 0
-        for b in batches:
-            pid = b.get("Po_item_id")
-            cat = po_map.get(pid, "Unknown")
+        for cat, qty, available, sold, returned in zip(
+            facts["category"], facts["batch_quantity"], facts["available"],
+            facts["sold"], facts["returned"],
+        ):
+            cat = cat or "Unknown"
             
             if cat not in category_stats:
                 category_stats[cat] = {
@@ -50,12 +55,11 @@ def get_dashboard_data():
                 }
             
             s = category_stats[cat]
-            available = b.get("Available", 0)
             
-            s["total"] += b["Batch_quantity"]
+            s["total"] += qty
             s["available"] += available
-            s["sold"] += b.get("Sold", 0)
-            s["returned"] += b.get("Returned", 0)
+            s["sold"] += sold
+            s["returned"] += returned
             
             # Category-specific threshold
             threshold = THRESHOLDS.get(cat, DEFAULT_THRESHOLD)
@@ -65,8 +69,12 @@ def get_dashboard_data():
 
         # 3. Monthly Sales (Grouped Bar Chart)
         # We need "Sold" movements joined (manually) with Products to get Category AND current Status
-        m_res = supabase.table("Stock_movement").select("Scan_date, Stock_id").eq("Movement_type", "Sold").execute()
-        movements = m_res.data or []
+        # Only the hot months are scanned; archived months come from their summary rows
+        m_query = supabase.table("Stock_movement").select("Scan_date, Stock_id").eq("Movement_type", "Sold")
+        hot_from = movement_archive.hot_start()
+        if hot_from:
+            m_query = m_query.gte("Scan_date", hot_from)
+        movements = m_query.execute().data or []
         
         # Unique Stock IDs to fetch categories and current status
         sold_stock_ids = list(set([m["Stock_id"] for m in movements if m.get("Stock_id")]))
@@ -74,8 +82,8 @@ def get_dashboard_data():
         product_info_map = {} # { stock_id: { category, status } }
         if sold_stock_ids:
             # We fetch both Category (for grouping) and Status (to exclude returned items)
-            p_res = supabase.table("Products").select("Stock_id, Category, Status").in_("Stock_id", sold_stock_ids).execute()
-            product_info_map = {p["Stock_id"]: {"category": p["Category"], "status": p["Status"]} for p in p_res.data or []}
+            prods = select_in(lambda: supabase.table("Products").select("Stock_id, Category, Status"), "Stock_id", sold_stock_ids)
+            product_info_map = {p["Stock_id"]: {"category": p["Category"], "status": p["Status"]} for p in prods}
 
         # Filter movements: "consider only current sold status"
         # If an item was sold but is now back in "Available" or "Returned" status, don't count it as a sale.
@@ -89,29 +97,37 @@ def get_dashboard_data():
         
         # Use valid_movements for all subsequent sold-related calculations
         month_map = {} # { "MMM YYYY": { "granite": 0, "quartz": 0, "monuments": 0 } }
+        
+        def add_sales(date_str, cat, count):
+            dt = datetime.strptime(date_str[:10], "%Y-%m-%d")
+            month_key = dt.strftime("%b %Y")
+            
+            if month_key not in month_map:
+                month_map[month_key] = {"granite": 0, "quartz": 0, "monuments": 0, "others": 0}
+            
+            # Standardize category name for matching
+            cat_lower = (cat or "").lower()
+            if "granite" in cat_lower: cat_key = "granite"
+            elif "quartz" in cat_lower or "quart" in cat_lower: cat_key = "quartz"
+            elif "monument" in cat_lower: cat_key = "monuments"
+            else: cat_key = "others"
+            
+            month_map[month_key][cat_key] += count
+        
         for m in valid_movements:
             date_str = m.get("Scan_date")
             sid = m.get("Stock_id")
             if not date_str: continue
             
             try:
-                dt = datetime.strptime(date_str, "%Y-%m-%d")
-                month_key = dt.strftime("%b %Y")
-                cat = product_info_map.get(sid, {}).get("category", "others")
-                
-                if month_key not in month_map:
-                    month_map[month_key] = {"granite": 0, "quartz": 0, "monuments": 0, "others": 0}
-                
-                # Standardize category name for matching
-                cat_lower = (cat or "").lower()
-                if "granite" in cat_lower: cat_key = "granite"
-                elif "quartz" in cat_lower or "quart" in cat_lower: cat_key = "quartz"
-                elif "monument" in cat_lower: cat_key = "monuments"
-                else: cat_key = "others"
-                
-                month_map[month_key][cat_key] += 1
+                add_sales(date_str, product_info_map.get(sid, {}).get("category", "others"), 1)
             except:
                 pass
+        
+        # Archived months: sales whose product is still Sold ("standing")
+        for row in movement_archive.monthly_summary("Sold"):
+            if row["standing"]:
+                add_sales(row["month"], row["category"], row["standing"])
                 
         sorted_month_keys = sorted(month_map.keys(), key=lambda x: datetime.strptime(x, "%b %Y"))
         monthly_sales = []
@@ -141,7 +157,11 @@ def get_dashboard_data():
             except: pass
             
         # Returns This Month still counts all return movements in the current month
-        r_mov_res = supabase.table("Stock_movement").select("Movement_type, Scan_date").ilike("Movement_type", "%Return%").execute()
+        r_mov_res = supabase.table("Stock_movement") \
+            .select("Movement_type, Scan_date") \
+            .ilike("Movement_type", "%Return%") \
+            .gte("Scan_date", start_of_month.date().isoformat()) \
+            .execute()
         r_movements = r_mov_res.data or []
         
         for m in r_movements:
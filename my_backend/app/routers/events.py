@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from app.utils import stock_events
+from app.utils.security import AUTH_REQUIRED, STREAM_TICKET_TTL_SECONDS, create_stream_ticket, get_current_user, verify_stream_ticket
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# Comment line sent when idle so proxies keep the stream open
+HEARTBEAT_SECONDS = 15
+
+_bearer = HTTPBearer(auto_error=False)
+
+def _stream_auth(ticket: Optional[str] = Query(None)):
+    # EventSource cannot send headers, so a short-lived ticket comes as ?ticket=
+    if not AUTH_REQUIRED:
+        return
+    if not ticket:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    verify_stream_ticket(ticket)
+
+@router.post("/ticket")
+def create_ticket(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)):
+    # Exchange the login token (sent as a header, so never logged) for a stream ticket
+    if credentials is None and not AUTH_REQUIRED:
+        return {"ticket": None, "expires_in": None}
+    claims = get_current_user(credentials)
+    return {"ticket": create_stream_ticket(claims), "expires_in": STREAM_TICKET_TTL_SECONDS}
+
+@router.get("/stock", dependencies=[Depends(_stream_auth)])
+async def stream_stock_events(request: Request, categories: Optional[str] = None):
+    # Server-sent events for mark-out / sale / return / undo, optionally per category
+    wanted = [c.strip() for c in categories.split(",") if c.strip()] if categories else None
+    sub = stock_events.subscribe(wanted)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            stock_events.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
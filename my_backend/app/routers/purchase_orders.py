@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Header, Query
 from typing import List, Optional, Any, Dict
 from pydantic import BaseModel
 from datetime import datetime, date
 from app.database import supabase
+from app.utils.in_query import select_in
+from app.utils.rpc import call_rpc
+from app.utils.cache import AggregateCache
+from app.utils import lookup_cache, data_version, idempotency, lanes, etag, like
 import math
 
-router = APIRouter(prefix="/purchase_orders", tags=["Purchase Orders"])
+router = APIRouter(prefix="/purchase_orders", tags=["Purchase Orders"], route_class=lanes.route_class("crud"))
+
+# PO overview tiles; TTL is only a safety net for writes made outside this API
+_po_stats_cache = AggregateCache(ttl_seconds=300, name="po_stats")
 
 # --- Pydantic Models ---
 
@@ -65,12 +72,50 @@ def get_payment_status(paid: float, total: float) -> str:
         return "Full Paid"
     return "Unpaid"  # Should typically be Covered by Logic above
 
+def _vendor_name_key(name: str) -> str:
+    # Same normalisation as vendor_name_key() in sql/008_vendor_name_key.sql
+    return " ".join((name or "").split()).lower()
+
+def _charges_payload(po_details: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"charge_type": "Ocean Freight", "amount": po_details.get("Ocean_freight") or 0},
+        {"charge_type": "Insurance", "amount": po_details.get("Insurance") or 0},
+        {"charge_type": "Fumigation", "amount": po_details.get("Fumigation") or 0},
+        {"charge_type": "Clearance", "amount": po_details.get("Clearance") or 0},
+    ]
+
+def _items_payload(items: List[ItemSchema]) -> List[Dict[str, Any]]:
+    return [{
+        "Po_item_id": it.Po_item_id,
+        "Item_name": it.Item_name,
+        "Category": it.Category,
+        "Quantity_ordered": it.Quantity_ordered,
+        "Unit_price": it.Unit_price,
+        "Total_price": it.Total_price,
+        "Height": it.Height,
+        "Width": it.Width,
+        "Thickness": it.Thickness,
+        "sqmt": it.Sqmt or it.sqmt,
+        "Colour": it.Colour,
+        "Arrival_status": it.Arrival_status,
+    } for it in items]
+
+def _po_header_payload(po_details: Dict[str, Any], invoice_no: Optional[str]) -> Dict[str, Any]:
+    return {
+        "Po_invoice_no": invoice_no,
+        "Po_date": po_details.get("Po_date"),
+        "Notes": po_details.get("Notes"),
+        "currency": po_details.get("currency"),
+        "Total_sqmt": po_details.get("Total_sqmt"),
+        "Landing_cost": po_details.get("Landing_cost"),
+    }
+
 # --- Endpoints ---
 
-@router.get("/list")
+@router.get("/list", dependencies=[etag.versioned("Purchase_orders", "Purchase_order_items", "Payments", "Vendors")])
 def list_purchase_orders(category: Optional[str] = None):
     # Fetch POs with nested relations
-    query = supabase.table("Purchase_orders").select("*, Vendor:Vendors(*), Items:Purchase_order_items(*), Payments:Payments(*), Charges:purchase_order_charges(*)")
+    query = supabase.table("Purchase_orders").select("*, Vendor:Vendors(*), Items:Purchase_order_items(*), Payments:Payments(*), Charges:purchase_order_charges(*), Ledger:po_ledger(items_total, paid_amount)")
     
     response = query.order("Created_at", desc=True).execute()
     data = response.data
@@ -81,9 +126,12 @@ def list_purchase_orders(category: Optional[str] = None):
         payments = row.get("Payments", [])
         charges = row.get("Charges", [])
         
-        # Calculate totals
-        total_amount = sum((float(it.get("Total_price") or 0)) for it in items)
-        paid_amount = sum((float(p.get("Amount") or 0)) for p in payments)
+        # Totals come from the maintained ledger (sql/002_po_ledger.sql)
+        ledger = row.get("Ledger") or {}
+        if isinstance(ledger, list):
+            ledger = ledger[0] if ledger else {}
+        total_amount = float(ledger.get("items_total") or 0)
+        paid_amount = float(ledger.get("paid_amount") or 0)
         
         # Filter if category provided
         if category:
@@ -119,192 +167,104 @@ def list_purchase_orders(category: Optional[str] = None):
         
     return normalized
 
-@router.get("/stats")
+def _compute_po_stats() -> Dict[str, Dict[str, int]]:
+    # Only the item columns are needed; POs without items never counted anyway
+    items = supabase.table("Purchase_order_items").select("Po_id, Category, Arrival_status").execute().data or []
+    
+    categories = ["granite", "quartz", "monuments"]
+    stats = {cat: {"total": 0, "pending": 0, "completed": 0} for cat in categories}
+    
+    # (category, Po_id) -> all items of that category in that order arrived?
+    order_cat_done: Dict[tuple, bool] = {}
+    for it in items:
+        cat = (it.get("Category") or "").lower()
+        if cat not in stats:
+            continue
+        key = (cat, it.get("Po_id"))
+        arrived = it.get("Arrival_status") == "Arrived"
+        order_cat_done[key] = order_cat_done.get(key, True) and arrived
+    
+    for (cat, _po_id), is_completed in order_cat_done.items():
+        # If this order contains items of this category, it counts towards Total
+        stats[cat]["total"] += 1
+        if is_completed:
+            stats[cat]["completed"] += 1
+        else:
+            stats[cat]["pending"] += 1
+    
+    return stats
+
+@router.get("/stats", dependencies=[etag.versioned("Purchase_orders", "Purchase_order_items", "Payments", "Vendors")])
 def get_po_stats():
     try:
-        # Fetch all POs with their items
-        res = supabase.table("Purchase_orders").select("Po_id, Items:Purchase_order_items(Category, Arrival_status)").execute()
-        orders = res.data or []
-        
-        categories = ["granite", "quartz", "monuments"]
-        stats = {cat: {"total": 0, "pending": 0, "completed": 0} for cat in categories}
-        
-        for order in orders:
-            items = order.get("Items", [])
-            # Categorize items in this order
-            order_cats = set((it.get("Category") or "").lower() for it in items)
-            
-            for cat in categories:
-                cat_items = [it for it in items if (it.get("Category") or "").lower() == cat]
-                if not cat_items:
-                    continue
-                
-                # If this order contains items of this category, it counts towards Total
-                stats[cat]["total"] += 1
-                
-                # Check status specifically for items in this category within this order
-                is_completed = all(it.get("Arrival_status") == "Arrived" for it in cat_items)
-                
-                if is_completed:
-                    stats[cat]["completed"] += 1
-                else:
-                    stats[cat]["pending"] += 1
-                    
-        return stats
+        # Served from cache; invalidated by create / update / mark_arrived
+        return _po_stats_cache.get_or_compute("stats", _compute_po_stats)
     except Exception as e:
         print("PO Stats Error:", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/vendors")
+def search_vendors(q: str = "", limit: int = Query(10, ge=1, le=50)):
+    try:
+        # Prefix match on the normalised name key (prefix index, sql/008_vendor_name_key.sql)
+        key = _vendor_name_key(q)
+        query = supabase.table("Vendors").select("*")
+        if key:
+            query = query.like("name_key", like.escape(key) + "%")
+        rows = query.order("name_key").limit(limit).execute().data or []
+        if "*" in key:
+            # "*" only matched as a single-character wildcard
+            rows = [r for r in rows if (r.get("name_key") or "").startswith(key)]
+        return rows
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/")
-def create_purchase_order(payload: OrderCreateSchema):
+def create_purchase_order(payload: OrderCreateSchema, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
     try:
         print("PO currency received:", payload.poDetails.get("currency")) 
-        # 1. Vendor
-        vendor_name = payload.vendor.Vendor_name.strip()
-        vendor_id = None
-        
-        if vendor_name:
-            # Check existing
-            v_res = supabase.table("Vendors").select("*").ilike("Vendor_name", vendor_name).limit(1).execute()
-            if v_res.data:
-                vendor_id = v_res.data[0]["Vendor_id"]
-            else:
-                # Create new
-                new_v = supabase.table("Vendors").insert({
-                    "Vendor_name": vendor_name,
-                    "Address_line": payload.vendor.Address_line or "",
-                    "Address_location": payload.vendor.Address_location or "",
-                    "Address_city": payload.vendor.Address_city or "",
-                    "Address_state": payload.vendor.Address_state or "",
-                    "Postal_code": payload.vendor.Postal_code or "",
-                    "Country": payload.vendor.Country or "",
-                    "Vat_number": payload.vendor.Vat_number or ""
-                }).execute()
-                if new_v.data:
-                    vendor_id = new_v.data[0]["Vendor_id"]
-        
-        if not vendor_id:
+        if not payload.vendor.Vendor_name.strip():
             raise HTTPException(status_code=400, detail="Vendor ID could not be determined")
-            
-        # 2. Purchase Order (Check existing or Create new)
+
+        # Known vendors resolve by their unique name key (one indexed lookup, then cached)
+        vendor = payload.vendor.model_dump()
+        name_key = _vendor_name_key(vendor["Vendor_name"])
+        known_vendor = lookup_cache.get_many("vendor_keys", [name_key]).get(name_key)
+        if known_vendor:
+            vendor["Vendor_id"] = known_vendor["Vendor_id"]
+
         invoice_no = payload.poDetails.get("Po_invoice_no")
         if not invoice_no:
             invoice_no = f"INV-{int(datetime.now().timestamp()*1000)}"
-        
-        # Check for existing
-        existing_po = supabase.table("Purchase_orders").select("Po_id").eq("Po_invoice_no", invoice_no).execute()
-        
-        if existing_po.data:
-            # Idempotent behavior: Use existing PO
-            po_id = existing_po.data[0]["Po_id"]
-            print(f"PO {invoice_no} already exists (ID: {po_id}). Syncing updates/items.")
-            
-            # Optionally update PO header details (like date, notes, etc. if they changed)
-            po_update_data = {
-                "Po_date": payload.poDetails.get("Po_date"),
-                "Notes": payload.poDetails.get("Notes"),
-                "currency": payload.poDetails.get("currency", "INR"),
-                "Total_sqmt": payload.poDetails.get("Total_sqmt"),
-                "Landing_cost": payload.poDetails.get("Landing_cost"),
-            }
-            supabase.table("Purchase_orders").update(po_update_data).eq("Po_id", po_id).execute()
-        else:
-            # Create new
-            po_data = {
-                "Po_invoice_no": invoice_no,
-                "Po_date": payload.poDetails.get("Po_date"),
-                "Notes": payload.poDetails.get("Notes"),
-                "Vendor_id": vendor_id,
-                "currency": payload.poDetails.get("currency", "INR"),
-                "Total_sqmt": payload.poDetails.get("Total_sqmt"),
-                "Landing_cost": payload.poDetails.get("Landing_cost"),
-            }
-            po_res = supabase.table("Purchase_orders").insert(po_data).execute()
-            if not po_res.data:
-                 print("PO Insert Error Detail:", po_res)
-                 raise HTTPException(status_code=500, detail="Failed to create Purchase Order - likely database constraint or connection issue.")
-            po_id = po_res.data[0]["Po_id"]
 
-        # 2b. Charges (Sync: Delete existing and re-insert)
-        supabase.table("purchase_order_charges").delete().eq("po_id", po_id).execute()
-        
-        currency = payload.poDetails.get("currency", "INR")
-        charges_data = [
-            {"po_id": po_id, "charge_type": "Ocean Freight", "amount": payload.poDetails.get("Ocean_freight") or 0, "currency": currency},
-            {"po_id": po_id, "charge_type": "Insurance", "amount": payload.poDetails.get("Insurance") or 0, "currency": currency},
-            {"po_id": po_id, "charge_type": "Fumigation", "amount": payload.poDetails.get("Fumigation") or 0, "currency": currency},
-            {"po_id": po_id, "charge_type": "Clearance", "amount": payload.poDetails.get("Clearance") or 0, "currency": currency},
-        ]
-        supabase.table("purchase_order_charges").insert(charges_data).execute()
-        
-        # 3. Items (Sync: Delete and re-insert if no batches created)
-        existing_items = supabase.table("Purchase_order_items").select("Batch_created").eq("Po_id", po_id).execute()
-        can_clean_items = not any(it.get("Batch_created") for it in existing_items.data)
-        
-        if can_clean_items:
-            supabase.table("Purchase_order_items").delete().eq("Po_id", po_id).execute()
-            
-            items_to_insert = []
-            for it in payload.items:
-                items_to_insert.append({
-                    "Po_id": po_id,
-                    "Item_name": it.Item_name,
-                    "Category": it.Category,
-                    "Quantity_ordered": it.Quantity_ordered,
-                    "Unit_price": it.Unit_price,
-                    "Total_price": it.Total_price,
-                    "Height": it.Height,
-                    "Width": it.Width,
-                    "Thickness": it.Thickness,
-                    "sqmt": it.Sqmt or (it.sqmt if hasattr(it, 'sqmt') else None),
-                    "Colour": it.Colour,
-                    "Arrival_status": "ordered",
-                    "Batch_created": False,
-                    "Batch_code": None,
-                    "Edit_count": 0,
-                    "currency": payload.poDetails.get("currency")
-                })
-                
-            if items_to_insert:
-                supabase.table("Purchase_order_items").insert(items_to_insert).execute()
-        
-        # 4. Payment (Prevent duplicates on retry)
-        paid_val = 0
-        items_total = sum(float(x.Total_price or 0) for x in payload.items)
-        charges_total = sum(float(x["amount"]) for x in charges_data)
-        grand_total = items_total + charges_total
-        
+        payment = None
         if payload.payment and payload.payment.paidAmount > 0:
-            paid_val = payload.payment.paidAmount
-            # Check for existing identical payment
-            existing_pmt = supabase.table("Payments") \
-                .select("*") \
-                .eq("Po_id", po_id) \
-                .eq("Amount", paid_val) \
-                .eq("Payment_date", payload.payment.paidDate) \
-                .execute()
-            
-            if not existing_pmt.data:
-                supabase.table("Payments").insert({
-                    "Po_id": po_id,
-                    "Amount": paid_val,
-                    "Payment_date": payload.payment.paidDate,
-                    "Notes": payload.payment.notes,
-                    "currency": payload.payment.currency or payload.poDetails.get("currency", "INR")
-                }).execute()
-            else:
-                print("Payment already exists, skipping insert.")
-            
-        # Re-calculate paid_amount (since there might be other payments)
-        all_pmts = supabase.table("Payments").select("Amount").eq("Po_id", po_id).execute()
-        total_paid_so_far = sum(float(p["Amount"] or 0) for p in all_pmts.data)
-            
-        # Update Status
-        status = get_payment_status(total_paid_so_far, grand_total)
-        supabase.table("Purchase_orders").update({"Status": status}).eq("Po_id", po_id).execute()
-        
-        return {"success": True, "Po_id": po_id}
-        
+            payment = {
+                "Amount": payload.payment.paidAmount,
+                "Payment_date": payload.payment.paidDate,
+                "Notes": payload.payment.notes,
+                "currency": payload.payment.currency,
+            }
+
+        # Vendor, PO, charges, items, payment and status in one transaction (sql/001_po_upsert.sql)
+        result = call_rpc("po_upsert", {
+            "p_po_id": None,
+            "p_vendor": vendor,
+            "p_po": _po_header_payload(payload.poDetails, invoice_no),
+            "p_charges": _charges_payload(payload.poDetails),
+            "p_items": _items_payload(payload.items),
+            "p_payment": payment,
+            "p_idempotency_key": idempotency_key,
+        })
+
+        _po_stats_cache.invalidate()
+        if not known_vendor:
+            lookup_cache.invalidate("vendor_keys")
+        data_version.bump("Purchase_orders", "Purchase_order_items", "Payments", "Vendors")
+        return {"success": True, "Po_id": result["Po_id"]}
+        
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print("Create PO Error:", e)
@@ -312,121 +272,27 @@ def create_purchase_order(payload: OrderCreateSchema):
         raise HTTPException(status_code=500, detail=f"Server application error: {str(e)}")
 
 @router.put("/{po_id}")
-def update_purchase_order(po_id: int, payload: OrderUpdateSchema):
+def update_purchase_order(po_id: int, payload: OrderUpdateSchema, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
     try:
-        # 1. Get existing order
-        existing = supabase.table("Purchase_orders").select("*, Vendors(*), Items:Purchase_order_items(*)").eq("Po_id", po_id).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Order not found")
-        
-        ord_data = existing.data[0]
-        existing_payments = supabase.table("Payments") \
-            .select("Payment_id") \
-            .eq("Po_id", po_id) \
-            .execute()
-
-        if existing_payments.data and payload.poDetails.get("currency"):
-            # Simple check, if currency is different
-            if payload.poDetails.get("currency") != ord_data.get("currency"):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Cannot change currency after payments exist"
-                )
-
-        # 2. Update Vendor
-        vendor_id = ord_data.get("Vendor_id")
-        if vendor_id and payload.vendor:
-            supabase.table("Vendors").update({
-                "Vendor_name": payload.vendor.Vendor_name,
-                "Address_line": payload.vendor.Address_line,
-                "Address_location": payload.vendor.Address_location,
-                "Address_city": payload.vendor.Address_city,
-                "Address_state": payload.vendor.Address_state,
-                "Postal_code": payload.vendor.Postal_code,
-                "Country": payload.vendor.Country,
-                "Vat_number": payload.vendor.Vat_number
-            }).eq("Vendor_id", vendor_id).execute()
-            
-        # 3. Update PO Details (Primary totals and basic info)
-        supabase.table("Purchase_orders").update({
-            "Po_invoice_no": payload.poDetails.get("Po_invoice_no"),
-            "Po_date": payload.poDetails.get("Po_date"),
-            "Notes": payload.poDetails.get("Notes"),
-            "Total_sqmt": payload.poDetails.get("Total_sqmt"),
-            "Landing_cost": payload.poDetails.get("Landing_cost"),
-        }).eq("Po_id", po_id).execute()
-
-        # 3b. Sync Charges
-        supabase.table("purchase_order_charges").delete().eq("po_id", po_id).execute()
-        
-        currency = ord_data.get("currency", "INR")
-        charges_data = [
-            {"po_id": po_id, "charge_type": "Ocean Freight", "amount": payload.poDetails.get("Ocean_freight") or 0, "currency": currency},
-            {"po_id": po_id, "charge_type": "Insurance", "amount": payload.poDetails.get("Insurance") or 0, "currency": currency},
-            {"po_id": po_id, "charge_type": "Fumigation", "amount": payload.poDetails.get("Fumigation") or 0, "currency": currency},
-            {"po_id": po_id, "charge_type": "Clearance", "amount": payload.poDetails.get("Clearance") or 0, "currency": currency},
-        ]
-        supabase.table("purchase_order_charges").insert(charges_data).execute()
-        
-        # 4. Sync Items
-        existing_items = ord_data.get("Items", [])
-        existing_map = {item["Po_item_id"]: item for item in existing_items}
-        
-        incoming_ids = [it.Po_item_id for it in payload.items if it.Po_item_id]
-        
-        # Delete removed
-        for ex_id, ex_item in existing_map.items():
-            if ex_id not in incoming_ids:
-                if ex_item.get("Batch_created"):
-                    raise HTTPException(status_code=400, detail=f"Cannot delete item {ex_item.get('Item_name')} because batch created.")
-                supabase.table("Purchase_order_items").delete().eq("Po_item_id", ex_id).execute()
-                
-        # Upsert
-        for it in payload.items:
-            if it.Po_item_id:
-                # Update
-                ex_item = existing_map.get(it.Po_item_id)
-                if not ex_item: continue
-                
-                edit_count = ex_item.get("Edit_count", 0) + 1 if ex_item.get("Batch_created") else 0
-                
-                supabase.table("Purchase_order_items").update({
-                    "Item_name": it.Item_name,
-                    "Quantity_ordered": it.Quantity_ordered,
-                    "Unit_price": it.Unit_price,
-                    "Total_price": it.Total_price,
-                    "Colour": it.Colour,
-                    "Height": it.Height,
-                    "Width": it.Width,
-                    "Thickness": it.Thickness,
-                    "sqmt": it.Sqmt or (it.sqmt if hasattr(it, 'sqmt') else None),
-                    "Arrival_status": it.Arrival_status,
-                    "Edit_count": edit_count,
-                    "currency": ord_data.get("currency", "INR")
-                }).eq("Po_item_id", it.Po_item_id).execute()
-            else:
-                # Insert
-                supabase.table("Purchase_order_items").insert({
-                    "Po_id": po_id,
-                    "Item_name": it.Item_name,
-                    "Category": it.Category,
-                    "Quantity_ordered": it.Quantity_ordered,
-                    "Unit_price": it.Unit_price,
-                    "Total_price": it.Total_price,
-                    "Height": it.Height,
-                    "Width": it.Width,
-                    "Thickness": it.Thickness,
-                    "sqmt": it.Sqmt or it.sqmt if hasattr(it, 'sqmt') else it.Sqmt,
-                    "Colour": it.Colour,
-                    "Arrival_status": "ordered",
-                    "Batch_created": False,
-                    "Batch_code": None,
-                    "Edit_count": 0,
-                    "currency": ord_data.get("currency", "INR")
-                }).execute()
+        # Vendor, PO header, charges and bulk item upsert in one transaction (sql/001_po_upsert.sql)
+        call_rpc("po_upsert", {
+            "p_po_id": po_id,
+            "p_vendor": payload.vendor.model_dump() if payload.vendor else None,
+            "p_po": _po_header_payload(payload.poDetails, payload.poDetails.get("Po_invoice_no")),
+            "p_charges": _charges_payload(payload.poDetails),
+            "p_items": _items_payload(payload.items),
+            "p_payment": None,
+            "p_idempotency_key": idempotency_key,
+        })
+        _po_stats_cache.invalidate()
+        if payload.vendor:
+            lookup_cache.invalidate("vendor_keys")
+        data_version.bump("Purchase_orders", "Purchase_order_items", "Vendors")
                 
         return {"success": True}
         
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print("Update PO Error:", e)
@@ -434,33 +300,43 @@ def update_purchase_order(po_id: int, payload: OrderUpdateSchema):
         raise HTTPException(status_code=500, detail=f"Update failed: {str(e)}")
 
 @router.post("/{po_id}/payments")
-def add_payment(po_id: int, payload: PaymentSchema):
+def add_payment(po_id: int, payload: PaymentSchema, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    return idempotency.run(
+        idempotency_key, "po.add_payment", {"po_id": po_id, **payload.model_dump()},
+        # A key is claimed in the shared store (sql/014), so the amount + date guess is not needed
+        lambda: _add_payment(po_id, payload, check_duplicate=not idempotency_key),
+    )
+
+def _add_payment(po_id: int, payload: PaymentSchema, check_duplicate: bool = True):
     try:
-        # Check totals
-        po_res = supabase.table("Purchase_orders").select("*, Items:Purchase_order_items(Total_price), Payments(Amount)").eq("Po_id", po_id).single().execute()
+        # Check totals against the maintained ledger
+        po_res = supabase.table("Purchase_orders").select("currency, Ledger:po_ledger(items_total, paid_amount)").eq("Po_id", po_id).single().execute()
         if not po_res.data:
             raise HTTPException(status_code=404, detail="Order not found")
         
         order = po_res.data
-        items = order.get("Items", [])
-        payments = order.get("Payments", [])
+        ledger = order.get("Ledger") or {}
+        if isinstance(ledger, list):
+            ledger = ledger[0] if ledger else {}
         
-        total = sum(i.get("Total_price") or 0 for i in items)
-        paid_so_far = sum(p.get("Amount") or 0 for p in payments)
+        total = float(ledger.get("items_total") or 0)
+        paid_so_far = float(ledger.get("paid_amount") or 0)
         
         if paid_so_far + payload.paidAmount > total:
              raise HTTPException(status_code=400, detail=f"Payment exceeds total. Total: {total}, Paid: {paid_so_far}")
              
-        # Prevent multiple identical payments
-        existing_pmt = supabase.table("Payments") \
-            .select("*") \
-            .eq("Po_id", po_id) \
-            .eq("Amount", payload.paidAmount) \
-            .eq("Payment_date", payload.paidDate) \
-            .execute()
+        # Without an Idempotency-Key, guess retries by matching amount + date
+        existing_pmt = None
+        if check_duplicate:
+            existing_pmt = supabase.table("Payments") \
+                .select("Payment_id") \
+                .eq("Po_id", po_id) \
+                .eq("Amount", payload.paidAmount) \
+                .eq("Payment_date", payload.paidDate) \
+                .execute()
         
-        if not existing_pmt.data:
-            # Insert
+        if not existing_pmt or not existing_pmt.data:
+            # Insert (ledger triggers update paid amount and Status)
             supabase.table("Payments").insert({
                 "Po_id": po_id,
                 "Amount": payload.paidAmount,
@@ -471,14 +347,12 @@ def add_payment(po_id: int, payload: PaymentSchema):
         else:
              print("Payment already exists in add_payment, skipping.")
         
-        # Update Status
-        all_pmts = supabase.table("Payments").select("Amount").eq("Po_id", po_id).execute()
-        new_paid = sum(float(p["Amount"] or 0) for p in all_pmts.data)
-        status = get_payment_status(new_paid, total)
-        supabase.table("Purchase_orders").update({"Status": status}).eq("Po_id", po_id).execute()
+        data_version.bump("Purchase_orders", "Payments")
         
         return {"success": True}
         
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print("Add Payment Error:", e)
@@ -501,13 +375,15 @@ def mark_all_arrived(po_id: int):
         
         # Mark Items Arrived
         supabase.table("Purchase_order_items").update({"Arrival_status": "Arrived"}).eq("Po_id", po_id).execute()
+        _po_stats_cache.invalidate()
+        data_version.bump("Products", "Purchase_order_items")
         
         return {"success": True, "message": "Arrived successfully (Limited QR logic)"}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{po_id}/products")
+@router.get("/{po_id}/products", dependencies=[etag.versioned("Products", "Purchase_order_items")])
 def get_po_products(po_id: int):
     # Fetch products linked to this PO via Purchase_order_items
     try:
@@ -519,11 +395,10 @@ def get_po_products(po_id: int):
             return []
             
         # 2. Get Products with metadata
-        products = supabase.table("Products") \
-            .select("Item_id, Barcode_short, Qr_image_url, Batch_code, Product_name, Size, Purchase_order_items(Colour)") \
-            .in_("Po_item_id", ids) \
-            .execute()
-        return products.data
+        return select_in(
+            lambda: supabase.table("Products").select("Item_id, Barcode_short, Qr_image_url, Batch_code, Product_name, Size, Purchase_order_items(Colour)"),
+            "Po_item_id", ids,
+        )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException, Response
+from pydantic import BaseModel
+from typing import Dict, Any, Optional
+from app.utils import data_version, lanes, movement_archive, report_jobs
+from app.routers import reports
+
+router = APIRouter(prefix="/reports/jobs", tags=["Report Jobs"], route_class=lanes.route_class("crud"))
+
+# report -> (function, allowed params, tables it reads)
+REPORT_JOBS = {
+    "stock-summary": (reports.get_stock_summary, (), ("Stock_batches", "Purchase_order_items")),
+    "batch-wise": (reports.get_batch_wise_stock, (), ("Stock_batches", "Purchase_order_items")),
+    "low-stock": (reports.get_low_stock, (), ("Stock_batches", "Purchase_order_items")),
+    "item-wise": (reports.get_item_wise_stock, (), ("Products", "Purchase_order_items", "Clients")),
+    "sales": (reports.get_sales_report, (), ("Stock_movement", "Products", "Purchase_order_items", "Clients")),
+    "returns": (reports.get_returns_report, (), ("Return_list",)),
+    "payments": (reports.get_payments_report, (), ("Purchase_orders", "Payments", "Vendors")),
+    "movement": (reports.get_movement_history, ("full_history",), ("Stock_movement", "Products", "Clients", "Purchase_order_items")),
+}
+
+class ReportJobSchema(BaseModel):
+    report: str
+    params: Optional[Dict[str, Any]] = None
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(job)
+    if job["status"] == "done":
+        out["download"] = f"/reports/jobs/{job['job_id']}/download"
+    return out
+
+@router.post("/")
+def submit_report_job(payload: ReportJobSchema):
+    if payload.report not in REPORT_JOBS:
+        raise HTTPException(status_code=400, detail=f"Unknown report. Choose from: {', '.join(REPORT_JOBS)}")
+
+    fn, allowed, tables = REPORT_JOBS[payload.report]
+    params = payload.params or {}
+    unknown = set(params) - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unsupported params for {payload.report}: {', '.join(sorted(unknown))}")
+
+    version = data_version.current(*tables)
+    if payload.report == "movement" and params.get("full_history"):
+        # Archived months are read from files, not the tables above
+        version += movement_archive.version()
+
+    job = report_jobs.submit(
+        payload.report, params, lambda: fn(**params),
+        data_version=version,
+    )
+    return _public(job)
+
+@router.get("/{job_id}")
+def get_report_job(job_id: str):
+    return _public(report_jobs.get_job(job_id))
+
+@router.get("/{job_id}/download")
+def download_report_job(job_id: str):
+    # Stored gzip bytes are sent as-is; browsers decompress transparently
+    job = report_jobs.get_job(job_id)
+    body = report_jobs.get_result(job_id)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={
+            "Content-Encoding": "gzip",
+            "Content-Disposition": f'attachment; filename="{job["report"]}-{job_id}.json"',
+        },
+    )
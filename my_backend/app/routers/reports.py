@@ -1,31 +1,23 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.database import supabase
 from app.utils.report_ordering import apply_order 
+from app.utils import lookup_cache, movement_archive, lanes, etag
+from app.utils.batch_facts import get_batch_facts
+from app.utils.security import require_admin
 
-router = APIRouter(prefix="/reports", tags=["Reports"])
+router = APIRouter(prefix="/reports", tags=["Reports"], route_class=lanes.route_class("reports"))
 
-@router.get("/stock-summary")
+@router.get("/stock-summary", dependencies=[etag.versioned("Stock_batches", "Purchase_order_items")])
 def get_stock_summary():
-    # Step 1: Fetch arrived PO items and Batches
-    arrived_res = supabase.table("Purchase_order_items").select("Po_item_id").eq("Arrival_status", "Arrived").execute()
-    arrived_ids = [it["Po_item_id"] for it in arrived_res.data or []]
-    
-    batches = []
-    if arrived_ids:
-        batches = supabase.table("Stock_batches").select("*").in_("Po_item_id", arrived_ids).execute().data or []
-
-    # Step 2: Fetch PO Items (to get category)
-    po_items = supabase.table("Purchase_order_items").select("Po_item_id, Category").execute().data
-
-    # Convert PO items into lookup dictionary
-    category_lookup = {item["Po_item_id"]: item["Category"] for item in po_items}
+    # Step 1: Arrived batches with category (shared, memoized loader)
+    facts = get_batch_facts()
 
     summary = {}
 
-    for row in batches:
-        po_item_id = row["Po_item_id"]
-        category = category_lookup.get(po_item_id, "Unknown")
-
+    for category, qty, out, sold, returned, available in zip(
+        facts["category"], facts["batch_quantity"], facts["out"],
+        facts["sold"], facts["returned"], facts["available"],
+    ):
         if category not in summary:
             summary[category] = {
                 "category": category,
@@ -36,74 +28,41 @@ def get_stock_summary():
                 "totalAvailable": 0,
             }
 
-        summary[category]["totalQuantity"] += row["Batch_quantity"]
-        summary[category]["totalOut"] += row["Out"]
-        summary[category]["totalSold"] += row["Sold"]
-        summary[category]["totalReturned"] += row["Returned"]
-        summary[category]["totalAvailable"] += row["Available"]
+        summary[category]["totalQuantity"] += qty
+        summary[category]["totalOut"] += out
+        summary[category]["totalSold"] += sold
+        summary[category]["totalReturned"] += returned
+        summary[category]["totalAvailable"] += available
 
     return list(summary.values())
 
-@router.get("/batch-wise")
+@router.get("/batch-wise", dependencies=[etag.versioned("Stock_batches", "Purchase_order_items")])
 def get_batch_wise_stock():
-    # 1️⃣ Fetch arrived PO item IDs
-    arrived_res = supabase.table("Purchase_order_items").select("Po_item_id").eq("Arrival_status", "Arrived").execute()
-    arrived_ids = [it["Po_item_id"] for it in arrived_res.data or []]
-    
-    batches = []
-    if arrived_ids:
-        batches = supabase.table("Stock_batches").select("*").in_("Po_item_id", arrived_ids).execute().data or []
-
-    # 2️⃣ Fetch PO items to get category + item names
-    po_items = supabase.table("Purchase_order_items") \
-        .select("Po_item_id, Category, Item_name") \
-        .execute().data
+    # 1️⃣ Arrived batches with category + item name (shared, memoized loader)
+    facts = get_batch_facts()
 
-    # 3️⃣ Create lookup for PO items
-    po_lookup = {
-        item["Po_item_id"]: {
-            "category": item["Category"],
-            "item_name": item["Item_name"]
-        }
-        for item in po_items
-    }
-
-    # 4️⃣ Build batch → unique item names set
+    # 2️⃣ Build batch → unique item names set
     batch_item_names = {}
 
-    for batch in batches:
-        batch_id = batch["Batch_id"]
-        po_item_id = batch["Po_item_id"]
-
-        if batch_id not in batch_item_names:
-            batch_item_names[batch_id] = set()
-
-        if po_item_id in po_lookup:
-            batch_item_names[batch_id].add(
-                po_lookup[po_item_id]["item_name"]
-            )
+    for batch_id, item_name in zip(facts["batch_id"], facts["item_name"]):
+        batch_item_names.setdefault(batch_id, set()).add(item_name)
 
     result = []
 
-    for batch in batches:
-        batch_id = batch["Batch_id"]
-        po_item_id = batch["Po_item_id"]
-
-        category = po_lookup.get(po_item_id, {}).get("category", "Unknown")
-
+    for row in facts.rows():
         result.append({
-            "batchCode": batch["Batch_code"],
-            "category": category,
-            "itemCount": len(batch_item_names.get(batch_id, set())),
-            "batchQuantity": batch["Batch_quantity"],
-            "sold": batch["Sold"],
-            "out": batch["Out"],
-            "returned": batch["Returned"],
-            "available": batch["Available"],
+            "batchCode": row["batch_code"],
+            "category": row["category"],
+            "itemCount": len(batch_item_names.get(row["batch_id"], set())),
+            "batchQuantity": row["batch_quantity"],
+            "sold": row["sold"],
+            "out": row["out"],
+            "returned": row["returned"],
+            "available": row["available"],
         })
 
     return result
-@router.get("/item-wise")
+@router.get("/item-wise", dependencies=[etag.versioned("Products", "Purchase_order_items", "Clients")])
 def get_item_wise_stock():
     # 1️⃣ Fetch products (items)
     products = supabase.table("Products") \
@@ -125,15 +84,13 @@ def get_item_wise_stock():
     .execute().data
 
 
-    # 2️⃣ Fetch clients
-    clients = supabase.table("Clients") \
-        .select("Client_id, Client_name") \
-        .execute().data
+    # 2️⃣ Client names from the shared lookup cache
+    clients = lookup_cache.get_many("clients", [p["Client_id"] for p in products])
 
     # 3️⃣ Client lookup
     client_lookup = {
-        c["Client_id"]: c["Client_name"]
-        for c in clients
+        client_id: c["Client_name"]
+        for client_id, c in clients.items()
     }
 
     # 4️⃣ Build response
@@ -161,7 +118,7 @@ def get_item_wise_stock():
 
 
     return result
-@router.get("/sales")
+@router.get("/sales", dependencies=[etag.versioned("Stock_movement", "Products", "Clients", "Purchase_order_items")])
 def get_sales_report():
     query = supabase.table("Stock_movement") \
         .select("""
@@ -185,7 +142,9 @@ def get_sales_report():
         .eq("Movement_type", "Sold")
 
     movements = apply_order(query, "sales").execute().data
+    return _sales_rows(movements)
 
+def _sales_rows(movements):
     result = []
 
     for m in movements:
@@ -211,10 +170,25 @@ def get_sales_report():
             "deliveryMode": m.get("delivery_mode"),
         })
 
+    # Archived months are older than every hot row, so appending keeps newest-first
+    for a in movement_archive.iter_rows("Sold"):
+        result.append({
+            "batchCode": a["batch_code"],
+            "itemId": a["item_id"],
+            "productName": a["product_name"],
+            "size": a["size"],
+            "colour": a["colour"] or "-",
+            "category": a["category"],
+            "clientName": a["client_name"],
+            "deliveryOrderNo": a["delivery_order_no"],
+            "saleDate": a["scan_date"],
+            "deliveryMode": a["delivery_mode"],
+        })
+
     return result
 
 
-@router.get("/returns")
+@router.get("/returns", dependencies=[etag.versioned("Return_list")])
 def get_returns_report():
     query = supabase.table("Return_list") \
         .select("""
@@ -227,21 +201,12 @@ def get_returns_report():
             do_number,
             return_date,
             reason,
-            is_bulk
+            is_bulk,
+            category
         """)
 
     rows = apply_order(query, "returns").execute().data
 
-    products = supabase.table("Products") \
-        .select("Batch_code, Category") \
-        .execute().data
-
-    category_by_batch = {}
-    for p in products:
-        bc = p.get("Batch_code")
-        if bc and bc not in category_by_batch:
-            category_by_batch[bc] = p.get("Category")
-
     result = []
 
     for r in rows:
@@ -252,7 +217,7 @@ def get_returns_report():
             "productName": r.get("product_name"),
             "size": r.get("size"),
             "colour": r.get("colour") or "-",
-            "category": category_by_batch.get(batch_code, "-"),
+            "category": r.get("category") or "-",
             "batchCode": batch_code,
             "clientName": r.get("client_name"),
             "deliveryOrderNo": r.get("do_number"),
@@ -264,24 +229,12 @@ def get_returns_report():
     return result
 
 
-@router.get("/low-stock")
+@router.get("/low-stock", dependencies=[etag.versioned("Stock_batches", "Purchase_order_items")])
 def get_low_stock():
-    # 1. Fetch arrived PO item IDs
-    arrived_res = supabase.table("Purchase_order_items").select("Po_item_id").eq("Arrival_status", "Arrived").execute()
-    arrived_ids = [it["Po_item_id"] for it in arrived_res.data or []]
-    
-    batches = []
-    if arrived_ids:
-        batches = supabase.table("Stock_batches").select("*").in_("Po_item_id", arrived_ids).execute().data or []
-    
-    # 2. Fetch PO Items (for Category, Item Name)
-    po_items = supabase.table("Purchase_order_items").select("Po_item_id, Category, Item_name").execute().data
-    po_lookup = {
-        p["Po_item_id"]: {"category": p["Category"], "itemName": p["Item_name"]} 
-        for p in po_items
-    }
+    # 1. Arrived batches with category + item name (shared, memoized loader)
+    facts = get_batch_facts()
 
-    # 3. Filter Low Stock & Build Response
+    # 2. Filter Low Stock & Build Response
     low_stock = []
     
     # Thresholds configuration
@@ -292,20 +245,18 @@ def get_low_stock():
     }
     DEFAULT_THRESHOLD = 5
 
-    for b in batches:
-        avail = b.get("Available", 0)
-        po_id = b.get("Po_item_id")
-        details = po_lookup.get(po_id, {})
-        category = details.get("category", "-")
+    for row in facts.rows():
+        avail = row["available"]
+        category = row["category"]
         
         # Category-specific threshold
         threshold = THRESHOLDS.get(category, DEFAULT_THRESHOLD)
         
         if avail <= threshold:
             low_stock.append({
-                "batchCode": b["Batch_code"],
-                "itemName": details.get("itemName", "-"),
-                "category": category,
+                "batchCode": row["batch_code"],
+                "itemName": row["item_name"] or "-",
+                "category": category or "-",
                 "availableQuantity": avail,
                 "threshold": threshold,
                 "status": "LOW STOCK"
@@ -313,51 +264,29 @@ def get_low_stock():
 
     return low_stock
 
-@router.get("/payments")
+@router.get("/payments", dependencies=[etag.versioned("Purchase_orders", "Payments", "Vendors")])
 def get_payments_report():
-    # 1️⃣ Fetch purchase orders
+    # 1️⃣ Fetch purchase orders with vendor name and their ledger row
+    #    (totals are maintained by sql/002_po_ledger.sql)
     orders = supabase.table("Purchase_orders") \
-        .select("Po_id, Po_invoice_no, Vendor_id, currency") \
-        .execute().data
-
-    # 2️⃣ Fetch vendors
-    vendors = supabase.table("Vendors") \
-        .select("Vendor_id, Vendor_name") \
-        .execute().data
-    vendor_lookup = {v["Vendor_id"]: v["Vendor_name"] for v in vendors}
-
-    # 3️⃣ Fetch PO items to calculate total amount
-    items = supabase.table("Purchase_order_items") \
-        .select("Po_id, Total_price") \
+        .select("""
+            Po_id, Po_invoice_no, currency,
+            Vendors ( Vendor_name ),
+            po_ledger ( items_total, paid_amount, last_payment_date, first_payment_at )
+        """) \
         .execute().data
 
-    total_lookup = {}
-    for item in items:
-        total_lookup[item["Po_id"]] = total_lookup.get(item["Po_id"], 0) + (item["Total_price"] or 0)
-
-    # 4️⃣ Fetch payments
-        query = supabase.table("Payments") \
-            .select("Po_id, Amount, Payment_date, Created_at, Notes")
-
-        payments = apply_order(query, "payments").execute().data
-
- 
-
-    payments_by_po = {}
-    for p in payments:
-        po_id = p["Po_id"]
-        payments_by_po.setdefault(po_id, []).append(p)
-
-
-    # 5️⃣ Build report
+    # 2️⃣ Build report
     report = []
 
     for po in orders:
-        po_id = po["Po_id"]
-        total = total_lookup.get(po_id, 0)
-        po_payments = payments_by_po.get(po_id, [])
+        vendor = po.get("Vendors") or {}
+        ledger = po.get("po_ledger") or {}
+        if isinstance(ledger, list):
+            ledger = ledger[0] if ledger else {}
 
-        paid = sum(p["Amount"] for p in po_payments)
+        total = ledger.get("items_total") or 0
+        paid = ledger.get("paid_amount") or 0
 
         if paid == 0:
             status = "Pending"
@@ -367,31 +296,24 @@ def get_payments_report():
             payment_date = None
         else:
             status = "Paid"
-            payment_date = max(p["Payment_date"] for p in po_payments)
-
-        created_at = (
-            min(p["Created_at"] for p in po_payments)
-            if po_payments
-            else None
-        )
+            payment_date = ledger.get("last_payment_date")
 
         report.append({
             "poInvoiceNumber": po["Po_invoice_no"],
-            "vendorName": vendor_lookup.get(po["Vendor_id"], "Unknown"),
+            "vendorName": vendor.get("Vendor_name") or "Unknown",
             "paymentDate": payment_date,     # ✅ date PO became fully paid
             "amount": paid,
             "paymentStatus": status,
             "notes": "",
-            "createdAt": created_at,
-             "currency": po.get("currency", "INR"),
-                   # ✅ first payment timestamp
+            "createdAt": ledger.get("first_payment_at"),   # ✅ first payment timestamp
+            "currency": po.get("currency", "INR"),
         })
 
     return report
 
-@router.get("/movement")
-def get_movement_history():
-    
+@router.get("/movement", dependencies=[etag.versioned("Stock_movement", "Products", "Clients", "Purchase_order_items")])
+def get_movement_history(full_history: bool = False):
+    # Hot months only, unless the archived months are asked for too
     query = supabase.table("Stock_movement") \
     .select("""
         Stock_id, Movement_type, Scan_date, delivery_mode, undo_reason,
@@ -399,9 +321,15 @@ def get_movement_history():
         Products ( Item_id, Product_name ),
         Clients ( Client_name )
     """)
+    if not full_history:
+        hot_from = movement_archive.hot_start()
+        if hot_from:
+            query = query.gte("Scan_date", hot_from)
 
     movements = apply_order(query, "movement").execute().data
-   
+    return _movement_rows(movements, full_history)
+
+def _movement_rows(movements, full_history: bool = False):
     result = []
     
     for m in movements:
@@ -422,5 +350,64 @@ def get_movement_history():
             "userName": user_name,
             "undoReason": m.get("undo_reason")
         })
+    
+    if full_history:
+        for a in movement_archive.iter_rows():
+            result.append({
+                "itemId": a["item_id"],
+                "productName": a["product_name"],
+                "movementType": a["movement_type"],
+                "scanDate": a["scan_date"],
+                "clientName": a["client_name"],
+                "deliveryOrderNo": a["delivery_order_no"],
+                "deliveryMode": a["delivery_mode"],
+                "userName": "-",
+                "undoReason": a["undo_reason"]
+            })
         
     return result
+
+@router.post("/movement/archive", dependencies=[Depends(require_admin)])
+def archive_movements():
+    # Compact closed months out of Stock_movement (see sql/011_stock_movement_archive.sql).
+    # Irreversible: admins only, whatever AUTH_REQUIRED says.
+    archived = movement_archive.archive_closed_months()
+    return {
+        "success": True,
+        "archived": archived,
+        "archive_dir": str(movement_archive.ARCHIVE_DIR),
+        "warning": "Archived rows were deleted from Stock_movement and now exist only in archive_dir; keep it backed up.",
+    }
+
+
+# Reports the bundle endpoint can compute in one request
+BUNDLE_REPORTS = {
+    "stock-summary": get_stock_summary,
+    "batch-wise": get_batch_wise_stock,
+    "low-stock": get_low_stock,
+    "item-wise": get_item_wise_stock,
+    "sales": get_sales_report,
+    "returns": get_returns_report,
+    "payments": get_payments_report,
+    "movement": get_movement_history,
+}
+BATCH_FACT_REPORTS = {"stock-summary", "batch-wise", "low-stock"}
+BUNDLE_TABLES = (
+    "Stock_batches", "Purchase_order_items", "Products", "Clients",
+    "Stock_movement", "Return_list", "Purchase_orders", "Payments", "Vendors",
+)
+
+@router.get("/bundle", dependencies=[etag.versioned(*BUNDLE_TABLES)])
+def get_report_bundle(types: str = Query(..., description="Comma-separated report names")):
+    requested = list(dict.fromkeys(t.strip() for t in types.split(",") if t.strip()))
+    unknown = [t for t in requested if t not in BUNDLE_REPORTS]
+    if not requested or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown report types: {', '.join(unknown) or '-'}. Choose from: {', '.join(BUNDLE_REPORTS)}")
+
+    # Load the shared batch facts once up front; the three reports then reuse them
+    if BATCH_FACT_REPORTS.intersection(requested):
+        get_batch_facts()
+
+    # Sections run one after another on this request's reports-lane thread, so
+    # a bundle is admitted (and limited) like any other report request
+    return {t: BUNDLE_REPORTS[t]() for t in requested}
@@ -1,52 +1,54 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Header, Query, Response
+from typing import List, Dict, Any, Optional
 from app.database import supabase
+from app.utils import data_version, idempotency, movement_log, lanes, etag, stock_events, like
 from pydantic import BaseModel
 from datetime import datetime
 
-router = APIRouter(prefix="/stock", tags=["Reserved Logic"])
+router = APIRouter(prefix="/stock", tags=["Reserved Logic"], route_class=lanes.route_class("scan"))
 
 class ReservedNoteSchema(BaseModel):
     notes: str
 
-@router.get("/reserved")
-def get_reserved_stocks(category: str):
+# Only the columns the reserved list renders
+RESERVED_SELECT = """
+    Reserved_id, Stock_id, Client_id, Delivery_order_no, Created_at, Notes,
+    Products!inner ( Item_id, Product_name, Size, Category, Batch_code, Status, Purchase_order_items ( Colour ) ),
+    Clients ( Client_name )
+"""
+
+RESERVED_GROUP_KEYS = {
+    "client": "clientName",
+    "do": "doNumber",
+}
+
+@router.get("/reserved", dependencies=[etag.versioned("Reserved_stocks", "Products", "Clients")])
+def get_reserved_stocks(
+    category: str,
+    response: Response,
+    group_by: Optional[str] = Query(None, pattern="^(client|do)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
     try:
-        # 1. Fetch Reserved Rows
-        reserved_res = supabase.table("Reserved_stocks").select("*").order("Created_at", desc=True).execute()
-        reserved_rows = reserved_res.data or []
+        # 1. Category filter, product + client join and projection in one query
+        query = supabase.table("Reserved_stocks") \
+            .select(RESERVED_SELECT, count="exact" if limit else None) \
+            .ilike("Products.Category", like.escape(category)) \
+            .order("Created_at", desc=True)
+        if limit:
+            query = query.range(offset, offset + limit - 1)
         
-        if not reserved_rows:
-            return []
-            
-        stock_ids = [r["Stock_id"] for r in reserved_rows]
-        client_ids = [r["Client_id"] for r in reserved_rows if r.get("Client_id")]
+        res = query.execute()
+        reserved_rows = res.data or []
+        if limit:
+            response.headers["X-Total-Count"] = str(res.count or 0)
         
-        # 2. Fetch Products
-        products_map = {}
-        if stock_ids:
-            prods_res = supabase.table("Products").select("*, Purchase_order_items(Colour)").in_("Stock_id", stock_ids).execute()
-            if prods_res.data:
-                products_map = {p["Stock_id"]: p for p in prods_res.data}
-                
-        # 3. Fetch Clients
-        clients_map = {}
-        if client_ids:
-            clients_res = supabase.table("Clients").select("Client_id, Client_name").in_("Client_id", client_ids).execute()
-            if clients_res.data:
-                clients_map = {c["Client_id"]: c for c in clients_res.data}
-                
-        # 4. Filter and Merge
-        active_cat = category.lower()
+        # 2. Shape rows
         results = []
-        
         for r in reserved_rows:
-            prod = products_map.get(r["Stock_id"], {})
-            client = clients_map.get(r["Client_id"], {})
-            
-            p_cat = (prod.get("Category") or "").lower()
-            if p_cat != active_cat:
-                continue
+            prod = r.get("Products") or {}
+            client = r.get("Clients") or {}
                 
             po_item = prod.get("Purchase_order_items")
             colour = "-"
@@ -71,8 +73,21 @@ def get_reserved_stocks(category: str):
                 "status": prod.get("Status") or "-",
                 "remarks": r.get("Notes") or ""
             })
-            
-        return results
+        
+        if not group_by:
+            return results
+        
+        # 3. Optional grouping by client or delivery order (keeps newest-first order)
+        key_field = RESERVED_GROUP_KEYS[group_by]
+        groups = {}
+        for row in results:
+            key = row[key_field]
+            if key not in groups:
+                groups[key] = {"key": key, "count": 0, "items": []}
+            groups[key]["count"] += 1
+            groups[key]["items"].append(row)
+        
+        return list(groups.values())
 
     except Exception as e:
         print("Get Reserved Error:", e)
@@ -85,15 +100,19 @@ def update_reserved_note(reserved_id: int, payload: ReservedNoteSchema):
             "Notes": payload.notes,
             "Updated_at": datetime.now().isoformat()
         }).eq("Reserved_id", reserved_id).execute()
+        data_version.bump("Reserved_stocks")
         return {"success": True}
     except Exception as e:
          raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/reserved/{stock_id}/clear")
-def clear_reserved_sale(stock_id: str):
+def clear_reserved_sale(stock_id: str, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    return idempotency.run(idempotency_key, "stock.reserved_clear", {"stock_id": stock_id}, lambda: _clear_reserved_sale(stock_id))
+
+def _clear_reserved_sale(stock_id: str):
     try:
         # 1. Fetch Product
-        p_res = supabase.table("Products").select("Status, Client_id, Delivery_order_no, Batch_id").eq("Stock_id", stock_id).single().execute()
+        p_res = supabase.table("Products").select("Status, Client_id, Delivery_order_no, Batch_id, Category").eq("Stock_id", stock_id).single().execute()
         if not p_res.data:
              raise HTTPException(status_code=404, detail="Product not found")
         
@@ -138,7 +157,7 @@ def clear_reserved_sale(stock_id: str):
                 }).eq("Batch_id", batch_id).execute()
                 
         # 5. Log Movement
-        supabase.table("Stock_movement").insert({
+        movement_log.log({
             "Stock_id": stock_id,
             "Movement_type": "Sold",
             "Client_id": prod.get("Client_id"),
@@ -146,8 +165,13 @@ def clear_reserved_sale(stock_id: str):
             "Scan_date": today_iso,
             "delivery_mode": "Reserved Clear",
             "undo_reason": None
-        }).execute()
+        })
         
+        data_version.bump("Products", "Stock_batches", "Reserved_stocks")
+        stock_events.publish(
+            "sale", stock_id=stock_id, category=prod.get("Category"),
+            client_id=prod.get("Client_id"), do_no=prod.get("Delivery_order_no"), batch_id=prod.get("Batch_id"),
+        )
         return {"success": True}
 
     except Exception as e:
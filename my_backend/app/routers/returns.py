@@ -1,34 +1,37 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 from typing import List, Optional
 from app.database import supabase
+from app.utils import lanes, etag
 
-router = APIRouter(prefix="/returns", tags=["Returns"])
+router = APIRouter(prefix="/returns", tags=["Returns"], route_class=lanes.route_class("crud"))
 
-@router.get("/")
-def get_returns():
+@router.get("/", dependencies=[etag.versioned("Return_list")])
+def get_returns(
+    response: Response,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
     try:
-        # 1. Fetch all returns
-        res = supabase.table("Return_list").select("*").order("return_date", desc=True).execute()
-        raw_returns = res.data or []
-        
-        if not raw_returns:
-            return []
-            
-        # 2. Extract unique Stock IDs to fetch categories
-        stock_ids = list(set([r["stock_id"] for r in raw_returns if r.get("stock_id")]))
+        # 1. Fetch returns; category is stored on the row (sql/005_return_list_category.sql)
+        query = supabase.table("Return_list").select("*", count="exact" if limit else None)
+        if date_from:
+            query = query.gte("return_date", date_from)
+        if date_to:
+            query = query.lte("return_date", date_to)
+        query = query.order("return_date", desc=True)
+        if limit:
+            query = query.range(offset, offset + limit - 1)
         
-        # 3. Fetch matching products
-        category_map = {}
-        if stock_ids:
-            prod_res = supabase.table("Products").select("Stock_id, Category").in_("Stock_id", stock_ids).execute()
-            if prod_res.data:
-                category_map = {p["Stock_id"]: p["Category"] for p in prod_res.data}
+        res = query.execute()
+        raw_returns = res.data or []
+        if limit:
+            response.headers["X-Total-Count"] = str(res.count or 0)
                 
-        # 4. Enrich returns with Products object for frontend compatibility
+        # 2. Keep the Products object the frontend reads the category from
         for r in raw_returns:
-            sid = r.get("stock_id")
-            cat = category_map.get(sid) or "-"
-            r["Products"] = {"Category": cat}
+            r["Products"] = {"Category": r.get("category") or "-"}
             
         return raw_returns
         
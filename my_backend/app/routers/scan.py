@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Query, Response
 from pydantic import BaseModel
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Literal
 from app.database import supabase
+from app.utils import data_version, idempotency, movement_log, lanes, etag, stock_events
+from app.utils.rpc import call_rpc
 from datetime import datetime
 
-router = APIRouter(prefix="/scan", tags=["Scan & Delivery"])
+router = APIRouter(prefix="/scan", tags=["Scan & Delivery"], route_class=lanes.route_class("scan"))
 
 # --- Schemas ---
 
@@ -19,6 +21,24 @@ class ReturnSchema(BaseModel):
     reason: str
     type: str # "before" or "after"
 
+class ScanEventSchema(BaseModel):
+    seq: int # per-device sequence number
+    type: Literal["mark_out", "return", "undo"]
+    stock_id: Any
+    client_id: Optional[int] = None # mark_out
+    do_no: Optional[str] = None # mark_out
+    mode: Optional[str] = None # mark_out
+    reason: Optional[str] = None # return / undo
+    return_type: Optional[Literal["before", "after"]] = None # return
+    client_ts: Optional[datetime] = None # when the scan happened on the device
+
+class ScanSyncSchema(BaseModel):
+    device_id: str
+    events: List[ScanEventSchema]
+
+# Events per RPC call, keeps each call well inside the statement timeout
+SYNC_CHUNK_SIZE = 500
+
 # --- Endpoints ---
 
 @router.get("/barcode/{code:path}")
@@ -78,10 +98,13 @@ def lookup_barcode(code: str):
         return None
 
 @router.post("/mark_out")
-def mark_out_item(payload: MarkOutSchema):
+def mark_out_item(payload: MarkOutSchema, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    return idempotency.run(idempotency_key, "scan.mark_out", payload.model_dump(), lambda: _mark_out_item(payload))
+
+def _mark_out_item(payload: MarkOutSchema):
     try:
         # 1. Check current status
-        p_res = supabase.table("Products").select("Status, Batch_id").eq("Stock_id", payload.stock_id).single().execute()
+        p_res = supabase.table("Products").select("Status, Batch_id, Category").eq("Stock_id", payload.stock_id).single().execute()
         if not p_res.data:
             raise HTTPException(status_code=404, detail="Product not found")
         
@@ -128,15 +151,20 @@ def mark_out_item(payload: MarkOutSchema):
                 }).eq("Batch_id", batch_id).execute()
         
         # 5. Log Movement
-        supabase.table("Stock_movement").insert({
+        movement_log.log({
             "Stock_id": payload.stock_id,
             "Movement_type": "Out",
             "Client_id": payload.client_id,
             "Delivery_order_no": payload.do_no,
             "Scan_date": today_iso,
             "delivery_mode": payload.mode
-        }).execute()
+        })
         
+        data_version.bump("Products", "Stock_batches", "Reserved_stocks")
+        stock_events.publish(
+            "mark_out", stock_id=payload.stock_id, category=prod.get("Category"),
+            client_id=payload.client_id, do_no=payload.do_no, batch_id=prod.get("Batch_id"),
+        )
         return {"success": True}
         
     except Exception as e:
@@ -144,11 +172,14 @@ def mark_out_item(payload: MarkOutSchema):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/return")
-def return_item(payload: ReturnSchema):
+def return_item(payload: ReturnSchema, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    return idempotency.run(idempotency_key, "scan.return", payload.model_dump(), lambda: _return_item(payload))
+
+def _return_item(payload: ReturnSchema):
     try:
         # 1. Fetch details for Logging (We need Client/DO/Name etc BEFORE clearing)
         p_res = supabase.table("Products").select("""
-            Stock_id, Item_id, Product_name, Size, Batch_code, 
+            Stock_id, Item_id, Product_name, Size, Batch_code, Category,
             Client_id, Delivery_order_no, Batch_id, Status,
             Clients ( Client_name ),
             Purchase_order_items ( Colour )
@@ -187,6 +218,7 @@ def return_item(payload: ReturnSchema):
             "product_name": prod["Product_name"],
             "size": prod["Size"],
             "batch_code": prod["Batch_code"],
+            "category": prod.get("Category"),
             "client_id": prod["Client_id"],
             "client_name": client_name,
             "do_number": prod["Delivery_order_no"],
@@ -244,15 +276,21 @@ def return_item(payload: ReturnSchema):
 
         # 6. Log Movement
         tag = "Return Before Invoice" if payload.type == "before" else "Return After Sale"
-        supabase.table("Stock_movement").insert({
+        movement_log.log({
             "Stock_id": payload.stock_id,
             "Movement_type": tag,
             "Client_id": prod["Client_id"], # Log the client it came from
             "Delivery_order_no": prod["Delivery_order_no"],
             "Scan_date": datetime.now().date().isoformat(),
             "undo_reason": payload.reason
-        }).execute()
+        })
 
+        data_version.bump("Products", "Stock_batches", "Reserved_stocks", "Return_list")
+        stock_events.publish(
+            "return", stock_id=payload.stock_id, category=prod.get("Category"),
+            client_id=prod.get("Client_id"), do_no=prod.get("Delivery_order_no"),
+            batch_id=prod.get("Batch_id"), return_type=payload.type,
+        )
         return {"success": True}
         
     except Exception as e:
@@ -263,17 +301,56 @@ class UndoSaleSchema(BaseModel):
     stock_id: str
     reason: str
 
-@router.get("/deliveries")
+DELIVERY_ITEM_SELECT = """
+    Stock_id, Item_id, Product_name, Size, Batch_code, Category, Status, 
+    Client_id, Delivery_order_no, Created_at, Updated_at,
+    Clients!Products_Client_id_fkey ( Client_name ),
+    Purchase_order_items!Products_Po_item_id_fkey ( Colour )
+"""
+
+def _delivery_item(row):
+    # Extract Colour
+    colour = "-"
+    po_item = row.get("Purchase_order_items")
+    if po_item:
+        if isinstance(po_item, list) and po_item:
+            colour = po_item[0].get("Colour") or "-"
+        elif isinstance(po_item, dict):
+            colour = po_item.get("Colour") or "-"
+    
+    return {
+        "stockId": row["Stock_id"],
+        "itemId": row["Item_id"],
+        "category": row.get("Category"),
+        "product": row.get("Product_name"),
+        "size": row.get("Size"),
+        "colour": colour,
+        "batch": row.get("Batch_code"),
+        "status": row.get("Status"),
+        "clientId": row.get("Client_id")
+    }
+
+def _delivery_group(do_no, row):
+    client_name = "-"
+    if row.get("Clients"):
+         client_name = row["Clients"].get("Client_name") or "-"
+    
+    # Use Updated_at or Created_at for date
+    date_str = (row.get("Updated_at") or row.get("Created_at") or "")[:10]
+    
+    return {
+        "do": do_no,
+        "client": client_name,
+        "date": date_str,
+        "items": []
+    }
+
+@router.get("/deliveries", dependencies=[etag.versioned("Products", "Clients")])
 def get_delivery_list():
     try:
         # Fetch products marked Out or Sold
         # We need client name and colour as well
-        res = supabase.table("Products").select("""
-            Stock_id, Item_id, Product_name, Size, Batch_code, Category, Status, 
-            Client_id, Delivery_order_no, Created_at, Updated_at,
-            Clients!Products_Client_id_fkey ( Client_name ),
-            Purchase_order_items!Products_Po_item_id_fkey ( Colour )
-        """).in_("Status", ["Out", "Sold"]).execute()
+        res = supabase.table("Products").select(DELIVERY_ITEM_SELECT).in_("Status", ["Out", "Sold"]).execute()
         
         if not res.data:
             return []
@@ -288,40 +365,9 @@ def get_delivery_list():
                 continue
                 
             if do_no not in groups:
-                client_name = "-"
-                if row.get("Clients"):
-                     client_name = row["Clients"].get("Client_name") or "-"
-                
-                # Use Updated_at or Created_at for date
-                date_str = (row.get("Updated_at") or row.get("Created_at") or "")[:10]
-                
-                groups[do_no] = {
-                    "do": do_no,
-                    "client": client_name,
-                    "date": date_str,
-                    "items": []
-                }
+                groups[do_no] = _delivery_group(do_no, row)
             
-            # Extract Colour
-            colour = "-"
-            po_item = row.get("Purchase_order_items")
-            if po_item:
-                if isinstance(po_item, list) and po_item:
-                    colour = po_item[0].get("Colour") or "-"
-                elif isinstance(po_item, dict):
-                    colour = po_item.get("Colour") or "-"
-            
-            groups[do_no]["items"].append({
-                "stockId": row["Stock_id"],
-                "itemId": row["Item_id"],
-                "category": row.get("Category"),
-                "product": row.get("Product_name"),
-                "size": row.get("Size"),
-                "colour": colour,
-                "batch": row.get("Batch_code"),
-                "status": row.get("Status"),
-                "clientId": row.get("Client_id")
-            })
+            groups[do_no]["items"].append(_delivery_item(row))
             
         return list(groups.values())
 
@@ -329,11 +375,75 @@ def get_delivery_list():
         print("Get Deliveries Error:", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/deliveries/summary", dependencies=[etag.versioned("Products", "Clients")])
+def get_delivery_summary(
+    response: Response,
+    client_id: Optional[int] = None,
+    category: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    try:
+        # Filters run on Products rows before grouping (delivery_order_summary_page, sql/004)
+        page = call_rpc("delivery_order_summary_page", {
+            "p_client_id": client_id,
+            "p_category": category or None,
+            "p_date_from": date_from or None,
+            "p_date_to": date_to or None,
+            "p_limit": limit,
+            "p_offset": offset,
+        }) or {}
+        response.headers["X-Total-Count"] = str(page.get("total") or 0)
+        
+        return [{
+            "do": r["do_no"],
+            "clientId": r.get("client_id"),
+            "client": r.get("client_name") or "-",
+            "date": r.get("do_date") or "",
+            "itemCount": r.get("item_count") or 0,
+            "outCount": r.get("out_count") or 0,
+            "soldCount": r.get("sold_count") or 0,
+            "categories": r.get("categories") or [],
+        } for r in page.get("rows") or []]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Get Delivery Summary Error:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/deliveries/{do_no:path}", dependencies=[etag.versioned("Products", "Clients")])
+def get_delivery_order(do_no: str):
+    try:
+        # Single DO through the Delivery_order_no index
+        res = supabase.table("Products").select(DELIVERY_ITEM_SELECT) \
+            .eq("Delivery_order_no", do_no) \
+            .in_("Status", ["Out", "Sold"]) \
+            .execute()
+        
+        if not res.data:
+            raise HTTPException(status_code=404, detail="Delivery order not found")
+        
+        group = _delivery_group(do_no, res.data[0])
+        group["items"] = [_delivery_item(row) for row in res.data]
+        return group
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Get Delivery Order Error:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/undo")
-def undo_sale(payload: UndoSaleSchema):
+def undo_sale(payload: UndoSaleSchema, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    return idempotency.run(idempotency_key, "scan.undo", payload.model_dump(), lambda: _undo_sale(payload))
+
+def _undo_sale(payload: UndoSaleSchema):
     try:
         # 1. Fetch Product
-        p_res = supabase.table("Products").select("Status, Client_id, Delivery_order_no, Batch_id").eq("Stock_id", payload.stock_id).single().execute()
+        p_res = supabase.table("Products").select("Status, Client_id, Delivery_order_no, Batch_id, Category").eq("Stock_id", payload.stock_id).single().execute()
         if not p_res.data:
              raise HTTPException(status_code=404, detail="Product not found")
         
@@ -378,17 +488,51 @@ def undo_sale(payload: UndoSaleSchema):
                 }).eq("Batch_id", batch_id).execute()
                 
         # 5. Log Movement
-        supabase.table("Stock_movement").insert({
+        movement_log.log({
             "Stock_id": payload.stock_id,
             "Movement_type": "Undo Sale",
             "Client_id": prod["Client_id"],
             "Delivery_order_no": prod["Delivery_order_no"],
             "Scan_date": datetime.now().date().isoformat(),
             "undo_reason": payload.reason
-        }).execute()
+        })
         
+        data_version.bump("Products", "Stock_batches", "Reserved_stocks")
+        stock_events.publish(
+            "undo", stock_id=payload.stock_id, category=prod.get("Category"),
+            client_id=prod.get("Client_id"), do_no=prod.get("Delivery_order_no"), batch_id=prod.get("Batch_id"),
+        )
         return {"success": True}
 
     except Exception as e:
         print("Undo Sale Error:", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/sync")
+def sync_scan_queue(payload: ScanSyncSchema):
+    try:
+        # Dedupe on (device_id, seq) and apply in sequence order inside the database (sql/009_scan_sync.sql)
+        events = sorted(payload.events, key=lambda ev: ev.seq)
+        results = []
+        for i in range(0, len(events), SYNC_CHUNK_SIZE):
+            chunk = [ev.model_dump(mode="json") for ev in events[i:i + SYNC_CHUNK_SIZE]]
+            results.extend(call_rpc("scan_sync", {"p_device_id": payload.device_id, "p_events": chunk}) or [])
+        
+        if any(r.get("success") and not r.get("duplicate") for r in results):
+            data_version.bump("Products", "Stock_batches", "Stock_movement", "Reserved_stocks", "Return_list")
+            # Per-event categories are not returned by scan_sync; screens just reload
+            stock_events.publish("sync", device_id=payload.device_id)
+        
+        return {
+            "device_id": payload.device_id,
+            "applied": sum(1 for r in results if r.get("success") and not r.get("duplicate")),
+            "duplicates": sum(1 for r in results if r.get("duplicate")),
+            "failed": sum(1 for r in results if not r.get("success")),
+            "results": results,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Scan Sync Error:", e)
+        raise HTTPException(status_code=500, detail=str(e))
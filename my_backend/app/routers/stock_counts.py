@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any
 from app.database import supabase
+from app.utils.in_query import select_in
+from app.utils import batch_reconcile, lanes, etag
 
-router = APIRouter(prefix="/stock", tags=["Stock Counts"])
+router = APIRouter(prefix="/stock", tags=["Stock Counts"], route_class=lanes.route_class("crud"))
 
-@router.get("/counts")
+@router.get("/counts", dependencies=[etag.versioned("Stock_batches", "Purchase_order_items", "Products")])
 def get_stock_counts(category: str):
     try:
         # 1. Fetch all Batches
@@ -38,12 +40,10 @@ def get_stock_counts(category: str):
             return []
 
         # 4. Fetch Products for these batches
-        products_res = supabase.table("Products").select("""
+        all_products = select_in(lambda: supabase.table("Products").select("""
             Stock_id, Item_id, Status, Size, Category, Batch_id,
             Purchase_order_items ( Colour )
-        """).in_("Batch_id", relevant_batch_ids).execute()
-        
-        all_products = products_res.data
+        """), "Batch_id", relevant_batch_ids)
         
         # Group products by Batch_id
         products_by_batch: Dict[int, List[Any]] = {bid: [] for bid in relevant_batch_ids}
@@ -106,3 +106,24 @@ def get_stock_counts(category: str):
     except Exception as e:
         print("Stock Counts Error:", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/reconcile")
+def get_batch_drift(incremental: bool = False):
+    # Dry run: per-batch drift between stored counters and product statuses
+    try:
+        return batch_reconcile.run(repair=False, incremental=incremental)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Batch Reconcile Error:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/reconcile")
+def repair_batch_counters(incremental: bool = False):
+    try:
+        return batch_reconcile.run(repair=True, incremental=incremental)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Batch Reconcile Error:", e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any
 from app.database import supabase
+from app.utils.in_query import select_in
+from app.utils import lanes, etag
 
-router = APIRouter(prefix="/stock", tags=["Stock Products"])
+router = APIRouter(prefix="/stock", tags=["Stock Products"], route_class=lanes.route_class("crud"))
 
-@router.get("/products")
+@router.get("/products", dependencies=[etag.versioned("Stock_batches", "Purchase_order_items", "Products")])
 def get_stock_products(category: str):
     try:
         cat_filter = category.lower()
@@ -28,9 +30,8 @@ def get_stock_products(category: str):
         
         batch_map = {}
         if batch_ids:
-            batches_res = supabase.table("Stock_batches").select("*").in_("Batch_id", batch_ids).execute()
-            if batches_res.data:
-                batch_map = {b["Batch_id"]: b for b in batches_res.data}
+            batches = select_in(lambda: supabase.table("Stock_batches").select("*"), "Batch_id", batch_ids)
+            batch_map = {b["Batch_id"]: b for b in batches}
                 
         # 4. Group by Batch
         grouped = {}
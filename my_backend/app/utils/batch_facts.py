@@ -0,0 +1,106 @@
+# app/utils/batch_facts.py
+
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.database import supabase
+from app.utils.in_query import select_in
+from app.utils import data_version
+
+# Tables whose writes change the batch facts
+SOURCE_TABLES = ("Stock_batches", "Purchase_order_items")
+
+# Safety net for writes made outside the API (e.g. the frontend QR batch generator)
+MAX_AGE_SECONDS = 60
+
+COLUMNS = (
+    "batch_id",
+    "batch_code",
+    "po_item_id",
+    "category",
+    "item_name",
+    "batch_quantity",
+    "out",
+    "sold",
+    "returned",
+    "available",
+)
+
+
+class BatchFacts:
+    """
+    Columnar table of arrived stock batches joined with their PO item
+    (category, item name). Each column is a plain list of equal length.
+    """
+
+    def __init__(self, columns: Dict[str, List[Any]]):
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns["batch_id"])
+
+    def __getitem__(self, name: str) -> List[Any]:
+        return self.columns[name]
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        names = list(self.columns.keys())
+        for values in zip(*(self.columns[n] for n in names)):
+            yield dict(zip(names, values))
+
+
+def _load() -> BatchFacts:
+    # 1. Arrived PO items, with the columns every view needs
+    po_items = supabase.table("Purchase_order_items") \
+        .select("Po_item_id, Category, Item_name") \
+        .eq("Arrival_status", "Arrived") \
+        .execute().data or []
+    po_lookup = {p["Po_item_id"]: p for p in po_items}
+
+    # 2. Their batches
+    batches = select_in(
+        lambda: supabase.table("Stock_batches").select("Batch_id, Batch_code, Po_item_id, Batch_quantity, Out, Sold, Returned, Available"),
+        "Po_item_id", po_lookup.keys(),
+    )
+
+    columns: Dict[str, List[Any]] = {name: [] for name in COLUMNS}
+    for b in batches:
+        po = po_lookup.get(b["Po_item_id"], {})
+        columns["batch_id"].append(b["Batch_id"])
+        columns["batch_code"].append(b.get("Batch_code"))
+        columns["po_item_id"].append(b["Po_item_id"])
+        columns["category"].append(po.get("Category"))
+        columns["item_name"].append(po.get("Item_name"))
+        columns["batch_quantity"].append(b.get("Batch_quantity") or 0)
+        columns["out"].append(b.get("Out") or 0)
+        columns["sold"].append(b.get("Sold") or 0)
+        columns["returned"].append(b.get("Returned") or 0)
+        columns["available"].append(b.get("Available") or 0)
+
+    return BatchFacts(columns)
+
+
+_memo: Optional[Tuple[Tuple[int, ...], float, BatchFacts]] = None
+_lock = threading.Lock()
+
+
+def get_batch_facts() -> BatchFacts:
+    """
+    Arrived batch facts, memoized per data version of SOURCE_TABLES.
+    Shared by the stock-summary, batch-wise and low-stock reports and the dashboard.
+    """
+    global _memo
+    version = data_version.current(*SOURCE_TABLES)
+    now = time.monotonic()
+
+    with _lock:
+        if _memo and _memo[0] == version and _memo[1] > now:
+            return _memo[2]
+
+    facts = _load()
+
+    with _lock:
+        # Only keep it if no write happened while loading
+        if data_version.current(*SOURCE_TABLES) == version:
+            _memo = (version, time.monotonic() + MAX_AGE_SECONDS, facts)
+    return facts
@@ -0,0 +1,66 @@
+# app/utils/batch_reconcile.py
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.utils.rpc import call_rpc
+from app.utils import data_version
+
+# Seconds between scheduled incremental repairs; unset/0 disables the schedule
+SCHEDULE_SECONDS = int(os.getenv("BATCH_RECONCILE_INTERVAL_SECONDS", "0") or 0)
+
+_last_result: Optional[Dict[str, Any]] = None
+_last_run_at: Optional[float] = None
+_lock = threading.Lock()
+_worker = None
+
+
+def run(repair: bool = False, incremental: bool = False) -> Dict[str, Any]:
+    """
+    Recompute Stock_batches counters from product statuses in the database
+    (batch_reconcile in sql/012) and return the per-batch drift.
+    With `repair`, all drifted batches are fixed in one UPDATE.
+    """
+    global _last_result, _last_run_at
+    result = call_rpc("batch_reconcile", {"p_repair": repair, "p_incremental": incremental})
+
+    if repair and result.get("repaired"):
+        data_version.bump("Stock_batches")
+
+    with _lock:
+        _last_result = {k: v for k, v in result.items() if k != "batches"}
+        _last_run_at = time.time()
+    return result
+
+
+def _run_schedule() -> None:
+    while True:
+        time.sleep(SCHEDULE_SECONDS)
+        try:
+            result = run(repair=True, incremental=True)
+            if result.get("drifted"):
+                print(f"Batch Reconcile: repaired {result['drifted']} of {result['checked']} batches")
+        except Exception as e:
+            print("Batch Reconcile Error:", e)
+
+
+def start_schedule() -> None:
+    """
+    Start the background incremental repair loop if BATCH_RECONCILE_INTERVAL_SECONDS is set.
+    """
+    global _worker
+    if SCHEDULE_SECONDS <= 0 or _worker is not None:
+        return
+    _worker = threading.Thread(target=_run_schedule, name="batch-reconcile", daemon=True)
+    _worker.start()
+
+
+def get_metrics() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "schedule_seconds": SCHEDULE_SECONDS,
+            "last_run_at": _last_run_at,
+            "last_result": _last_result,
+        }
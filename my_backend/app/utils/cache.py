@@ -0,0 +1,111 @@
+# app/utils/cache.py
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.utils import invalidation_bus
+
+# Named caches, so invalidations broadcast by other workers can find them
+_named: Dict[str, "AggregateCache"] = {}
+
+
+class _Flight:
+    """One running computation that concurrent callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class AggregateCache:
+    """
+    In-process cache for computed aggregates (dashboard tiles, stats, ...).
+
+    Values live until `ttl_seconds` pass or the owning mutation endpoint calls
+    `invalidate()`. A generation counter makes sure a value computed before an
+    invalidation is never stored after it. A cache with a `name` is also
+    invalidated in the other workers (see invalidation_bus).
+    """
+
+    def __init__(self, ttl_seconds: float, name: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._values: Dict[Hashable, Tuple[float, Any]] = {}
+        self._inflight: Dict[Hashable, "_Flight"] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        if name:
+            _named[name] = self
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Cached value for `key`, or `compute()`. Concurrent misses for the same
+        key share one computation: the first caller runs it, the others wait
+        for its result (or its exception).
+        """
+        now = time.monotonic()
+        # Hits need no lock: dict reads are atomic and entries are replaced whole
+        hit = self._values.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+
+        with self._lock:
+            hit = self._values.get(key)
+            if hit and hit[0] > now:
+                return hit[1]
+            generation = self._generation
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and generation == self._generation:
+                    self._values[key] = (time.monotonic() + self.ttl_seconds, flight.value)
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.done.set()
+        return flight.value
+
+    def _invalidate_local(self, key: Optional[Hashable] = None) -> None:
+        with self._lock:
+            self._generation += 1
+            # Callers arriving from now on must not join a computation that
+            # started before the invalidation
+            if key is None:
+                self._values.clear()
+                self._inflight.clear()
+            else:
+                self._values.pop(key, None)
+                self._inflight.pop(key, None)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        self._invalidate_local(key)
+        if self.name:
+            # Other workers drop the whole cache; keys need not be serialisable
+            invalidation_bus.publish("caches", [self.name])
+
+
+def _invalidate_named(names) -> None:
+    for name in names:
+        cache = _named.get(name)
+        if cache:
+            cache._invalidate_local()
+
+
+invalidation_bus.subscribe("caches", _invalidate_named)
+invalidation_bus.subscribe_reset(lambda: _invalidate_named(list(_named)))
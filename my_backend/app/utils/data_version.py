@@ -0,0 +1,40 @@
+# app/utils/data_version.py
+
+import threading
+from typing import Dict, Tuple
+
+from app.utils import invalidation_bus
+
+# Per-table mutation counters, bumped by every endpoint that writes the table.
+# Memoized views key their results on these so they are rebuilt only after a write.
+_versions: Dict[str, int] = {}
+# Added to every version; raised when this worker may have missed bumps
+_epoch = 0
+_lock = threading.Lock()
+
+
+def _bump_local(tables) -> None:
+    with _lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+def bump(*tables: str) -> None:
+    _bump_local(tables)
+    invalidation_bus.publish("tables", tables)
+
+
+def current(*tables: str) -> Tuple[int, ...]:
+    with _lock:
+        return tuple(_versions.get(table, 0) + _epoch for table in tables)
+
+
+def _reset_local() -> None:
+    # Moves every table's version, including tables never bumped here
+    global _epoch
+    with _lock:
+        _epoch += 1
+
+
+invalidation_bus.subscribe("tables", _bump_local)
+invalidation_bus.subscribe_reset(_reset_local)
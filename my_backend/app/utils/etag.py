@@ -0,0 +1,47 @@
+# app/utils/etag.py
+
+import hashlib
+import os
+import time
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from app.utils import data_version
+
+# ETags also roll over this often, bounding staleness from writes that do not
+# go through the API (e.g. the frontend's direct Supabase updates)
+MAX_AGE_SECONDS = 60
+
+# Set per release (e.g. the git SHA) so tags from an older deploy, whose
+# responses may be shaped differently, stop matching. Every worker of one
+# deploy shares it, so a 304 does not depend on which worker answers.
+DEPLOY_ID = os.getenv("DEPLOY_ID", "")
+
+
+def versioned(*tables: str):
+    """
+    Route dependency for conditional GET:
+    `@router.get("/x", dependencies=[etag.versioned("Products", "Clients")])`.
+
+    The ETag is derived from the URL and the data versions of `tables` (kept
+    in step across workers by the invalidation bus), so it costs no database
+    work. A matching If-None-Match returns 304 before the handler runs;
+    otherwise the ETag is attached to the normal response.
+    """
+    def check(request: Request, response: Response) -> None:
+        raw = "|".join((
+            DEPLOY_ID,
+            request.url.path,
+            request.url.query,
+            ",".join(map(str, data_version.current(*tables))),
+            str(int(time.time() // MAX_AGE_SECONDS)),
+        ))
+        tag = f'"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+
+        headers = {"ETag": tag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if tag in (t.strip().removeprefix("W/") for t in if_none_match.split(",")):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return Depends(check)
@@ -0,0 +1,118 @@
+# app/utils/idempotency.py
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.database import supabase
+from app.utils.rpc import call_rpc
+
+# How long a stored response answers retries
+TTL_SECONDS = 24 * 60 * 60
+# A claim without a response after this long belongs to a dead worker and is taken over
+STALE_SECONDS = 120
+# How long a retry waits for the first attempt (on any worker) before a 409
+WAIT_SECONDS = 10
+POLL_SECONDS = 0.2
+
+_key_locks: Dict[str, list] = {}  # key -> [lock, number of requests using it]
+_lock = threading.Lock()
+
+
+def _fingerprint(request_body: Any) -> str:
+    raw = json.dumps(request_body, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _claim(scope: str, key: str, fingerprint: str) -> Dict[str, Any]:
+    # Shared across workers (sql/014_idempotency_keys.sql)
+    return call_rpc("idempotency_claim", {
+        "p_scope": scope,
+        "p_key": key,
+        "p_fingerprint": fingerprint,
+        "p_stale_seconds": STALE_SECONDS,
+        "p_ttl_seconds": TTL_SECONDS,
+    }) or {}
+
+
+def _complete(scope: str, key: str, response: Any) -> None:
+    supabase.table("idempotency_keys").update({
+        "response": json.loads(json.dumps(response, default=str)),
+        "completed_at": datetime.now().isoformat(),
+    }).eq("scope", scope).eq("idempotency_key", key).execute()
+
+
+def _release(scope: str, key: str) -> None:
+    supabase.table("idempotency_keys").delete() \
+        .eq("scope", scope).eq("idempotency_key", key).is_("completed_at", "null").execute()
+
+
+def _run_claimed(key: str, scope: str, fingerprint: str, handler: Callable[[], Any]) -> Any:
+    deadline = time.monotonic() + WAIT_SECONDS
+    while True:
+        claim = _claim(scope, key, fingerprint)
+        state = claim.get("state")
+        if state == "mismatch":
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if state == "done":
+            return claim.get("response")
+        if state == "claimed":
+            break
+        # Another worker is still running the first attempt
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"},
+            )
+        time.sleep(POLL_SECONDS)
+
+    try:
+        response = handler()
+    except BaseException:
+        # Failed attempts are not stored, so the client can retry them
+        try:
+            _release(scope, key)
+        except Exception as e:
+            print("Idempotency Release Error:", e)
+        raise
+
+    try:
+        _complete(scope, key, response)
+    except Exception as e:
+        # The write succeeded, so report it; retries get a 409 until the claim goes stale
+        print("Idempotency Store Error:", e)
+    return response
+
+
+def run(key: Optional[str], scope: str, request_body: Any, handler: Callable[[], Any]) -> Any:
+    """
+    Run `handler` once per Idempotency-Key. A retry with the same key, on any
+    worker, gets the stored response without running the handler (or touching
+    the data) again. Concurrent retries wait for the first attempt to finish.
+    Only successful responses are stored, so a failed attempt can be retried.
+    """
+    if not key:
+        return handler()
+
+    full_key = f"{scope}:{key}"
+    fingerprint = _fingerprint(request_body)
+
+    # Retries within this worker queue here instead of polling the table
+    with _lock:
+        entry = _key_locks.setdefault(full_key, [threading.Lock(), 0])
+        entry[1] += 1
+
+    try:
+        with entry[0]:
+            return _run_claimed(key, scope, fingerprint, handler)
+    finally:
+        with _lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _key_locks.pop(full_key, None)
@@ -0,0 +1,80 @@
+# app/utils/in_query.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List
+
+# PostgREST puts IN-lists in the URL; keep each request well under common
+# proxy/server URL limits (~8 KB) once the rest of the query is added.
+URL_BUDGET_CHARS = 4000
+MAX_CHUNK_SIZE = 500
+MAX_PARALLEL = 4
+
+_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL, thread_name_prefix="in-query")
+
+_metrics = {
+    "calls": 0,
+    "chunks": 0,
+    "rows": 0,
+    "total_ms": 0.0,
+    "max_ms": 0.0,
+    "last_chunks": 0,
+    "last_ms": 0.0,
+}
+_metrics_lock = threading.Lock()
+
+
+def _chunk_size(values: List[Any]) -> int:
+    # Average encoded length of one value plus its separating comma
+    sample = values[:200]
+    avg_len = sum(len(str(v)) for v in sample) / len(sample) + 1
+    return max(1, min(MAX_CHUNK_SIZE, int(URL_BUDGET_CHARS // avg_len)))
+
+
+def select_in(build_query: Callable[[], Any], column: str, values: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Run `build_query().in_(column, chunk)` for size-tuned chunks of `values`
+    with bounded parallelism and return the merged rows.
+
+    `build_query` must return a fresh query builder each call, e.g.
+    `lambda: supabase.table("Products").select("Stock_id, Category")`.
+    """
+    unique = list(dict.fromkeys(v for v in values if v is not None))
+    if not unique:
+        return []
+
+    size = _chunk_size(unique)
+    chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+
+    def run(chunk):
+        return build_query().in_(column, chunk).execute().data or []
+
+    start = time.perf_counter()
+    if len(chunks) == 1:
+        results = [run(chunks[0])]
+    else:
+        results = list(_executor.map(run, chunks))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    rows = [row for part in results for row in part]
+
+    with _metrics_lock:
+        _metrics["calls"] += 1
+        _metrics["chunks"] += len(chunks)
+        _metrics["rows"] += len(rows)
+        _metrics["total_ms"] += elapsed_ms
+        _metrics["max_ms"] = max(_metrics["max_ms"], elapsed_ms)
+        _metrics["last_chunks"] = len(chunks)
+        _metrics["last_ms"] = elapsed_ms
+
+    return rows
+
+
+def get_metrics() -> Dict[str, Any]:
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    calls = snapshot["calls"] or 1
+    snapshot["avg_chunks"] = snapshot["chunks"] / calls
+    snapshot["avg_ms"] = snapshot["total_ms"] / calls
+    return snapshot
@@ -0,0 +1,312 @@
+# app/utils/invalidation_bus.py
+
+import json
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+try:
+    import psycopg
+except ImportError:  # only needed for INVALIDATION_BUS=postgres (pip install "psycopg[binary]")
+    psycopg = None
+
+# Broadcasts cache invalidations to the other workers:
+#   unix      one datagram socket per worker in a shared directory (same host)
+#   postgres  LISTEN/NOTIFY on INVALIDATION_BUS_DSN (across hosts; needs psycopg)
+#   off       local invalidation only
+TRANSPORT = os.getenv("INVALIDATION_BUS", "unix").lower()
+SOCKET_DIR = Path(os.getenv("INVALIDATION_BUS_DIR", Path(tempfile.gettempdir()) / "inventory-cache-bus"))
+PG_DSN = os.getenv("INVALIDATION_BUS_DSN")
+PG_CHANNEL = "cache_invalidation"
+# Postgres connects give up after this; publishes never wait on them (see _PostgresTransport)
+PG_CONNECT_TIMEOUT_SECONDS = 5
+# Broadcasts waiting for the Postgres sender; past this they are dropped
+PG_SEND_QUEUE_SIZE = 1000
+
+# Identifies this worker so it ignores its own broadcasts
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# A peer whose buffer was full is sent a reset this often until it gets one
+RESET_RETRY_SECONDS = 0.5
+RESET_CHANNEL = "*reset*"
+
+_handlers: Dict[str, List[Callable[[List[str]], None]]] = {}
+# Run when this worker may have missed invalidations; drop everything cached
+_reset_handlers: List[Callable[[], None]] = []
+_seq = 0  # sequence number of this worker's last broadcast
+_last_seq: Dict[str, int] = {}  # origin -> last sequence number received
+_lock = threading.Lock()
+_publish_lock = threading.Lock()  # keeps sequence numbers in send order
+_start_lock = threading.Lock()
+_transport = None
+_started = False
+
+_metrics = {
+    "transport": TRANSPORT,
+    "sent": 0,
+    "received": 0,
+    "dropped": 0,
+    "errors": 0,
+    "resets": 0,
+    "last_error": None,
+}
+
+
+def _count(name: str, error: Any = None) -> None:
+    with _lock:
+        _metrics[name] += 1
+        if error is not None:
+            _metrics["last_error"] = str(error)
+
+
+def reset_local(reason: str) -> None:
+    """
+    Drop every cache of this worker (all reset handlers). Used when a
+    broadcast may have been lost, so caches without a TTL cannot stay stale.
+    """
+    print(f"Invalidation Bus: full local invalidation ({reason})")
+    _count("resets")
+    for handler in list(_reset_handlers):
+        try:
+            handler()
+        except Exception as e:
+            print("Invalidation Bus Error:", e)
+
+
+def _dispatch(raw: bytes) -> None:
+    try:
+        event = json.loads(raw)
+    except ValueError:
+        return
+    origin = event.get("origin")
+    if origin == ORIGIN:
+        return
+    _count("received")
+
+    # Every broadcast of a worker is numbered; a gap means this worker missed one
+    seq = event.get("seq")
+    if seq is not None:
+        with _lock:
+            last = _last_seq.get(origin)
+            _last_seq[origin] = max(seq, last or 0)
+        if event.get("channel") == RESET_CHANNEL or (last is not None and seq > last + 1):
+            reset_local(f"missed broadcasts from {origin}")
+            return
+
+    for handler in _handlers.get(event.get("channel"), []):
+        try:
+            handler(event.get("names") or [])
+        except Exception as e:
+            print("Invalidation Bus Error:", e)
+
+
+def _reset_payload() -> bytes:
+    with _lock:
+        seq = _seq
+    return json.dumps({"origin": ORIGIN, "seq": seq, "channel": RESET_CHANNEL, "names": []}).encode()
+
+
+class _UnixSocketTransport:
+    """
+    Same-host fan-out: every worker binds its own socket file in the shared
+    directory and publishers send to all of them. Files are named after ORIGIN
+    (host, pid and a random part), so workers in containers that share the
+    directory but not a PID namespace never pick the same file.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        host, pid, token = ORIGIN.rsplit(":", 2)
+        # Unix socket paths are limited to ~100 bytes, so the hostname is shortened
+        self.path = self.directory / f"{host[:32]}-{pid}-{token}.sock"
+        self.recv_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.recv_sock.bind(str(self.path))
+        self.send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.send_sock.setblocking(False)
+        # Peers that dropped a datagram and still need a reset
+        self.lagging = set()
+        self.lagging_lock = threading.Lock()
+        self.retry_timer = None
+
+    def listen(self) -> None:
+        while True:
+            data = self.recv_sock.recv(65536)
+            _dispatch(data)
+
+    def _send_to(self, peer: Path, payload: bytes) -> bool:
+        try:
+            self.send_sock.sendto(payload, str(peer))
+            _count("sent")
+            return True
+        except ConnectionRefusedError:
+            # Nothing is bound to the file any more, so its worker is gone
+            peer.unlink(missing_ok=True)
+            return True
+        except FileNotFoundError:
+            return True
+        except BlockingIOError:
+            # Peer's receive buffer is full. It would stay stale (caches without
+            # a TTL for good), so it is sent a reset until one gets through.
+            _count("dropped")
+            with self.lagging_lock:
+                first = peer not in self.lagging
+                self.lagging.add(peer)
+            if first:
+                print(f"Invalidation Bus Error: dropped invalidation for {peer.name}; resetting it")
+            self._schedule_retry()
+            return False
+
+    def _schedule_retry(self) -> None:
+        with self.lagging_lock:
+            if self.retry_timer is not None or not self.lagging:
+                return
+            self.retry_timer = threading.Timer(RESET_RETRY_SECONDS, self._retry_lagging)
+            self.retry_timer.daemon = True
+            self.retry_timer.start()
+
+    def _retry_lagging(self) -> None:
+        with self.lagging_lock:
+            self.retry_timer = None
+            peers = list(self.lagging)
+            self.lagging.clear()
+        payload = _reset_payload()
+        for peer in peers:
+            self._send_to(peer, payload)
+
+    def send(self, payload: bytes) -> None:
+        for peer in self.directory.glob("*.sock"):
+            if peer == self.path:
+                continue
+            self._send_to(peer, payload)
+
+
+class _PostgresTransport:
+    """
+    Cross-host fan-out over LISTEN/NOTIFY. Broadcasts are queued and sent by
+    a background thread, so a slow or unreachable database never blocks the
+    write endpoints that publish them.
+    """
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._send_conn = None
+        self._queue: "queue.Queue[bytes]" = queue.Queue(maxsize=PG_SEND_QUEUE_SIZE)
+        threading.Thread(target=self._send_loop, name="invalidation-bus-send", daemon=True).start()
+
+    def _connect(self):
+        return psycopg.connect(self.dsn, autocommit=True, connect_timeout=PG_CONNECT_TIMEOUT_SECONDS)
+
+    def listen(self) -> None:
+        connected_before = False
+        while True:
+            try:
+                with self._connect() as conn:
+                    conn.execute(f"LISTEN {PG_CHANNEL}")
+                    if connected_before:
+                        # Notifications sent while disconnected are lost
+                        reset_local("listener reconnected")
+                    connected_before = True
+                    for notify in conn.notifies():
+                        _dispatch(notify.payload.encode())
+            except Exception as e:
+                _count("errors", e)
+                time.sleep(1)
+
+    def _send_loop(self) -> None:
+        while True:
+            payload = self._queue.get()
+            try:
+                if self._send_conn is None or self._send_conn.closed:
+                    self._send_conn = self._connect()
+                self._send_conn.execute("select pg_notify(%s, %s)", (PG_CHANNEL, payload.decode()))
+                _count("sent")
+            except Exception as e:
+                # Nobody got it; peers see the sequence gap on the next broadcast
+                print("Invalidation Bus Error:", e)
+                self._send_conn = None
+                _count("errors", e)
+
+    def send(self, payload: bytes) -> None:
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            # Peers see the sequence gap on the next broadcast and reset
+            _count("dropped")
+
+
+def start() -> None:
+    """
+    Open the transport and start the listener thread (idempotent).
+    Called at app startup and, lazily, on the first publish.
+    """
+    global _transport, _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+        try:
+            if TRANSPORT == "unix":
+                _transport = _UnixSocketTransport(SOCKET_DIR)
+            elif TRANSPORT == "postgres":
+                if psycopg is None or not PG_DSN:
+                    raise Exception("INVALIDATION_BUS=postgres needs psycopg and INVALIDATION_BUS_DSN")
+                _transport = _PostgresTransport(PG_DSN)
+            else:
+                return
+        except Exception as e:
+            print("Invalidation Bus Error:", e)
+            _count("errors", e)
+            return
+
+        threading.Thread(target=_transport.listen, name="invalidation-bus", daemon=True).start()
+
+
+def subscribe(channel: str, handler: Callable[[List[str]], None]) -> None:
+    """
+    Register a local handler for invalidations broadcast by other workers.
+    Handlers must only invalidate locally (never publish again).
+    """
+    with _lock:
+        _handlers.setdefault(channel, []).append(handler)
+
+
+def subscribe_reset(handler: Callable[[], None]) -> None:
+    """
+    Register a handler that drops everything a module caches. It runs when
+    this worker may have missed a broadcast (see reset_local).
+    """
+    with _lock:
+        _reset_handlers.append(handler)
+
+
+def publish(channel: str, names: List[str]) -> None:
+    """
+    Tell every other worker to run its `channel` handlers for `names`.
+    The caller has already invalidated its own caches.
+    """
+    global _seq
+    start()
+    if _transport is None:
+        return
+    with _publish_lock:
+        with _lock:
+            _seq += 1
+            seq = _seq
+        payload = json.dumps({"origin": ORIGIN, "seq": seq, "channel": channel, "names": list(names)}).encode()
+        _transport.send(payload)
+
+
+def get_metrics() -> Dict[str, Any]:
+    with _lock:
+        snapshot = dict(_metrics)
+    if isinstance(_transport, _UnixSocketTransport):
+        snapshot["peers"] = max(0, len(list(SOCKET_DIR.glob("*.sock"))) - 1)
+    return snapshot
@@ -0,0 +1,123 @@
+# app/utils/lanes.py
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+
+# Workload classes. Each has its own threads, so report exports can never
+# occupy the threads that scan requests run on.
+#   workers      threads (= requests running at once)
+#   max_queue    requests allowed to wait for a thread; None = unbounded
+#   retry_after  Retry-After seconds sent with the 429 when the queue is full
+# Every open dashboard reloads after stock events, so it gets its own lane
+# rather than competing with report exports for two threads.
+LANES = {
+    "scan": {"workers": 16, "max_queue": 256, "retry_after": 1},
+    "crud": {"workers": 8, "max_queue": 64, "retry_after": 2},
+    "dashboard": {"workers": 4, "max_queue": 32, "retry_after": 5},
+    "reports": {"workers": 2, "max_queue": 4, "retry_after": 10},
+}
+
+
+class _Lane:
+    def __init__(self, name: str, workers: int, max_queue: Optional[int], retry_after: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"lane-{name}")
+        # Only touched from the event loop thread (never from the executor), so no lock is needed
+        self.active = 0
+        self.metrics = {"completed": 0, "rejected": 0, "max_active": 0, "max_wait_ms": 0.0}
+
+    def enter(self) -> None:
+        if self.max_queue is not None and self.active >= self.workers + self.max_queue:
+            self.metrics["rejected"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many {self.name} requests, try again shortly",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        self.active += 1
+        self.metrics["max_active"] = max(self.metrics["max_active"], self.active)
+
+    def leave(self, wait_ms: Optional[float]) -> None:
+        self.active -= 1
+        self.metrics["completed"] += 1
+        if wait_ms is not None and wait_ms > self.metrics["max_wait_ms"]:
+            self.metrics["max_wait_ms"] = wait_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": min(self.active, self.workers),
+            "waiting": max(0, self.active - self.workers),
+            **self.metrics,
+        }
+
+
+_lanes = {name: _Lane(name, **cfg) for name, cfg in LANES.items()}
+
+
+def _in_lane(endpoint: Callable, lane: _Lane) -> Callable:
+    # Async endpoints already yield to the loop; only sync ones need a thread
+    if asyncio.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def run(*args, **kwargs):
+        lane.enter()
+        queued_at = time.perf_counter()
+        started_at = []
+
+        def call():
+            # The thread only records when it picked the request up; metrics are updated on the loop
+            started_at.append(time.perf_counter())
+            return endpoint(*args, **kwargs)
+
+        def release(_future) -> None:
+            wait_ms = (started_at[0] - queued_at) * 1000 if started_at else None
+            try:
+                loop.call_soon_threadsafe(lane.leave, wait_ms)
+            except RuntimeError:
+                pass  # loop already closed (shutdown)
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = lane.executor.submit(call)
+        except BaseException:
+            lane.leave(None)
+            raise
+        # The slot is freed when the thread is done, not when this coroutine
+        # ends: a disconnected client cancels the await, but a request already
+        # running keeps its thread busy until it returns
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    return run
+
+
+def route_class(lane_name: str):
+    """
+    APIRoute subclass that runs a router's sync endpoints on the `lane_name`
+    executor instead of the shared threadpool:
+    `APIRouter(prefix=..., route_class=lanes.route_class("scan"))`.
+    """
+    lane = _lanes[lane_name]
+
+    class LaneRoute(APIRoute):
+        def __init__(self, path: str, endpoint: Callable, **kwargs):
+            super().__init__(path, _in_lane(endpoint, lane), **kwargs)
+
+    LaneRoute.__name__ = f"{lane_name.title()}LaneRoute"
+    return LaneRoute
+
+
+def get_metrics() -> Dict[str, Any]:
+    return {name: lane.snapshot() for name, lane in _lanes.items()}
@@ -0,0 +1,18 @@
+# app/utils/like.py
+
+# PostgREST passes like/ilike patterns to Postgres as-is, except that it turns
+# every "*" into "%". Postgres' default LIKE escape character is backslash.
+_ESCAPES = str.maketrans({"\\": "\\\\", "%": "\\%", "_": "\\_", "*": "_"})
+
+
+def escape(value: str) -> str:
+    """
+    Make user input match literally in `.like()` / `.ilike()` filters:
+    `query.ilike("Category", like.escape(category))`,
+    `query.like("name_key", like.escape(prefix) + "%")`.
+
+    "%" and "_" are escaped. A "*" cannot be escaped through PostgREST, so it
+    becomes a single-character wildcard; callers that must be exact re-check
+    the rows when the input contains one.
+    """
+    return (value or "").translate(_ESCAPES)
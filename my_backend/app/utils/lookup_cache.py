@@ -0,0 +1,138 @@
+# app/utils/lookup_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable
+
+from app.database import supabase
+from app.utils.in_query import select_in
+from app.utils import invalidation_bus
+
+# name -> table, key column, cached columns, TTL (seconds), max cached rows
+LOOKUPS = {
+    "clients": {
+        "table": "Clients",
+        "key": "Client_id",
+        "columns": "Client_name",
+        "ttl": 300,
+        "max_size": 50000,
+    },
+    "vendor_keys": {
+        "table": "Vendors",
+        "key": "name_key",
+        "columns": "Vendor_id, Vendor_name",
+        "ttl": 600,
+        "max_size": 10000,
+    },
+}
+
+
+class _Lookup:
+    """Bounded LRU of key -> row with a per-table TTL, filled read-through."""
+
+    def __init__(self, table: str, key: str, columns: str, ttl: float, max_size: int):
+        self.table = table
+        self.key = key
+        self.select = f"{key}, {columns}"
+        self.ttl = ttl
+        self.max_size = max_size
+        self._rows: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._full_until = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _store(self, rows: Iterable[Dict[str, Any]], generation: int) -> None:
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if generation != self._generation:
+                return
+            for row in rows:
+                self._rows[row[self.key]] = (expires, row)
+                self._rows.move_to_end(row[self.key])
+            while len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+                self._full_until = 0.0
+
+    def get_many(self, keys: Iterable[Any]) -> Dict[Any, Dict[str, Any]]:
+        wanted = {k for k in keys if k is not None}
+        found: Dict[Any, Dict[str, Any]] = {}
+        now = time.monotonic()
+
+        with self._lock:
+            generation = self._generation
+            for k in wanted:
+                hit = self._rows.get(k)
+                if hit and hit[0] > now:
+                    self._rows.move_to_end(k)
+                    found[k] = hit[1]
+
+        missing = list(wanted - found.keys())
+        if missing:
+            rows = select_in(lambda: supabase.table(self.table).select(self.select), self.key, missing)
+            self._store(rows, generation)
+            found.update({r[self.key]: r for r in rows})
+        return found
+
+    def get_all(self) -> Dict[Any, Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            if self._full_until > now:
+                return {k: v[1] for k, v in self._rows.items()}
+            generation = self._generation
+
+        rows = supabase.table(self.table).select(self.select).execute().data or []
+        self._store(rows, generation)
+        with self._lock:
+            if generation == self._generation and len(rows) <= self.max_size:
+                self._full_until = time.monotonic() + self.ttl
+        return {r[self.key]: r for r in rows}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._rows.clear()
+            self._full_until = 0.0
+
+
+_lookups = {name: _Lookup(**cfg) for name, cfg in LOOKUPS.items()}
+
+
+def get_many(name: str, keys: Iterable[Any]) -> Dict[Any, Dict[str, Any]]:
+    """
+    Return {key: row} for the given keys, fetching only the
+    keys that are not cached (one IN query).
+    """
+    return _lookups[name].get_many(keys)
+
+
+def get_all(name: str) -> Dict[Any, Dict[str, Any]]:
+    """
+    Return the whole reference table as {key: row}.
+    """
+    return _lookups[name].get_all()
+
+
+def prefetch(*names: str) -> None:
+    """
+    Bulk-load whole reference tables (all of them if no name is given).
+    """
+    for name in names or _lookups.keys():
+        _lookups[name].get_all()
+
+
+def _invalidate_local(names) -> None:
+    for name in names or _lookups.keys():
+        _lookups[name].invalidate()
+
+
+def invalidate(*names: str) -> None:
+    """
+    Drop cached rows in every worker; called by the mutation endpoints of each table.
+    """
+    _invalidate_local(names)
+    invalidation_bus.publish("lookups", names)
+
+
+invalidation_bus.subscribe("lookups", _invalidate_local)
+invalidation_bus.subscribe_reset(lambda: _invalidate_local(None))
@@ -0,0 +1,207 @@
+# app/utils/movement_archive.py
+
+import gzip
+import json
+import os
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import HTTPException
+
+from app.database import supabase
+from app.utils.cache import AggregateCache
+from app.utils.rpc import call_rpc
+from app.utils import data_version
+
+# Months kept in the hot Stock_movement table: the current one plus the
+# previous one, so "this week" / "this month" KPIs never need the archive.
+HOT_MONTHS = 2
+
+# Columnar store, one directory per month with one file per archive run.
+# Archiving deletes the rows from Stock_movement, so these files become the
+# only copy: it is refused unless STOCK_MOVEMENT_ARCHIVE_DIR is set to an
+# existing directory on durable, backed-up storage (e.g. a mounted volume).
+# Without it, already archived files are still read from the default path.
+ARCHIVE_DIR_CONFIGURED = bool(os.getenv("STOCK_MOVEMENT_ARCHIVE_DIR"))
+ARCHIVE_DIR = Path(os.getenv(
+    "STOCK_MOVEMENT_ARCHIVE_DIR",
+    Path(__file__).resolve().parent.parent.parent / "var" / "movement_archive",
+))
+
+# Column order of the archive files (see stock_movement_month_rows in sql/011)
+COLUMNS = (
+    "stock_id",
+    "movement_type",
+    "scan_date",
+    "client_id",
+    "delivery_order_no",
+    "delivery_mode",
+    "undo_reason",
+    "item_id",
+    "product_name",
+    "batch_code",
+    "size",
+    "category",
+    "colour",
+    "client_name",
+)
+
+_watermark_cache = AggregateCache(300, name="movement_watermark")
+_summary_cache = AggregateCache(300, name="movement_summary")
+_archive_lock = threading.Lock()
+_parts: Dict[Path, tuple] = {}  # path -> (mtime, columns)
+_parts_lock = threading.Lock()
+
+
+def _month_start(d: date, months_back: int = 0) -> date:
+    index = d.year * 12 + d.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _write_part(month: str, rows: List[Dict[str, Any]]) -> Path:
+    month_dir = ARCHIVE_DIR / month[:7]
+    month_dir.mkdir(parents=True, exist_ok=True)
+    part = month_dir / f"part-{len(list(month_dir.glob('part-*.json.gz'))):04d}.json.gz"
+
+    payload = {
+        "month": month[:7],
+        "rows": len(rows),
+        "columns": {name: [r.get(name) for r in rows] for name in COLUMNS},
+    }
+    tmp = part.with_suffix(".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(payload, f, default=str)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, part)
+    return part
+
+
+def _check_archive_dir() -> None:
+    if not ARCHIVE_DIR_CONFIGURED:
+        raise HTTPException(
+            status_code=409,
+            detail="Archiving deletes Stock_movement rows; set STOCK_MOVEMENT_ARCHIVE_DIR "
+                   "to durable, backed-up storage first",
+        )
+    # Never created here: a missing mount must not fall back to the local disk
+    if not ARCHIVE_DIR.is_dir() or not os.access(ARCHIVE_DIR, os.W_OK):
+        raise HTTPException(
+            status_code=409,
+            detail=f"STOCK_MOVEMENT_ARCHIVE_DIR ({ARCHIVE_DIR}) is not an existing, writable directory",
+        )
+
+
+def _read_part(path: Path) -> Dict[str, List[Any]]:
+    # Parts are immutable once written; cache them per mtime
+    mtime = path.stat().st_mtime
+    with _parts_lock:
+        hit = _parts.get(path)
+        if hit and hit[0] == mtime:
+            return hit[1]
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        columns = json.load(f)["columns"]
+    with _parts_lock:
+        _parts[path] = (mtime, columns)
+    return columns
+
+
+def hot_start() -> Optional[str]:
+    """
+    First Scan_date still held in the hot table (ISO date), or None when
+    nothing has been archived yet. Hot queries filter with `.gte("Scan_date", ...)`.
+    """
+    def compute():
+        res = supabase.table("stock_movement_archive_log") \
+            .select("month") \
+            .order("month", desc=True) \
+            .limit(1) \
+            .execute()
+        if not res.data:
+            return None
+        newest = date.fromisoformat(res.data[0]["month"])
+        return _month_start(newest, -1).isoformat()
+
+    return _watermark_cache.get_or_compute("hot_start", compute)
+
+
+def version() -> tuple:
+    """
+    Changes whenever archived history changes (a month is closed or another
+    part file appears), including archive runs by other processes.
+    """
+    parts = list(ARCHIVE_DIR.glob("*/part-*.json.gz")) if ARCHIVE_DIR.exists() else []
+    newest = max((p.stat().st_mtime for p in parts), default=0)
+    return (hot_start(), len(parts), newest)
+
+
+def monthly_summary(movement_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Per (month, movement_type, category) counts for archived months.
+    """
+    def compute():
+        return supabase.table("stock_movement_monthly") \
+            .select("month, movement_type, category, movements, standing") \
+            .execute().data or []
+
+    rows = _summary_cache.get_or_compute("all", compute)
+    if movement_type is None:
+        return rows
+    return [r for r in rows if r["movement_type"] == movement_type]
+
+
+def iter_rows(movement_type: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Archived movement rows, newest month first, read from the columnar store.
+    """
+    if not ARCHIVE_DIR.exists():
+        return
+    for month_dir in sorted(ARCHIVE_DIR.iterdir(), reverse=True):
+        if not month_dir.is_dir():
+            continue
+        month_rows = []
+        for part in month_dir.glob("part-*.json.gz"):
+            columns = _read_part(part)
+            types = columns["movement_type"]
+            for i in range(len(types)):
+                if movement_type is None or types[i] == movement_type:
+                    month_rows.append({name: columns[name][i] for name in COLUMNS})
+        month_rows.sort(key=lambda r: r["scan_date"] or "", reverse=True)
+        yield from month_rows
+
+
+def archive_closed_months() -> List[Dict[str, Any]]:
+    """
+    Export every month older than the hot window to the columnar store, then
+    summarise and delete it from Stock_movement. Safe to re-run: a month that
+    received late rows (e.g. an offline scan sync) gets another part file.
+
+    The part files are the only copy of the deleted rows; ARCHIVE_DIR must be
+    on durable storage that is backed up (see _check_archive_dir).
+    """
+    _check_archive_dir()
+    cutoff = _month_start(date.today(), HOT_MONTHS - 1)
+    results = []
+
+    with _archive_lock:
+        months = call_rpc("stock_movement_open_months", {"p_before": cutoff.isoformat()}) or []
+        for month in months:
+            rows = call_rpc("stock_movement_month_rows", {"p_month": month}) or []
+            part = _write_part(month, rows)
+            try:
+                # Read the part back before the rows are deleted
+                if len(_read_part(part)["movement_type"]) != len(rows):
+                    raise Exception(f"Archive part {part} does not match the exported rows")
+                results.append(call_rpc("stock_movement_close_month", {"p_month": month, "p_expected": len(rows)}))
+            except Exception:
+                # Rows were added meanwhile (or the part is bad); drop it and retry on the next run
+                part.unlink(missing_ok=True)
+                raise
+
+    if results:
+        _watermark_cache.invalidate()
+        _summary_cache.invalidate()
+        data_version.bump("Stock_movement")
+    return results
@@ -0,0 +1,262 @@
+# app/utils/movement_log.py
+
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.database import supabase
+from app.utils import data_version
+
+# Write-behind is opt-in; without it every movement row is inserted inline
+WRITE_BEHIND = os.getenv("STOCK_MOVEMENT_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+
+# Flush when this many rows are pending, or when the oldest one is this old
+FLUSH_BATCH_SIZE = 200
+FLUSH_INTERVAL_SECONDS = 2.0
+# Past this the caller flushes inline instead of growing the buffer
+MAX_PENDING = 20000
+
+# Each worker appends to its own journal segment (<pid>-<token>-<n>.jsonl) in
+# this directory. A segment is deleted only once all its rows are flushed, and
+# segments left by a dead worker are adopted by a live one.
+JOURNAL_DIR = Path(os.getenv(
+    "STOCK_MOVEMENT_JOURNAL_DIR",
+    Path(__file__).resolve().parent.parent.parent / "var" / "stock_movement_journal",
+))
+# Single-file journal written by earlier versions; adopted like an orphan segment
+LEGACY_JOURNAL_PATH = JOURNAL_DIR.parent / "stock_movement_journal.jsonl"
+
+_TOKEN = uuid.uuid4().hex[:8]
+
+_pending: List[Dict[str, Any]] = []  # rows not yet written, oldest first
+_pending_since: List[float] = []  # monotonic enqueue time of each pending row
+_sealed: List[Path] = []  # segments whose rows are all in _pending
+_segment = None  # open file of the segment new rows are appended to
+_segment_path = None
+_segment_count = 0
+_journal_lock = threading.Lock()  # journal files; taken before _lock
+_lock = threading.Lock()  # pending rows and metrics; never held during I/O
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_worker = None
+
+_metrics = {
+    "enabled": WRITE_BEHIND,
+    "queued": 0,
+    "flushed": 0,
+    "flushes": 0,
+    "failed_flushes": 0,
+    "recovered": 0,
+    "last_flush_rows": 0,
+    "last_flush_ms": 0.0,
+    "last_lag_s": 0.0,
+    "max_lag_s": 0.0,
+    "last_error": None,
+}
+
+
+def _read_segment(path: Path) -> List[Dict[str, Any]]:
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                # Torn last line from a crash mid-append (never acknowledged)
+                print("Movement Journal Error: skipped unreadable line")
+    return rows
+
+
+def _new_segment_path() -> Path:
+    global _segment_count
+    _segment_count += 1
+    return JOURNAL_DIR / f"{os.getpid()}-{_TOKEN}-{_segment_count}.jsonl"
+
+
+def _owner_alive(path: Path) -> bool:
+    pid, _, rest = path.name.partition("-")
+    if rest.startswith(_TOKEN + "-"):
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _recover() -> None:
+    """
+    Adopt journal segments of workers that are gone (and the legacy journal):
+    rename them into this worker's name, then queue their rows. The rename is
+    atomic, so two workers never adopt the same segment. log_id makes
+    re-sending rows that were already written safe.
+    """
+    if not JOURNAL_DIR.exists() and not LEGACY_JOURNAL_PATH.exists():
+        return
+    candidates = [p for p in JOURNAL_DIR.glob("*.jsonl") if not _owner_alive(p)] if JOURNAL_DIR.exists() else []
+    if LEGACY_JOURNAL_PATH.exists():
+        candidates.append(LEGACY_JOURNAL_PATH)
+    if not candidates:
+        return
+
+    JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+    for orphan in candidates:
+        with _journal_lock:
+            adopted = _new_segment_path()
+            try:
+                os.rename(orphan, adopted)
+            except FileNotFoundError:
+                continue  # another worker adopted it first
+            rows = _read_segment(adopted)
+            now = time.monotonic()
+            with _lock:
+                _sealed.append(adopted)
+                _pending.extend(rows)
+                _pending_since.extend([now] * len(rows))
+                _metrics["recovered"] += len(rows)
+
+
+def _append_journal(row: Dict[str, Any]) -> None:
+    # Called with _journal_lock held; the row is on disk before log() returns
+    global _segment, _segment_path
+    if _segment is None:
+        JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+        _segment_path = _new_segment_path()
+        _segment = open(_segment_path, "a", encoding="utf-8")
+    _segment.write(json.dumps(row, default=str) + "\n")
+    _segment.flush()
+    os.fsync(_segment.fileno())
+
+
+def _seal_segment() -> None:
+    # Called with _journal_lock held; later rows go to a new segment
+    global _segment, _segment_path
+    if _segment is None:
+        return
+    _segment.close()
+    with _lock:
+        _sealed.append(_segment_path)
+    _segment = None
+    _segment_path = None
+
+
+def flush() -> int:
+    """
+    Write all pending rows as multi-row inserts. Returns the number written.
+    Rows stay pending (and journaled) if the insert fails.
+    """
+    with _flush_lock:
+        # Everything pending now lives in sealed segments
+        with _journal_lock:
+            _seal_segment()
+            with _lock:
+                batch = list(_pending)
+                oldest = _pending_since[0] if _pending_since else None
+                segments = list(_sealed)
+        if not batch:
+            for path in segments:
+                path.unlink(missing_ok=True)
+            with _lock:
+                del _sealed[:len(segments)]
+            return 0
+
+        start = time.perf_counter()
+        try:
+            for i in range(0, len(batch), FLUSH_BATCH_SIZE):
+                supabase.table("Stock_movement") \
+                    .upsert(batch[i:i + FLUSH_BATCH_SIZE], on_conflict="log_id", ignore_duplicates=True) \
+                    .execute()
+        except Exception as e:
+            print("Movement Flush Error:", e)
+            with _lock:
+                _metrics["failed_flushes"] += 1
+                _metrics["last_error"] = str(e)
+            return 0
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with _lock:
+            del _pending[:len(batch)]
+            del _pending_since[:len(batch)]
+            del _sealed[:len(segments)]
+            lag = time.monotonic() - oldest
+            _metrics["flushed"] += len(batch)
+            _metrics["flushes"] += 1
+            _metrics["last_flush_rows"] = len(batch)
+            _metrics["last_flush_ms"] = elapsed_ms
+            _metrics["last_lag_s"] = lag
+            _metrics["max_lag_s"] = max(_metrics["max_lag_s"], lag)
+            _metrics["last_error"] = None
+        for path in segments:
+            path.unlink(missing_ok=True)
+
+        data_version.bump("Stock_movement")
+        return len(batch)
+
+
+def _run() -> None:
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL_SECONDS)
+        _wakeup.clear()
+        try:
+            _recover()
+        except OSError as e:
+            print("Movement Journal Error:", e)
+        flush()
+
+
+def _ensure_worker() -> None:
+    global _worker
+    with _lock:
+        if _worker is not None:
+            return
+        _worker = threading.Thread(target=_run, name="movement-log", daemon=True)
+    _recover()
+    _worker.start()
+
+
+def log(row: Dict[str, Any]) -> None:
+    """
+    Record one Stock_movement row.
+
+    With STOCK_MOVEMENT_WRITE_BEHIND set, the row is journaled locally and
+    written by a background flusher, so the scan response does not wait on
+    the audit insert. Otherwise it is inserted immediately.
+    """
+    if not WRITE_BEHIND:
+        supabase.table("Stock_movement").insert(row).execute()
+        data_version.bump("Stock_movement")
+        return
+
+    _ensure_worker()
+    row = {**row, "log_id": str(uuid.uuid4())}
+    with _journal_lock:
+        _append_journal(row)
+        with _lock:
+            _pending.append(row)
+            _pending_since.append(time.monotonic())
+            _metrics["queued"] += 1
+            pending = len(_pending)
+
+    if pending >= MAX_PENDING:
+        flush()
+    elif pending >= FLUSH_BATCH_SIZE:
+        _wakeup.set()
+
+
+def get_metrics() -> Dict[str, Any]:
+    with _lock:
+        snapshot = dict(_metrics)
+        snapshot["pending"] = len(_pending)
+        snapshot["sealed_segments"] = len(_sealed)
+        # Current flush lag: age of the oldest row still waiting
+        snapshot["lag_s"] = time.monotonic() - _pending_since[0] if _pending_since else 0.0
+    return snapshot
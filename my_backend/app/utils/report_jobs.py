@@ -0,0 +1,177 @@
+# app/utils/report_jobs.py
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+MAX_WORKERS = 2
+# Jobs allowed to wait for a worker before submissions get a 429
+MAX_QUEUED = 20
+# Finished results (and failed job records) are kept this long
+RESULT_TTL_SECONDS = 60 * 60
+# A job still "running" after this is treated as lost (worker restarted)
+JOB_TIMEOUT_SECONDS = 30 * 60
+# Identical submissions share a job only within this window, bounding staleness
+# from writes the data version does not see (e.g. direct Supabase updates)
+DEDUP_WINDOW_SECONDS = 5 * 60
+
+# data_version counters restart at 0 with the process, so job ids include this
+# process' identity; otherwise a restarted worker could be handed an old result
+_PROCESS_EPOCH = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+JOBS_DIR = Path(os.getenv(
+    "REPORT_JOBS_DIR",
+    Path(__file__).resolve().parent.parent.parent / "var" / "report_jobs",
+))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="report-job")
+_lock = threading.Lock()
+_queued = 0
+
+
+def _meta_path(job_id: str) -> Path:
+    return JOBS_DIR / f"{job_id}.json"
+
+
+def _result_path(job_id: str) -> Path:
+    return JOBS_DIR / f"{job_id}.result.json.gz"
+
+
+def _write_meta(job: Dict[str, Any]) -> None:
+    # Job records live on disk so any worker on the host can answer a poll
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = JOBS_DIR / f"{job['job_id']}.{uuid.uuid4().hex}.tmp"
+    tmp.write_text(json.dumps(job, default=str), encoding="utf-8")
+    os.replace(tmp, _meta_path(job["job_id"]))
+
+
+def _read_meta(job_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(_meta_path(job_id).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _is_live(job: Dict[str, Any], now: float) -> bool:
+    if job["status"] in ("queued", "running"):
+        return now - job["submitted_at"] < JOB_TIMEOUT_SECONDS
+    if job["status"] == "done":
+        return job["expires_at"] > now
+    return False
+
+
+def _sweep(now: float) -> None:
+    if not JOBS_DIR.exists():
+        return
+    for meta in JOBS_DIR.glob("*.json"):
+        try:
+            job = json.loads(meta.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            continue
+        if not _is_live(job, now) and now - job["submitted_at"] > RESULT_TTL_SECONDS:
+            meta.unlink(missing_ok=True)
+            _result_path(job["job_id"]).unlink(missing_ok=True)
+
+
+def _run(job: Dict[str, Any], compute: Callable[[], Any]) -> None:
+    global _queued
+    with _lock:
+        _queued -= 1
+
+    job.update(status="running", started_at=time.time())
+    _write_meta(job)
+    try:
+        result = compute()
+        raw = json.dumps(result, default=str).encode()
+        tmp = JOBS_DIR / f"{job['job_id']}.{uuid.uuid4().hex}.tmp"
+        with gzip.open(tmp, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, _result_path(job["job_id"]))
+        job.update(
+            status="done",
+            finished_at=time.time(),
+            expires_at=time.time() + RESULT_TTL_SECONDS,
+            rows=len(result) if isinstance(result, list) else None,
+            bytes=len(raw),
+        )
+    except Exception as e:
+        print("Report Job Error:", e)
+        job.update(status="failed", finished_at=time.time(), error=str(e))
+    _write_meta(job)
+
+
+def submit(report: str, params: Dict[str, Any], compute: Callable[[], Any], data_version: tuple = ()) -> Dict[str, Any]:
+    """
+    Queue `compute` as a background job and return its record. Identical
+    submissions (same report, params and data version, on this worker, within
+    DEDUP_WINDOW_SECONDS) share one job while it is queued, running, or its
+    result has not expired.
+    """
+    global _queued
+    now = time.time()
+    key = json.dumps({
+        "report": report,
+        "params": params,
+        "version": list(data_version),
+        "epoch": _PROCESS_EPOCH,
+        "window": int(now // DEDUP_WINDOW_SECONDS),
+    }, sort_keys=True, default=str)
+    job_id = hashlib.sha256(key.encode()).hexdigest()[:24]
+
+    with _lock:
+        existing = _read_meta(job_id)
+        if existing and _is_live(existing, now):
+            return existing
+
+        if _queued >= MAX_QUEUED:
+            raise HTTPException(status_code=429, detail="Too many report jobs queued", headers={"Retry-After": "30"})
+        _queued += 1
+
+        job = {
+            "job_id": job_id,
+            "report": report,
+            "params": params,
+            "status": "queued",
+            "submitted_at": now,
+        }
+        _write_meta(job)
+
+    _sweep(now)
+    _executor.submit(_run, dict(job), compute)
+    return job
+
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    job = _read_meta(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in ("queued", "running") and time.time() - job["submitted_at"] >= JOB_TIMEOUT_SECONDS:
+        job.update(status="failed", error="Job was lost (worker restarted or timed out)")
+    return job
+
+
+def get_result(job_id: str) -> bytes:
+    """The gzip-compressed JSON result of a finished job."""
+    job = get_job(job_id)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    if job["expires_at"] <= time.time():
+        raise HTTPException(status_code=410, detail="Job result expired")
+    try:
+        return _result_path(job_id).read_bytes()
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="Job result expired")
+
+
+def get_metrics() -> Dict[str, Any]:
+    with _lock:
+        return {"workers": MAX_WORKERS, "queued": _queued}
@@ -0,0 +1,20 @@
+# app/utils/rpc.py
+
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from app.database import supabase
+
+
+def call_rpc(fn_name: str, params: dict):
+    """
+    Call a Postgres function (see my_backend/sql/) in one round-trip.
+    Functions raise errors with PostgREST "PTxxx" codes, which are
+    turned back into an HTTPException with status xxx.
+    """
+    try:
+        return supabase.rpc(fn_name, params).execute().data
+    except APIError as e:
+        code = str(e.code or "")
+        if code.startswith("PT") and code[2:].isdigit():
+            raise HTTPException(status_code=int(code[2:]), detail=e.message)
+        raise
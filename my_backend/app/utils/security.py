@@ -0,0 +1,146 @@
+# app/utils/security.py
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import jwt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+JWT_ALGORITHM = "HS256"
+ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", str(12 * 60 * 60)))
+
+# Every API router requires a bearer token (see main.py) unless AUTH_REQUIRED
+# is explicitly turned off. Secure by default: the frontend already sends the
+# login token with every backend request (services/apiAuth.js). Turning it off
+# reopens the whole API and is meant for local development only.
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "true").lower() not in ("0", "false", "no")
+if not AUTH_REQUIRED:
+    print("⚠️ AUTH_REQUIRED is off; the API accepts requests without a token")
+
+# Event streams (EventSource) cannot send headers, so they authenticate with a
+# ticket in the URL instead of the login token. Tickets only open a stream and
+# expire quickly, so one leaked through an access log is of little use.
+STREAM_TICKET_TTL_SECONDS = 60
+STREAM_TICKET_AUDIENCE = "stock-events"
+
+# Verified tokens, so a scan request skips the HMAC check and claim parsing
+VERIFIED_CACHE_SIZE = 4096
+
+_secret = os.getenv("JWT_SECRET")
+if not _secret:
+    # Tokens then only verify in this process; set JWT_SECRET with several workers
+    print("⚠️ JWT_SECRET not set; using a random per-process secret")
+    _secret = secrets.token_urlsafe(32)
+
+_hasher = PasswordHasher()
+_dummy_hash = None  # verified against for unknown emails, so timing does not reveal accounts
+_verified: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # token -> claims
+_lock = threading.Lock()
+_bearer = HTTPBearer(auto_error=False)
+
+
+def hash_password(password: str) -> str:
+    """Argon2id hash (CPU heavy: call through run_in_threadpool from async code)."""
+    return _hasher.hash(password)
+
+
+def verify_password(password_hash: Optional[str], password: str) -> bool:
+    """
+    Check a password against its argon2 hash (CPU heavy, like hash_password).
+    With no hash (unknown account) the same work is done against a dummy hash
+    and False is returned.
+    """
+    global _dummy_hash
+    if password_hash is None:
+        if _dummy_hash is None:
+            _dummy_hash = _hasher.hash(secrets.token_urlsafe(16))
+        try:
+            _hasher.verify(_dummy_hash, password)
+        except (VerificationError, InvalidHashError):
+            pass
+        return False
+    try:
+        return _hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def create_access_token(user: Dict[str, Any]) -> str:
+    now = int(time.time())
+    claims = {
+        "sub": str(user["user_id"]),
+        "email": user["email"],
+        "role": user.get("role") or "staff",
+        "iat": now,
+        "exp": now + ACCESS_TOKEN_TTL_SECONDS,
+    }
+    return jwt.encode(claims, _secret, algorithm=JWT_ALGORITHM)
+
+
+def verify_token(token: str) -> Dict[str, Any]:
+    """
+    Return the claims of a valid token or raise 401. Tokens whose signature
+    was already verified are served from a small LRU; only `exp` is re-checked.
+    """
+    now = time.time()
+    with _lock:
+        claims = _verified.get(token)
+        if claims is not None:
+            if claims["exp"] > now:
+                _verified.move_to_end(token)
+                return claims
+            del _verified[token]
+
+    try:
+        claims = jwt.decode(token, _secret, algorithms=[JWT_ALGORITHM], options={"require": ["exp", "sub"]})
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+
+    with _lock:
+        _verified[token] = claims
+        while len(_verified) > VERIFIED_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return claims
+
+
+def create_stream_ticket(claims: Dict[str, Any]) -> str:
+    """Short-lived ticket for `claims`' user that only opens event streams."""
+    now = int(time.time())
+    ticket = {
+        "sub": claims["sub"],
+        "aud": STREAM_TICKET_AUDIENCE,
+        "iat": now,
+        "exp": now + STREAM_TICKET_TTL_SECONDS,
+    }
+    return jwt.encode(ticket, _secret, algorithm=JWT_ALGORITHM)
+
+
+def verify_stream_ticket(ticket: str) -> Dict[str, Any]:
+    """Claims of a valid stream ticket or 401. Login tokens are not accepted."""
+    try:
+        return jwt.decode(
+            ticket, _secret, algorithms=[JWT_ALGORITHM],
+            audience=STREAM_TICKET_AUDIENCE, options={"require": ["exp", "sub", "aud"]},
+        )
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired stream ticket")
+
+
+def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> Dict[str, Any]:
+    """Dependency: claims of the bearer token, 401 without a valid one."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return verify_token(credentials.credentials)
+
+
+def require_admin(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+    return user
@@ -0,0 +1,103 @@
+# app/utils/stock_events.py
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from app.utils import invalidation_bus
+
+# Events buffered per subscriber before it counts as a slow consumer
+QUEUE_SIZE = 256
+
+_subscribers: Set["Subscriber"] = set()
+_lock = threading.Lock()
+_metrics = {"published": 0, "failed": 0, "delivered": 0, "resyncs": 0}
+
+
+class Subscriber:
+    """
+    One open event stream. Events are put on its queue from the event loop;
+    when the consumer falls behind, the backlog is dropped and replaced by a
+    single "resync" event telling the client to reload instead.
+    """
+
+    def __init__(self, categories: Optional[Set[str]]):
+        self.categories = categories
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        if self.categories is None or event.get("category") is None:
+            return True
+        return event["category"].lower() in self.categories
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(event)
+            _metrics["delivered"] += 1
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "at": time.time()})
+            _metrics["resyncs"] += 1
+
+
+def subscribe(categories: Optional[List[str]] = None) -> Subscriber:
+    """Register a stream (call from the event loop). `categories` None = all."""
+    sub = Subscriber({c.lower() for c in categories} if categories else None)
+    with _lock:
+        _subscribers.add(sub)
+    return sub
+
+
+def unsubscribe(sub: Subscriber) -> None:
+    with _lock:
+        _subscribers.discard(sub)
+
+
+def _fan_out(event: Dict[str, Any]) -> None:
+    with _lock:
+        subs = list(_subscribers)
+    for sub in subs:
+        if sub.wants(event):
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:
+                # Its loop has closed (worker shutting down); the stream is gone
+                unsubscribe(sub)
+
+
+def publish(event_type: str, **fields: Any) -> None:
+    """
+    Publish a stock event (mark_out, sale, return, undo, ...) to the open
+    streams of every worker. Safe to call from sync handlers.
+
+    Never raises: it runs after the write has committed, and a lost event only
+    means open screens miss a live update, so failures are logged and counted.
+    """
+    event = {"type": event_type, "at": time.time(), **fields}
+    try:
+        _fan_out(event)
+        invalidation_bus.publish("stock_events", [json.dumps(event, default=str)])
+        _metrics["published"] += 1
+    except Exception as e:
+        _metrics["failed"] += 1
+        print("Stock Event Publish Error:", e)
+
+
+def _from_other_worker(payloads: List[str]) -> None:
+    for payload in payloads:
+        _fan_out(json.loads(payload))
+
+
+invalidation_bus.subscribe("stock_events", _from_other_worker)
+# Events from other workers may have been lost; open screens reload
+invalidation_bus.subscribe_reset(lambda: _fan_out({"type": "resync", "at": time.time()}))
+
+
+def get_metrics() -> Dict[str, Any]:
+    with _lock:
+        return {"subscribers": len(_subscribers), **_metrics}
@@ -0,0 +1,315 @@
+-- sql/001_po_upsert.sql
+--
+-- Single round-trip, transactional create/update of a purchase order.
+-- Called from routers/purchase_orders.py through supabase.rpc("po_upsert", ...).
+-- PostgREST runs every RPC call inside one transaction, so either the whole
+-- order (vendor, header, charges, items, payment, status) is written or nothing is.
+--
+-- Errors are raised with PostgREST "PTxxx" codes so they surface as HTTP xxx.
+-- The file is plain PL/pgSQL and can be applied to a local Postgres as-is.
+
+create table if not exists po_idempotency (
+    idempotency_key text primary key,
+    po_id bigint not null,
+    response jsonb not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists po_idempotency_created_at_idx
+    on po_idempotency (created_at);
+
+-- Charges are always the same four types per PO, so they can be upserted in bulk.
+create unique index if not exists purchase_order_charges_po_type_key
+    on purchase_order_charges (po_id, charge_type);
+
+-- Mirrors get_payment_status() in routers/purchase_orders.py
+create or replace function po_payment_status(p_paid numeric, p_total numeric)
+returns text
+language sql
+immutable
+as $$
+    select case
+        when p_total <= 0 or p_paid <= 0 then 'Unpaid'
+        when p_paid < p_total then 'Partial Paid'
+        when abs(p_paid - p_total) < 0.01 then 'Full Paid'
+        else 'Unpaid'
+    end
+$$;
+
+-- Find a vendor by name (case-insensitive) or create it; returns Vendor_id or null.
+create or replace function po_resolve_vendor(p_vendor jsonb)
+returns bigint
+language plpgsql
+as $$
+declare
+    v_vendor_id bigint;
+begin
+    if coalesce(trim(p_vendor->>'Vendor_name'), '') = '' then
+        return null;
+    end if;
+
+    select "Vendor_id" into v_vendor_id
+    from "Vendors"
+    where lower("Vendor_name") = lower(trim(p_vendor->>'Vendor_name'))
+    limit 1;
+
+    if v_vendor_id is null then
+        insert into "Vendors" (
+            "Vendor_name", "Address_line", "Address_location", "Address_city",
+            "Address_state", "Postal_code", "Country", "Vat_number"
+        ) values (
+            trim(p_vendor->>'Vendor_name'),
+            coalesce(p_vendor->>'Address_line', ''),
+            coalesce(p_vendor->>'Address_location', ''),
+            coalesce(p_vendor->>'Address_city', ''),
+            coalesce(p_vendor->>'Address_state', ''),
+            coalesce(p_vendor->>'Postal_code', ''),
+            coalesce(p_vendor->>'Country', ''),
+            coalesce(p_vendor->>'Vat_number', '')
+        )
+        returning "Vendor_id" into v_vendor_id;
+    end if;
+
+    return v_vendor_id;
+end;
+$$;
+
+create or replace function po_upsert(
+    p_po_id bigint,
+    p_vendor jsonb,
+    p_po jsonb,
+    p_charges jsonb,
+    p_items jsonb,
+    p_payment jsonb default null,
+    p_idempotency_key text default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+    v_vendor_id bigint;
+    v_po_id bigint;
+    v_currency text;
+    v_existing "Purchase_orders";
+    v_header "Purchase_orders";
+    v_pay "Payments";
+    v_bad_item text;
+    v_incoming_ids bigint[];
+    v_idempotency_key text;
+begin
+    -- 0. Idempotency: a retried submission returns the stored response.
+    --    Keys are scoped to the operation (create, or update of this PO), so a
+    --    client reusing a key for another PO never gets that PO's result.
+    if p_idempotency_key is not null then
+        v_idempotency_key := case
+            when p_po_id is null then 'create:'
+            else 'update:' || p_po_id || ':'
+        end || p_idempotency_key;
+
+        perform pg_advisory_xact_lock(hashtext('po_upsert:' || v_idempotency_key));
+        select response into v_result
+        from po_idempotency
+        where idempotency_key = v_idempotency_key;
+        if found then
+            return v_result;
+        end if;
+    end if;
+
+    v_header := jsonb_populate_record(null::"Purchase_orders", p_po);
+
+    if p_po_id is null then
+        -- ---------- CREATE (or re-sync an existing invoice) ----------
+        v_currency := coalesce(v_header.currency, 'INR');
+
+        -- 1. Vendor
+        v_vendor_id := po_resolve_vendor(p_vendor);
+
+        if v_vendor_id is null then
+            raise exception 'Vendor ID could not be determined' using errcode = 'PT400';
+        end if;
+
+        -- 2. Purchase Order (same invoice number re-syncs the existing PO)
+        perform pg_advisory_xact_lock(hashtext('po_invoice:' || v_header."Po_invoice_no"));
+
+        select "Po_id" into v_po_id
+        from "Purchase_orders"
+        where "Po_invoice_no" = v_header."Po_invoice_no"
+        for update;
+
+        if v_po_id is not null then
+            update "Purchase_orders" set
+                "Po_date" = v_header."Po_date",
+                "Notes" = v_header."Notes",
+                currency = v_currency,
+                "Total_sqmt" = v_header."Total_sqmt",
+                "Landing_cost" = v_header."Landing_cost"
+            where "Po_id" = v_po_id;
+        else
+            insert into "Purchase_orders" (
+                "Po_invoice_no", "Po_date", "Notes", "Vendor_id",
+                currency, "Total_sqmt", "Landing_cost"
+            ) values (
+                v_header."Po_invoice_no", v_header."Po_date", v_header."Notes", v_vendor_id,
+                v_currency, v_header."Total_sqmt", v_header."Landing_cost"
+            )
+            returning "Po_id" into v_po_id;
+        end if;
+
+        -- 3. Items (replace wholesale while no batch has been created)
+        if not exists (
+            select 1 from "Purchase_order_items"
+            where "Po_id" = v_po_id and "Batch_created"
+        ) then
+            delete from "Purchase_order_items" where "Po_id" = v_po_id;
+
+            insert into "Purchase_order_items" (
+                "Po_id", "Item_name", "Category", "Quantity_ordered", "Unit_price",
+                "Total_price", "Height", "Width", "Thickness", sqmt, "Colour",
+                "Arrival_status", "Batch_created", "Batch_code", "Edit_count", currency
+            )
+            select
+                v_po_id, i."Item_name", i."Category", i."Quantity_ordered", i."Unit_price",
+                i."Total_price", i."Height", i."Width", i."Thickness", i.sqmt, i."Colour",
+                'ordered', false, null, 0, v_currency
+            from jsonb_populate_recordset(null::"Purchase_order_items", p_items) i;
+        end if;
+    else
+        -- ---------- UPDATE ----------
+        select * into v_existing
+        from "Purchase_orders"
+        where "Po_id" = p_po_id
+        for update;
+
+        if not found then
+            raise exception 'Order not found' using errcode = 'PT404';
+        end if;
+
+        v_po_id := p_po_id;
+        v_currency := coalesce(v_existing.currency, 'INR');
+
+        if v_header.currency is not null
+           and v_header.currency is distinct from v_existing.currency
+           and exists (select 1 from "Payments" where "Po_id" = v_po_id) then
+            raise exception 'Cannot change currency after payments exist' using errcode = 'PT400';
+        end if;
+
+        -- 1. Vendor
+        if v_existing."Vendor_id" is not null and p_vendor is not null then
+            update "Vendors" set
+                "Vendor_name" = p_vendor->>'Vendor_name',
+                "Address_line" = p_vendor->>'Address_line',
+                "Address_location" = p_vendor->>'Address_location',
+                "Address_city" = p_vendor->>'Address_city',
+                "Address_state" = p_vendor->>'Address_state',
+                "Postal_code" = p_vendor->>'Postal_code',
+                "Country" = p_vendor->>'Country',
+                "Vat_number" = p_vendor->>'Vat_number'
+            where "Vendor_id" = v_existing."Vendor_id";
+        end if;
+
+        -- 2. PO header
+        update "Purchase_orders" set
+            "Po_invoice_no" = v_header."Po_invoice_no",
+            "Po_date" = v_header."Po_date",
+            "Notes" = v_header."Notes",
+            "Total_sqmt" = v_header."Total_sqmt",
+            "Landing_cost" = v_header."Landing_cost"
+        where "Po_id" = v_po_id;
+
+        -- 3. Items: delete removed, bulk update existing, bulk insert new
+        select coalesce(array_agg(i."Po_item_id"), '{}')
+        into v_incoming_ids
+        from jsonb_populate_recordset(null::"Purchase_order_items", p_items) i
+        where i."Po_item_id" is not null;
+
+        select "Item_name" into v_bad_item
+        from "Purchase_order_items"
+        where "Po_id" = v_po_id
+          and "Batch_created"
+          and not ("Po_item_id" = any (v_incoming_ids))
+        limit 1;
+
+        if found then
+            raise exception 'Cannot delete item % because batch created.', v_bad_item
+                using errcode = 'PT400';
+        end if;
+
+        delete from "Purchase_order_items"
+        where "Po_id" = v_po_id
+          and not ("Po_item_id" = any (v_incoming_ids));
+
+        update "Purchase_order_items" t set
+            "Item_name" = i."Item_name",
+            "Quantity_ordered" = i."Quantity_ordered",
+            "Unit_price" = i."Unit_price",
+            "Total_price" = i."Total_price",
+            "Colour" = i."Colour",
+            "Height" = i."Height",
+            "Width" = i."Width",
+            "Thickness" = i."Thickness",
+            sqmt = i.sqmt,
+            "Arrival_status" = i."Arrival_status",
+            "Edit_count" = case when t."Batch_created" then coalesce(t."Edit_count", 0) + 1 else 0 end,
+            currency = v_currency
+        from jsonb_populate_recordset(null::"Purchase_order_items", p_items) i
+        where i."Po_item_id" is not null
+          and t."Po_item_id" = i."Po_item_id"
+          and t."Po_id" = v_po_id;
+
+        insert into "Purchase_order_items" (
+            "Po_id", "Item_name", "Category", "Quantity_ordered", "Unit_price",
+            "Total_price", "Height", "Width", "Thickness", sqmt, "Colour",
+            "Arrival_status", "Batch_created", "Batch_code", "Edit_count", currency
+        )
+        select
+            v_po_id, i."Item_name", i."Category", i."Quantity_ordered", i."Unit_price",
+            i."Total_price", i."Height", i."Width", i."Thickness", i.sqmt, i."Colour",
+            'ordered', false, null, 0, v_currency
+        from jsonb_populate_recordset(null::"Purchase_order_items", p_items) i
+        where i."Po_item_id" is null;
+    end if;
+
+    -- 4. Charges (bulk upsert, drop any type no longer sent)
+    delete from purchase_order_charges c
+    where c.po_id = v_po_id
+      and c.charge_type not in (
+          select x->>'charge_type' from jsonb_array_elements(p_charges) x
+      );
+
+    insert into purchase_order_charges (po_id, charge_type, amount, currency)
+    select v_po_id, x->>'charge_type', coalesce((x->>'amount')::numeric, 0), v_currency
+    from jsonb_array_elements(p_charges) x
+    on conflict (po_id, charge_type) do update
+        set amount = excluded.amount,
+            currency = excluded.currency;
+
+    -- 5. Payment (create only). Status is kept current by the po_ledger
+    --    triggers in 002_po_ledger.sql.
+    if p_po_id is null then
+        if p_payment is not null and coalesce((p_payment->>'Amount')::numeric, 0) > 0 then
+            v_pay := jsonb_populate_record(null::"Payments", p_payment);
+
+            if not exists (
+                select 1 from "Payments"
+                where "Po_id" = v_po_id
+                  and "Amount" = v_pay."Amount"
+                  and "Payment_date" is not distinct from v_pay."Payment_date"
+            ) then
+                insert into "Payments" ("Po_id", "Amount", "Payment_date", "Notes", currency)
+                values (v_po_id, v_pay."Amount", v_pay."Payment_date", v_pay."Notes",
+                        coalesce(v_pay.currency, v_currency));
+            end if;
+        end if;
+    end if;
+
+    v_result := jsonb_build_object('success', true, 'Po_id', v_po_id);
+
+    if p_idempotency_key is not null then
+        delete from po_idempotency where created_at < now() - interval '1 day';
+        insert into po_idempotency (idempotency_key, po_id, response)
+        values (v_idempotency_key, v_po_id, v_result);
+    end if;
+
+    return v_result;
+end;
+$$;
@@ -0,0 +1,131 @@
+-- sql/002_po_ledger.sql
+--
+-- Per-PO financial ledger. One row per purchase order holding the item total,
+-- charges total, paid amount, first/last payment dates and payment status.
+-- Triggers on Purchase_order_items, purchase_order_charges and Payments keep it
+-- current, so readers (payments report, PO list, add_payment) never re-sum raw rows.
+-- The same triggers keep "Purchase_orders"."Status" in sync.
+
+create table if not exists po_ledger (
+    po_id bigint primary key references "Purchase_orders" ("Po_id") on delete cascade,
+    items_total numeric not null default 0,
+    charges_total numeric not null default 0,
+    paid_amount numeric not null default 0,
+    payment_count integer not null default 0,
+    first_payment_date date,
+    last_payment_date date,
+    first_payment_at timestamptz,
+    status text not null default 'Unpaid',
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists purchase_order_items_po_id_idx on "Purchase_order_items" ("Po_id");
+create index if not exists payments_po_id_idx on "Payments" ("Po_id");
+
+-- Recompute the ledger row of a single PO (touches only that PO's rows).
+create or replace function po_ledger_refresh(p_po_id bigint)
+returns void
+language plpgsql
+as $$
+declare
+    v_status text;
+begin
+    if p_po_id is null
+       or not exists (select 1 from "Purchase_orders" where "Po_id" = p_po_id) then
+        return;
+    end if;
+
+    insert into po_ledger (
+        po_id, items_total, charges_total, paid_amount, payment_count,
+        first_payment_date, last_payment_date, first_payment_at, status, updated_at
+    )
+    select
+        p_po_id,
+        it.total,
+        ch.total,
+        pay.paid,
+        pay.cnt,
+        pay.first_date,
+        pay.last_date,
+        pay.first_at,
+        -- Same basis as add_payment's validation and the frontend: items only
+        po_payment_status(pay.paid, it.total),
+        now()
+    from
+        (select coalesce(sum("Total_price"), 0) as total
+           from "Purchase_order_items" where "Po_id" = p_po_id) it,
+        (select coalesce(sum(amount), 0) as total
+           from purchase_order_charges where po_id = p_po_id) ch,
+        (select coalesce(sum("Amount"), 0) as paid,
+                count(*) as cnt,
+                min("Payment_date")::date as first_date,
+                max("Payment_date")::date as last_date,
+                min("Created_at") as first_at
+           from "Payments" where "Po_id" = p_po_id) pay
+    on conflict (po_id) do update set
+        items_total = excluded.items_total,
+        charges_total = excluded.charges_total,
+        paid_amount = excluded.paid_amount,
+        payment_count = excluded.payment_count,
+        first_payment_date = excluded.first_payment_date,
+        last_payment_date = excluded.last_payment_date,
+        first_payment_at = excluded.first_payment_at,
+        status = excluded.status,
+        updated_at = excluded.updated_at
+    returning status into v_status;
+
+    update "Purchase_orders"
+    set "Status" = v_status
+    where "Po_id" = p_po_id
+      and "Status" is distinct from v_status;
+end;
+$$;
+
+-- Row trigger: TG_ARGV[0] is the name of the PO id column on the source table.
+create or replace function po_ledger_touch()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_new bigint;
+    v_old bigint;
+begin
+    if TG_OP <> 'DELETE' then
+        v_new := (to_jsonb(new) ->> TG_ARGV[0])::bigint;
+    end if;
+    if TG_OP <> 'INSERT' then
+        v_old := (to_jsonb(old) ->> TG_ARGV[0])::bigint;
+    end if;
+
+    if v_new is not null then
+        perform po_ledger_refresh(v_new);
+    end if;
+    if v_old is not null and v_old is distinct from v_new then
+        perform po_ledger_refresh(v_old);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists po_ledger_po on "Purchase_orders";
+create trigger po_ledger_po
+    after insert on "Purchase_orders"
+    for each row execute function po_ledger_touch('Po_id');
+
+drop trigger if exists po_ledger_items on "Purchase_order_items";
+create trigger po_ledger_items
+    after insert or delete or update of "Total_price", "Po_id" on "Purchase_order_items"
+    for each row execute function po_ledger_touch('Po_id');
+
+drop trigger if exists po_ledger_charges on purchase_order_charges;
+create trigger po_ledger_charges
+    after insert or delete or update of amount, po_id on purchase_order_charges
+    for each row execute function po_ledger_touch('po_id');
+
+drop trigger if exists po_ledger_payments on "Payments";
+create trigger po_ledger_payments
+    after insert or delete or update of "Amount", "Payment_date", "Po_id" on "Payments"
+    for each row execute function po_ledger_touch('Po_id');
+
+-- Backfill existing orders
+select po_ledger_refresh("Po_id") from "Purchase_orders";
@@ -0,0 +1,16 @@
+-- sql/003_reserved_stock_indexes.sql
+--
+-- Supports GET /stock/reserved, which filters Reserved_stocks through an inner
+-- join on Products.Category and pages newest-first.
+
+create index if not exists reserved_stocks_created_at_idx
+    on "Reserved_stocks" ("Created_at" desc);
+
+create index if not exists reserved_stocks_stock_id_idx
+    on "Reserved_stocks" ("Stock_id");
+
+create index if not exists reserved_stocks_client_id_idx
+    on "Reserved_stocks" ("Client_id");
+
+create index if not exists products_category_idx
+    on "Products" ("Category");
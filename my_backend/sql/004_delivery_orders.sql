@@ -0,0 +1,94 @@
+-- sql/004_delivery_orders.sql
+--
+-- Delivery-order summaries computed in the database for GET /scan/deliveries/summary,
+-- and the indexes used by GET /scan/deliveries/{do_no}.
+
+create index if not exists products_delivery_order_no_idx
+    on "Products" ("Delivery_order_no")
+    where "Status" in ('Out', 'Sold');
+
+create index if not exists products_client_id_idx
+    on "Products" ("Client_id");
+
+create or replace view delivery_order_summary as
+select
+    p."Delivery_order_no" as do_no,
+    p."Client_id" as client_id,
+    min(c."Client_name") as client_name,
+    max(coalesce(p."Updated_at", p."Created_at"))::date as do_date,
+    count(*) as item_count,
+    count(*) filter (where p."Status" = 'Out') as out_count,
+    count(*) filter (where p."Status" = 'Sold') as sold_count,
+    array_agg(distinct lower(p."Category")) filter (where p."Category" is not null) as categories
+from "Products" p
+left join "Clients" c on c."Client_id" = p."Client_id"
+where p."Status" in ('Out', 'Sold')
+  and p."Delivery_order_no" is not null
+group by p."Delivery_order_no", p."Client_id";
+
+-- Filtering the view on do_date (an aggregate) happens after GROUP BY, so every
+-- page grouped every Out/Sold product. delivery_order_summary_page() applies
+-- the client, category and date predicates to Products rows first, then groups
+-- only the delivery orders that can still match and re-checks them exactly.
+-- A DO can only have do_date in [from, to] if one of its rows falls in it.
+create index if not exists products_do_activity_idx
+    on "Products" ((coalesce("Updated_at", "Created_at")))
+    where "Status" in ('Out', 'Sold') and "Delivery_order_no" is not null;
+
+create or replace function delivery_order_summary_page(
+    p_client_id bigint default null,
+    p_category text default null,
+    p_date_from date default null,
+    p_date_to date default null,
+    p_limit integer default 50,
+    p_offset integer default 0
+) returns jsonb
+language sql
+stable
+as $$
+    with candidates as (
+        select distinct p."Delivery_order_no" as do_no
+        from "Products" p
+        where p."Status" in ('Out', 'Sold')
+          and p."Delivery_order_no" is not null
+          and (p_client_id is null or p."Client_id" = p_client_id)
+          and (p_category is null or lower(p."Category") = lower(p_category))
+          and (p_date_from is null or coalesce(p."Updated_at", p."Created_at") >= p_date_from)
+          and (p_date_to is null or coalesce(p."Updated_at", p."Created_at") < p_date_to + 1)
+    ),
+    grouped as (
+        select
+            p."Delivery_order_no" as do_no,
+            p."Client_id" as client_id,
+            min(c."Client_name") as client_name,
+            max(coalesce(p."Updated_at", p."Created_at"))::date as do_date,
+            count(*) as item_count,
+            count(*) filter (where p."Status" = 'Out') as out_count,
+            count(*) filter (where p."Status" = 'Sold') as sold_count,
+            array_agg(distinct lower(p."Category")) filter (where p."Category" is not null) as categories
+        from "Products" p
+        left join "Clients" c on c."Client_id" = p."Client_id"
+        where p."Status" in ('Out', 'Sold')
+          and p."Delivery_order_no" in (select do_no from candidates)
+        group by p."Delivery_order_no", p."Client_id"
+    ),
+    filtered as (
+        select *
+        from grouped
+        where (p_client_id is null or client_id = p_client_id)
+          and (p_category is null or categories @> array[lower(p_category)])
+          and (p_date_from is null or do_date >= p_date_from)
+          and (p_date_to is null or do_date <= p_date_to)
+    )
+    select jsonb_build_object(
+        'total', (select count(*) from filtered),
+        'rows', coalesce((
+            select jsonb_agg(to_jsonb(f) order by f.do_date desc, f.do_no)
+            from (
+                select * from filtered
+                order by do_date desc, do_no
+                limit p_limit offset p_offset
+            ) f
+        ), '[]'::jsonb)
+    )
+$$;
@@ -0,0 +1,15 @@
+-- sql/005_return_list_category.sql
+--
+-- Denormalise the product category onto Return_list at write time
+-- (routers/scan.py return_item), so return listings need no second query.
+
+alter table "Return_list" add column if not exists category text;
+
+update "Return_list" r
+set category = p."Category"
+from "Products" p
+where p."Stock_id" = r.stock_id
+  and r.category is null;
+
+create index if not exists return_list_return_date_idx
+    on "Return_list" (return_date desc);
@@ -0,0 +1,36 @@
+-- sql/006_client_search.sql
+--
+-- Case-insensitive prefix/substring client search for GET /clients/search.
+-- Trigram GIN indexes let ILIKE '%term%' use an index instead of a full scan.
+
+create extension if not exists pg_trgm;
+
+create index if not exists clients_name_trgm_idx
+    on "Clients" using gin ("Client_name" gin_trgm_ops);
+create index if not exists clients_email_trgm_idx
+    on "Clients" using gin ("Email" gin_trgm_ops);
+create index if not exists clients_contact_trgm_idx
+    on "Clients" using gin ("Contact" gin_trgm_ops);
+create index if not exists clients_vat_number_trgm_idx
+    on "Clients" using gin ("Vat_number" gin_trgm_ops);
+
+-- Name-prefix matches first, then other matches, both alphabetical.
+create or replace function search_clients(p_query text, p_limit integer default 20, p_offset integer default 0)
+returns setof "Clients"
+language sql
+stable
+as $$
+    with term as (
+        select replace(replace(replace(coalesce(trim(p_query), ''), '\', '\\'), '%', '\%'), '_', '\_') as t
+    )
+    select c.*
+    from "Clients" c, term
+    where term.t = ''
+       or c."Client_name" ilike '%' || term.t || '%'
+       or c."Email" ilike '%' || term.t || '%'
+       or c."Contact" ilike '%' || term.t || '%'
+       or c."Vat_number" ilike '%' || term.t || '%'
+    order by (c."Client_name" ilike term.t || '%') desc, lower(c."Client_name"), c."Client_id"
+    limit p_limit
+    offset p_offset
+$$;
@@ -0,0 +1,153 @@
+-- sql/007_client_activity.sql
+--
+-- Per-client activity aggregates for GET /clients/{client_id}/summary,
+-- maintained by a trigger on every Stock_movement insert so the summary
+-- never scans movement history.
+--
+-- Movement type -> effect on the client's counters:
+--   Out                    out +1
+--   Sold                   out -1, sold +1
+--   Undo Sale              sold -1, out +1
+--   Return Before Invoice  out -1, returned +1
+--   Return After Sale      sold -1, returned +1
+
+create table if not exists client_activity (
+    client_id bigint primary key,
+    pieces_out integer not null default 0,
+    pieces_sold integer not null default 0,
+    pieces_returned integer not null default 0,
+    open_delivery_orders integer not null default 0,
+    last_activity_date date,
+    updated_at timestamptz not null default now()
+);
+
+-- Per (client, DO) piece counts; a DO is open while it still has pieces Out.
+create table if not exists client_do_activity (
+    client_id bigint not null,
+    do_no text not null,
+    out_count integer not null default 0,
+    sold_count integer not null default 0,
+    primary key (client_id, do_no)
+);
+
+create or replace function client_activity_apply()
+returns trigger
+language plpgsql
+as $$
+declare
+    d_out integer := 0;
+    d_sold integer := 0;
+    d_returned integer := 0;
+    d_open integer := 0;
+    v_old_out integer;
+    v_new_out integer;
+begin
+    if new."Client_id" is null then
+        return null;
+    end if;
+
+    case new."Movement_type"
+        when 'Out' then d_out := 1;
+        when 'Sold' then d_out := -1; d_sold := 1;
+        when 'Undo Sale' then d_out := 1; d_sold := -1;
+        when 'Return Before Invoice' then d_out := -1; d_returned := 1;
+        when 'Return After Sale' then d_sold := -1; d_returned := 1;
+        else null;
+    end case;
+
+    if new."Delivery_order_no" is not null then
+        select out_count into v_old_out
+        from client_do_activity
+        where client_id = new."Client_id" and do_no = new."Delivery_order_no"
+        for update;
+
+        v_old_out := coalesce(v_old_out, 0);
+        v_new_out := greatest(v_old_out + d_out, 0);
+        d_open := (v_new_out > 0)::integer - (v_old_out > 0)::integer;
+
+        insert into client_do_activity as a (client_id, do_no, out_count, sold_count)
+        values (new."Client_id", new."Delivery_order_no", v_new_out, greatest(d_sold, 0))
+        on conflict (client_id, do_no) do update set
+            out_count = v_new_out,
+            sold_count = greatest(a.sold_count + d_sold, 0);
+    end if;
+
+    insert into client_activity as a (
+        client_id, pieces_out, pieces_sold, pieces_returned,
+        open_delivery_orders, last_activity_date, updated_at
+    ) values (
+        new."Client_id", greatest(d_out, 0), greatest(d_sold, 0), d_returned,
+        greatest(d_open, 0), new."Scan_date"::date, now()
+    )
+    on conflict (client_id) do update set
+        pieces_out = greatest(a.pieces_out + d_out, 0),
+        pieces_sold = greatest(a.pieces_sold + d_sold, 0),
+        pieces_returned = a.pieces_returned + d_returned,
+        open_delivery_orders = greatest(a.open_delivery_orders + d_open, 0),
+        last_activity_date = greatest(a.last_activity_date, excluded.last_activity_date),
+        updated_at = now();
+
+    return null;
+end;
+$$;
+
+drop trigger if exists client_activity_movement on "Stock_movement";
+create trigger client_activity_movement
+    after insert on "Stock_movement"
+    for each row execute function client_activity_apply();
+
+-- Backfill: current Out/Sold pieces from Products, returns and last activity from history
+insert into client_do_activity (client_id, do_no, out_count, sold_count)
+select "Client_id", "Delivery_order_no",
+       count(*) filter (where "Status" = 'Out'),
+       count(*) filter (where "Status" = 'Sold')
+from "Products"
+where "Client_id" is not null
+  and "Delivery_order_no" is not null
+  and "Status" in ('Out', 'Sold')
+group by "Client_id", "Delivery_order_no"
+on conflict (client_id, do_no) do update set
+    out_count = excluded.out_count,
+    sold_count = excluded.sold_count;
+
+insert into client_activity (
+    client_id, pieces_out, pieces_sold, pieces_returned,
+    open_delivery_orders, last_activity_date
+)
+select
+    c."Client_id",
+    coalesce(p.pieces_out, 0),
+    coalesce(p.pieces_sold, 0),
+    coalesce(m.pieces_returned, 0),
+    coalesce(d.open_dos, 0),
+    m.last_activity_date
+from "Clients" c
+left join (
+    select "Client_id",
+           count(*) filter (where "Status" = 'Out') as pieces_out,
+           count(*) filter (where "Status" = 'Sold') as pieces_sold
+    from "Products"
+    where "Client_id" is not null
+    group by "Client_id"
+) p on p."Client_id" = c."Client_id"
+left join (
+    select "Client_id",
+           count(*) filter (where "Movement_type" ilike '%Return%') as pieces_returned,
+           max("Scan_date"::date) as last_activity_date
+    from "Stock_movement"
+    where "Client_id" is not null
+    group by "Client_id"
+) m on m."Client_id" = c."Client_id"
+left join (
+    select client_id, count(*) as open_dos
+    from client_do_activity
+    where out_count > 0
+    group by client_id
+) d on d.client_id = c."Client_id"
+on conflict (client_id) do update set
+    pieces_out = excluded.pieces_out,
+    pieces_sold = excluded.pieces_sold,
+    pieces_returned = excluded.pieces_returned,
+    open_delivery_orders = excluded.open_delivery_orders,
+    last_activity_date = excluded.last_activity_date,
+    updated_at = now();
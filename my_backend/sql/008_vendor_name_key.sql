@@ -0,0 +1,99 @@
+-- sql/008_vendor_name_key.sql
+--
+-- Normalised vendor-name key with a unique index, so concurrent PO submissions
+-- can no longer create duplicate vendors, plus a prefix index for
+-- GET /purchase_orders/vendors (autocomplete).
+
+-- Keep in sync with _vendor_name_key() in routers/purchase_orders.py
+create or replace function vendor_name_key(p_name text)
+returns text
+language sql
+immutable
+as $$
+    select lower(regexp_replace(trim(coalesce(p_name, '')), '\s+', ' ', 'g'))
+$$;
+
+alter table "Vendors"
+    add column if not exists name_key text
+    generated always as (vendor_name_key("Vendor_name")) stored;
+
+-- Merge existing duplicates into the oldest vendor before adding the unique index
+with ranked as (
+    select "Vendor_id",
+           first_value("Vendor_id") over (partition by name_key order by "Vendor_id") as keep_id
+    from "Vendors"
+)
+update "Purchase_orders" po
+set "Vendor_id" = r.keep_id
+from ranked r
+where po."Vendor_id" = r."Vendor_id"
+  and r."Vendor_id" <> r.keep_id;
+
+with ranked as (
+    select "Vendor_id",
+           first_value("Vendor_id") over (partition by name_key order by "Vendor_id") as keep_id
+    from "Vendors"
+)
+delete from "Vendors" v
+using ranked r
+where v."Vendor_id" = r."Vendor_id"
+  and r."Vendor_id" <> r.keep_id;
+
+create unique index if not exists vendors_name_key_key
+    on "Vendors" (name_key);
+
+create index if not exists vendors_name_key_prefix_idx
+    on "Vendors" (name_key text_pattern_ops);
+
+-- Replaces the lookup-then-insert version from 001_po_upsert.sql.
+-- p_vendor may carry "Vendor_id" from the API's vendor cache; it is used
+-- when it still matches the name.
+create or replace function po_resolve_vendor(p_vendor jsonb)
+returns bigint
+language plpgsql
+as $$
+declare
+    v_key text;
+    v_vendor_id bigint;
+begin
+    if coalesce(trim(p_vendor->>'Vendor_name'), '') = '' then
+        return null;
+    end if;
+
+    v_key := vendor_name_key(p_vendor->>'Vendor_name');
+
+    if (p_vendor->>'Vendor_id') is not null then
+        select "Vendor_id" into v_vendor_id
+        from "Vendors"
+        where "Vendor_id" = (p_vendor->>'Vendor_id')::bigint
+          and name_key = v_key;
+        if v_vendor_id is not null then
+            return v_vendor_id;
+        end if;
+    end if;
+
+    insert into "Vendors" (
+        "Vendor_name", "Address_line", "Address_location", "Address_city",
+        "Address_state", "Postal_code", "Country", "Vat_number"
+    ) values (
+        trim(p_vendor->>'Vendor_name'),
+        coalesce(p_vendor->>'Address_line', ''),
+        coalesce(p_vendor->>'Address_location', ''),
+        coalesce(p_vendor->>'Address_city', ''),
+        coalesce(p_vendor->>'Address_state', ''),
+        coalesce(p_vendor->>'Postal_code', ''),
+        coalesce(p_vendor->>'Country', ''),
+        coalesce(p_vendor->>'Vat_number', '')
+    )
+    on conflict (name_key) do nothing
+    returning "Vendor_id" into v_vendor_id;
+
+    if v_vendor_id is null then
+        select "Vendor_id" into v_vendor_id
+        from "Vendors"
+        where name_key = v_key;
+    end if;
+
+    return v_vendor_id;
+end;
+$$;
@@ -0,0 +1,317 @@
+-- sql/009_scan_sync.sql
+--
+-- Offline scan queue sync for handheld devices (POST /scan/sync).
+-- A device sends its queued events (mark_out / return / undo) with a
+-- per-device sequence number. scan_sync() applies a chunk of them in one
+-- round-trip with set-based statements over jsonb_to_recordset and records
+-- each outcome in scan_sync_log, so a re-sent event returns its stored result
+-- instead of being applied twice.
+--
+-- Events are applied in "rounds": round n holds the n-th event of every
+-- stock_id in the chunk, so within a round each product changes at most once
+-- and every state transition is a single INSERT/UPDATE ... FROM. Batch
+-- counters get one grouped UPDATE per round ("Out" = "Out" + delta).
+--
+-- The per-event checks mirror mark_out_item, return_item and undo_sale in
+-- routers/scan.py; they produce 200 or a 4xx result. Only these deterministic
+-- outcomes are logged. Any other error (lock timeout, serialization failure,
+-- constraint violation) aborts the whole chunk, nothing is logged, and the
+-- device can simply retry it.
+
+create table if not exists scan_sync_log (
+    device_id text not null,
+    seq bigint not null,
+    event_type text not null,
+    stock_id text,
+    client_ts timestamptz,
+    result jsonb not null,
+    applied_at timestamptz not null default now(),
+    primary key (device_id, seq)
+);
+
+-- Replaced by the set-based scan_sync() below
+drop function if exists scan_apply_event(jsonb);
+
+create or replace function scan_sync(p_device_id text, p_events jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_round integer;
+    v_rounds integer;
+    v_results jsonb;
+begin
+    -- One device flushes at a time, so its sequence order is preserved
+    perform pg_advisory_xact_lock(hashtext('scan_sync:' || p_device_id));
+
+    -- 1. Decode the chunk (first copy of a repeated seq wins) and number the
+    --    events of each product in seq order
+    create temp table _sync_events on commit drop as
+    select e.seq,
+           coalesce(e.type, '') as type,
+           e.stock_id as stock_id_json,
+           (jsonb_populate_record(
+               null::"Products", jsonb_build_object('Stock_id', e.stock_id)
+           ))."Stock_id" as stock_id,
+           e.client_id,
+           e.do_no,
+           e.mode,
+           e.reason,
+           e.return_type,
+           e.client_ts,
+           coalesce(e.client_ts::date, current_date) as scan_date,
+           0 as round
+    from (
+        select distinct on (x.seq) x.*
+        from jsonb_to_recordset(p_events) as x(
+            seq bigint, type text, stock_id jsonb, client_id bigint, do_no text,
+            mode text, reason text, return_type text, client_ts timestamptz
+        )
+        order by x.seq
+    ) e;
+
+    create temp table _sync_results (
+        seq bigint primary key,
+        result jsonb not null
+    ) on commit drop;
+
+    -- 2. Events already synced return their stored result
+    insert into _sync_results (seq, result)
+    select l.seq, l.result || jsonb_build_object('duplicate', true)
+    from scan_sync_log l
+    join _sync_events e on e.seq = l.seq
+    where l.device_id = p_device_id;
+
+    delete from _sync_events e
+    using _sync_results r
+    where r.seq = e.seq;
+
+    update _sync_events e set round = n.round
+    from (
+        select seq, row_number() over (partition by stock_id order by seq) as round
+        from _sync_events
+    ) n
+    where n.seq = e.seq;
+
+    select coalesce(max(round), 0) into v_rounds from _sync_events;
+
+    -- 3. Lock every product of the chunk once, in a stable order
+    perform 1
+    from "Products" p
+    where p."Stock_id" in (select stock_id from _sync_events)
+    order by p."Stock_id"
+    for update;
+
+    -- Per-round snapshot of the events joined with their product's state
+    create temp table _sync_round on commit drop as
+    select e.*,
+           p."Stock_id" is not null as product_found,
+           p."Status" as status,
+           p."Batch_id" as batch_id,
+           p."Item_id" as item_id,
+           p."Product_name" as product_name,
+           p."Size" as size,
+           p."Batch_code" as batch_code,
+           p."Category" as category,
+           p."Client_id" as prod_client_id,
+           p."Delivery_order_no" as prod_do_no,
+           poi."Colour" as colour,
+           c."Client_name" as client_name,
+           null::integer as http_status,
+           null::text as error
+    from _sync_events e
+    left join "Products" p on p."Stock_id" = e.stock_id
+    left join "Purchase_order_items" poi on poi."Po_item_id" = p."Po_item_id"
+    left join "Clients" c on c."Client_id" = p."Client_id"
+    with no data;
+
+    for v_round in 1..v_rounds loop
+        truncate _sync_round;
+
+        insert into _sync_round
+        select e.*,
+               p."Stock_id" is not null,
+               p."Status",
+               p."Batch_id",
+               p."Item_id",
+               p."Product_name",
+               p."Size",
+               p."Batch_code",
+               p."Category",
+               p."Client_id",
+               p."Delivery_order_no",
+               poi."Colour",
+               c."Client_name",
+               null,
+               null
+        from _sync_events e
+        left join "Products" p on p."Stock_id" = e.stock_id
+        left join "Purchase_order_items" poi on poi."Po_item_id" = p."Po_item_id"
+        left join "Clients" c on c."Client_id" = p."Client_id"
+        where e.round = v_round;
+
+        -- 4. Validate (first failing check wins, same order as the handlers)
+        update _sync_round set http_status = 404, error = 'Product not found'
+        where not product_found;
+
+        update _sync_round set http_status = 400, error = 'Unknown event type ' || type
+        where http_status is null and type not in ('mark_out', 'return', 'undo');
+
+        update _sync_round set http_status = 400, error = 'Product is already ' || status
+        where http_status is null and type = 'mark_out' and status in ('Out', 'Sold');
+
+        update _sync_round set http_status = 400, error = 'client_id and do_no are required'
+        where http_status is null and type = 'mark_out' and (client_id is null or do_no is null);
+
+        update _sync_round r set http_status = 404, error = 'Client not found'
+        where http_status is null and type = 'mark_out'
+          and not exists (select 1 from "Clients" c where c."Client_id" = r.client_id);
+
+        update _sync_round set http_status = 400, error = 'Product is not Out'
+        where http_status is null and type = 'return' and return_type = 'before'
+          and status is distinct from 'Out';
+
+        update _sync_round set http_status = 400, error = 'Product is not Sold'
+        where http_status is null and type = 'return' and return_type = 'after'
+          and status is distinct from 'Sold';
+
+        update _sync_round set http_status = 400, error = 'return_type must be "before" or "after"'
+        where http_status is null and type = 'return'
+          and coalesce(return_type, '') not in ('before', 'after');
+
+        update _sync_round set http_status = 400, error = 'Product is not Sold'
+        where http_status is null and type = 'undo' and status is distinct from 'Sold';
+
+        update _sync_round set http_status = 200 where http_status is null;
+
+        -- 5. Return rows and movements read the product before it changes
+        insert into "Return_list" (
+            stock_id, item_ids, product_name, size, batch_code, category, client_id,
+            client_name, do_number, reason, is_bulk, colour, return_date
+        )
+        select x.stock_id, x.item_ids, x.product_name, x.size, x.batch_code, x.category, x.client_id,
+               x.client_name, x.do_number, x.reason, x.is_bulk, x.colour, x.return_date
+        from _sync_round r
+        cross join lateral jsonb_populate_record(null::"Return_list", jsonb_build_object(
+            'stock_id', r.stock_id,
+            'item_ids', jsonb_build_array(r.item_id),
+            'product_name', r.product_name,
+            'size', r.size,
+            'batch_code', r.batch_code,
+            'category', r.category,
+            'client_id', r.prod_client_id,
+            'client_name', coalesce(r.client_name, '-'),
+            'do_number', r.prod_do_no,
+            'reason', coalesce(r.reason, '') || ' | ' || case when r.return_type = 'before'
+                      then 'Return Before Invoice' else 'Return After Sale' end,
+            'is_bulk', false,
+            'colour', coalesce(r.colour, '-'),
+            'return_date', r.scan_date
+        )) x
+        where r.http_status = 200 and r.type = 'return'
+        order by r.seq;
+
+        insert into "Stock_movement" (
+            "Stock_id", "Movement_type", "Client_id", "Delivery_order_no", "Scan_date",
+            delivery_mode, undo_reason
+        )
+        select m."Stock_id", m."Movement_type", m."Client_id", m."Delivery_order_no", m."Scan_date",
+               m.delivery_mode, m.undo_reason
+        from _sync_round r
+        cross join lateral jsonb_populate_record(null::"Stock_movement", case r.type
+            when 'mark_out' then jsonb_build_object(
+                'Stock_id', r.stock_id,
+                'Movement_type', 'Out',
+                'Client_id', r.client_id,
+                'Delivery_order_no', r.do_no,
+                'Scan_date', r.scan_date,
+                'delivery_mode', coalesce(r.mode, 'Offline Sync'))
+            else jsonb_build_object(
+                'Stock_id', r.stock_id,
+                'Movement_type', case
+                    when r.type = 'undo' then 'Undo Sale'
+                    when r.return_type = 'before' then 'Return Before Invoice'
+                    else 'Return After Sale' end,
+                'Client_id', r.prod_client_id,
+                'Delivery_order_no', r.prod_do_no,
+                'Scan_date', r.scan_date,
+                'undo_reason', r.reason)
+        end) m
+        where r.http_status = 200
+        order by r.seq;
+
+        -- 6. Product state transitions
+        update "Products" p set
+            "Status" = case r.type when 'return' then 'Available' else 'Out' end,
+            "Client_id" = case r.type
+                when 'mark_out' then r.client_id
+                when 'return' then null
+                else p."Client_id" end,
+            "Delivery_order_no" = case r.type
+                when 'mark_out' then r.do_no
+                when 'return' then null
+                else p."Delivery_order_no" end,
+            "Updated_at" = now()
+        from _sync_round r
+        where r.http_status = 200
+          and p."Stock_id" = r.stock_id;
+
+        delete from "Reserved_stocks" s
+        using _sync_round r
+        where r.http_status = 200 and r.type = 'return'
+          and s."Stock_id" = r.stock_id;
+
+        insert into "Reserved_stocks" ("Stock_id", "Client_id", "Delivery_order_no")
+        select r.stock_id,
+               case when r.type = 'mark_out' then r.client_id else r.prod_client_id end,
+               case when r.type = 'mark_out' then r.do_no else r.prod_do_no end
+        from _sync_round r
+        where r.http_status = 200 and r.type in ('mark_out', 'undo')
+        order by r.seq;
+
+        -- 7. Batch counters, one grouped update
+        update "Stock_batches" b set
+            "Out" = coalesce(b."Out", 0) + d.d_out,
+            "Sold" = coalesce(b."Sold", 0) + d.d_sold,
+            "Returned" = coalesce(b."Returned", 0) + d.d_returned,
+            "Available" = coalesce(b."Batch_quantity", 0)
+                          - (coalesce(b."Out", 0) + d.d_out)
+                          - (coalesce(b."Sold", 0) + d.d_sold),
+            "Updated_at" = now()
+        from (
+            select batch_id,
+                   sum(case
+                       when type in ('mark_out', 'undo') then 1
+                       when type = 'return' and return_type = 'before' then -1
+                       else 0 end) as d_out,
+                   sum(case
+                       when type = 'undo' then -1
+                       when type = 'return' and return_type = 'after' then -1
+                       else 0 end) as d_sold,
+                   count(*) filter (where type = 'return') as d_returned
+            from _sync_round
+            where http_status = 200 and batch_id is not null
+            group by batch_id
+        ) d
+        where b."Batch_id" = d.batch_id;
+
+        -- 8. Outcomes (all deterministic here) are logged for re-sends
+        insert into _sync_results (seq, result)
+        select seq,
+               jsonb_build_object('seq', seq, 'success', http_status = 200, 'status', http_status)
+               || case when error is null then '{}'::jsonb else jsonb_build_object('error', error) end
+        from _sync_round;
+
+        insert into scan_sync_log (device_id, seq, event_type, stock_id, client_ts, result)
+        select p_device_id, r.seq, r.type, r.stock_id_json #>> '{}', r.client_ts, s.result
+        from _sync_round r
+        join _sync_results s on s.seq = r.seq;
+    end loop;
+
+    select coalesce(jsonb_agg(result order by seq), '[]'::jsonb)
+    into v_results
+    from _sync_results;
+
+    return v_results;
+end;
+$$;
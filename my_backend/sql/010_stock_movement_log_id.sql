@@ -0,0 +1,12 @@
+-- sql/010_stock_movement_log_id.sql
+--
+-- Client-generated id for Stock_movement rows written by the write-behind
+-- logger (app/utils/movement_log.py). A batch that is re-sent after a crash
+-- or a failed flush is upserted with ON CONFLICT (log_id) DO NOTHING, so
+-- replaying the local journal never duplicates audit rows.
+-- Rows inserted elsewhere (scan_sync, older rows) leave it null.
+
+alter table "Stock_movement" add column if not exists log_id uuid;
+
+create unique index if not exists stock_movement_log_id_key
+    on "Stock_movement" (log_id);
@@ -0,0 +1,179 @@
+-- sql/011_stock_movement_archive.sql
+--
+-- Archive tier for Stock_movement (app/utils/movement_archive.py).
+--
+-- Stock_movement is append-only. Once a month is closed, its rows are
+-- exported to the local columnar archive, compacted into per-month summary
+-- rows here, and deleted from the hot table. Hot queries then filter on
+-- "Scan_date" >= the archive watermark. The dashboard's monthly sales chart
+-- reads the summary for archived months, and the movement/sales reports read
+-- the archive files when full history is asked for.
+--
+-- Export and delete happen in two calls:
+--   1. stock_movement_month_rows(month): the month's rows, denormalised.
+--   2. stock_movement_close_month(month, expected): after the file is written,
+--      checks that the row count has not changed, then summarises and deletes.
+
+create index if not exists stock_movement_scan_date_idx
+    on "Stock_movement" ("Scan_date");
+
+-- Per (month, movement type, category) counts of archived movements.
+-- For "Sold", `standing` counts only sales whose product is still Sold,
+-- which is what the dashboard charts; for other types it equals `movements`.
+create table if not exists stock_movement_monthly (
+    month date not null,
+    movement_type text not null,
+    category text not null,
+    movements integer not null default 0,
+    standing integer not null default 0,
+    primary key (month, movement_type, category)
+);
+
+-- Archived sales that are still standing, so `standing` can be decremented
+-- when the product later leaves Sold (return after sale, undo sale).
+create table if not exists stock_movement_archived_sales (
+    stock_id text not null,
+    month date not null,
+    category text not null
+);
+
+create index if not exists stock_movement_archived_sales_stock_idx
+    on stock_movement_archived_sales (stock_id);
+
+create table if not exists stock_movement_archive_log (
+    month date primary key,
+    rows integer not null default 0,
+    parts integer not null default 0,
+    archived_at timestamptz not null default now()
+);
+
+create or replace function stock_movement_open_months(p_before date)
+returns jsonb
+language sql
+stable
+as $$
+    select coalesce(jsonb_agg(m order by m), '[]'::jsonb)
+    from (
+        select distinct date_trunc('month', "Scan_date")::date as m
+        from "Stock_movement"
+        where "Scan_date" < p_before
+    ) months;
+$$;
+
+create or replace function stock_movement_month_rows(p_month date)
+returns jsonb
+language sql
+stable
+as $$
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'stock_id', m."Stock_id",
+        'movement_type', m."Movement_type",
+        'scan_date', m."Scan_date",
+        'client_id', m."Client_id",
+        'delivery_order_no', m."Delivery_order_no",
+        'delivery_mode', m.delivery_mode,
+        'undo_reason', m.undo_reason,
+        'item_id', p."Item_id",
+        'product_name', p."Product_name",
+        'batch_code', p."Batch_code",
+        'size', p."Size",
+        'category', p."Category",
+        'colour', poi."Colour",
+        'client_name', c."Client_name"
+    ) order by m."Scan_date" desc), '[]'::jsonb)
+    from "Stock_movement" m
+    left join "Products" p on p."Stock_id" = m."Stock_id"
+    left join "Purchase_order_items" poi on poi."Po_item_id" = p."Po_item_id"
+    left join "Clients" c on c."Client_id" = m."Client_id"
+    where m."Scan_date" >= date_trunc('month', p_month)::date
+      and m."Scan_date" < (date_trunc('month', p_month) + interval '1 month')::date;
+$$;
+
+create or replace function stock_movement_close_month(p_month date, p_expected integer)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_start date := date_trunc('month', p_month)::date;
+    v_end date := (date_trunc('month', p_month) + interval '1 month')::date;
+    v_count integer;
+begin
+    if v_end > date_trunc('month', current_date)::date then
+        raise exception 'Month % is not closed yet', to_char(v_start, 'YYYY-MM') using errcode = 'PT400';
+    end if;
+
+    -- Block inserts until the month is summarised and deleted
+    lock table "Stock_movement" in share row exclusive mode;
+
+    select count(*) into v_count
+    from "Stock_movement"
+    where "Scan_date" >= v_start and "Scan_date" < v_end;
+
+    if v_count <> p_expected then
+        raise exception 'Month % changed during export (% rows, exported %)',
+            to_char(v_start, 'YYYY-MM'), v_count, p_expected using errcode = 'PT409';
+    end if;
+
+    insert into stock_movement_monthly (month, movement_type, category, movements, standing)
+    select v_start,
+           coalesce(m."Movement_type", ''),
+           coalesce(p."Category", ''),
+           count(*),
+           count(*) filter (where m."Movement_type" is distinct from 'Sold' or p."Status" = 'Sold')
+    from "Stock_movement" m
+    left join "Products" p on p."Stock_id" = m."Stock_id"
+    where m."Scan_date" >= v_start and m."Scan_date" < v_end
+    group by 2, 3
+    on conflict (month, movement_type, category) do update set
+        movements = stock_movement_monthly.movements + excluded.movements,
+        standing = stock_movement_monthly.standing + excluded.standing;
+
+    insert into stock_movement_archived_sales (stock_id, month, category)
+    select m."Stock_id"::text, v_start, coalesce(p."Category", '')
+    from "Stock_movement" m
+    join "Products" p on p."Stock_id" = m."Stock_id"
+    where m."Scan_date" >= v_start and m."Scan_date" < v_end
+      and m."Movement_type" = 'Sold'
+      and p."Status" = 'Sold';
+
+    delete from "Stock_movement"
+    where "Scan_date" >= v_start and "Scan_date" < v_end;
+
+    insert into stock_movement_archive_log (month, rows, parts, archived_at)
+    values (v_start, v_count, 1, now())
+    on conflict (month) do update set
+        rows = stock_movement_archive_log.rows + excluded.rows,
+        parts = stock_movement_archive_log.parts + 1,
+        archived_at = now();
+
+    return jsonb_build_object('month', v_start, 'archived', v_count);
+end;
+$$;
+
+-- A product leaving Sold un-counts its archived sales
+create or replace function stock_movement_unsell()
+returns trigger
+language plpgsql
+as $$
+begin
+    with gone as (
+        delete from stock_movement_archived_sales
+        where stock_id = new."Stock_id"::text
+        returning month, category
+    )
+    update stock_movement_monthly s set
+        standing = s.standing - g.n
+    from (select month, category, count(*) as n from gone group by month, category) g
+    where s.month = g.month
+      and s.movement_type = 'Sold'
+      and s.category = g.category;
+    return null;
+end;
+$$;
+
+drop trigger if exists stock_movement_unsell on "Products";
+create trigger stock_movement_unsell
+    after update of "Status" on "Products"
+    for each row
+    when (old."Status" = 'Sold' and new."Status" is distinct from 'Sold')
+    execute function stock_movement_unsell();
@@ -0,0 +1,133 @@
+-- sql/012_batch_reconcile.sql
+--
+-- Reconciles the Stock_batches counters (GET/POST /stock/reconcile).
+--
+-- "Out", "Sold", "Returned" and "Available" are kept by read-modify-write in
+-- the scan/reserved handlers (and the frontend stockActions), so they drift.
+-- batch_reconcile() recomputes them for every batch, or only the touched
+-- ones, in one grouped pass:
+--   Out       = products with Status 'Out'
+--   Sold      = products with Status 'Sold'
+--   Returned  = Return_list rows for the batch's products (return events)
+--   Available = Batch_quantity - Out - Sold   (same formula as the handlers)
+-- It reports every batch whose stored counters differ and, with p_repair,
+-- fixes them all in a single UPDATE.
+--
+-- Incremental runs (p_incremental) only look at batches whose products or
+-- counters changed since the last repair run, recorded in batch_reconcile_state.
+
+create table if not exists batch_reconcile_state (
+    id boolean primary key default true check (id),
+    last_run_at timestamptz,
+    last_checked integer,
+    last_drifted integer
+);
+
+create index if not exists products_batch_status_idx
+    on "Products" ("Batch_id", "Status");
+
+create index if not exists return_list_stock_id_idx
+    on "Return_list" (stock_id);
+
+create or replace function batch_reconcile(p_repair boolean default false, p_incremental boolean default false)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_started timestamptz := now();
+    v_since timestamptz;
+    v_checked integer;
+    v_drift jsonb;
+    v_drifted integer;
+begin
+    -- One reconcile at a time, so two repairs never interleave
+    perform pg_advisory_xact_lock(hashtext('batch_reconcile'));
+
+    if p_incremental then
+        select last_run_at into v_since from batch_reconcile_state;
+    end if;
+
+    create temp table _batch_actual on commit drop as
+    select b."Batch_id" as batch_id,
+           b."Batch_code" as batch_code,
+           coalesce(b."Batch_quantity", 0) as batch_quantity,
+           coalesce(b."Out", 0) as stored_out,
+           coalesce(b."Sold", 0) as stored_sold,
+           coalesce(b."Returned", 0) as stored_returned,
+           coalesce(b."Available", 0) as stored_available,
+           coalesce(p.out_count, 0) as actual_out,
+           coalesce(p.sold_count, 0) as actual_sold,
+           coalesce(r.returned_count, 0) as actual_returned
+    from "Stock_batches" b
+    left join (
+        select "Batch_id",
+               count(*) filter (where "Status" = 'Out') as out_count,
+               count(*) filter (where "Status" = 'Sold') as sold_count
+        from "Products"
+        group by "Batch_id"
+    ) p on p."Batch_id" = b."Batch_id"
+    left join (
+        select pr."Batch_id", count(*) as returned_count
+        from "Return_list" rl
+        join "Products" pr on pr."Stock_id"::text = rl.stock_id::text
+        group by pr."Batch_id"
+    ) r on r."Batch_id" = b."Batch_id"
+    where v_since is null
+       or b."Updated_at" >= v_since
+       or exists (
+           select 1 from "Products" tp
+           where tp."Batch_id" = b."Batch_id" and tp."Updated_at" >= v_since
+       );
+
+    select count(*) into v_checked from _batch_actual;
+
+    select coalesce(jsonb_agg(jsonb_build_object(
+               'batch_id', batch_id,
+               'batch_code', batch_code,
+               'stored', jsonb_build_object(
+                   'out', stored_out, 'sold', stored_sold,
+                   'returned', stored_returned, 'available', stored_available),
+               'actual', jsonb_build_object(
+                   'out', actual_out, 'sold', actual_sold,
+                   'returned', actual_returned,
+                   'available', batch_quantity - actual_out - actual_sold)
+           ) order by batch_id), '[]'::jsonb),
+           count(*)
+    into v_drift, v_drifted
+    from _batch_actual
+    where stored_out <> actual_out
+       or stored_sold <> actual_sold
+       or stored_returned <> actual_returned
+       or stored_available <> batch_quantity - actual_out - actual_sold;
+
+    if p_repair then
+        update "Stock_batches" b set
+            "Out" = a.actual_out,
+            "Sold" = a.actual_sold,
+            "Returned" = a.actual_returned,
+            "Available" = a.batch_quantity - a.actual_out - a.actual_sold,
+            "Updated_at" = now()
+        from _batch_actual a
+        where b."Batch_id" = a.batch_id
+          and (a.stored_out <> a.actual_out
+               or a.stored_sold <> a.actual_sold
+               or a.stored_returned <> a.actual_returned
+               or a.stored_available <> a.batch_quantity - a.actual_out - a.actual_sold);
+
+        insert into batch_reconcile_state (id, last_run_at, last_checked, last_drifted)
+        values (true, v_started, v_checked, v_drifted)
+        on conflict (id) do update set
+            last_run_at = excluded.last_run_at,
+            last_checked = excluded.last_checked,
+            last_drifted = excluded.last_drifted;
+    end if;
+
+    return jsonb_build_object(
+        'checked', v_checked,
+        'drifted', v_drifted,
+        'repaired', case when p_repair then v_drifted else 0 end,
+        'since', v_since,
+        'batches', v_drift
+    );
+end;
+$$;
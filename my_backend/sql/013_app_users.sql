@@ -0,0 +1,21 @@
+-- sql/013_app_users.sql
+--
+-- Backend user accounts for POST /auth/login (routers/auth.py).
+-- password_hash is an argon2id hash produced by the API; plain passwords are
+-- never stored. Emails are stored lower-cased.
+--
+-- The first account is created on first login from ADMIN_EMAIL /
+-- ADMIN_PASSWORD while the table is empty; more via POST /auth/users.
+
+create table if not exists app_users (
+    user_id bigserial primary key,
+    email text not null,
+    password_hash text not null,
+    role text not null default 'staff',
+    is_active boolean not null default true,
+    created_at timestamptz not null default now(),
+    last_login_at timestamptz
+);
+
+create unique index if not exists app_users_email_key
+    on app_users (lower(email));
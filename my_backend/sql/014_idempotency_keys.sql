@@ -0,0 +1,72 @@
+-- sql/014_idempotency_keys.sql
+--
+-- Shared store for Idempotency-Key handling (app/utils/idempotency.py), so a
+-- retry that lands on another worker still gets the first response instead
+-- of running the mutation again.
+--
+-- idempotency_claim() atomically claims (scope, key) for one request:
+--   claimed   this request runs the handler, then stores the response
+--   done      a response is stored; return it
+--   pending   another request holds the claim and is still running
+--   mismatch  the key was used with a different request body
+-- A claim left without a response for p_stale_seconds (its worker died) is
+-- taken over. Rows expire after p_ttl_seconds.
+
+create table if not exists idempotency_keys (
+    scope text not null,
+    idempotency_key text not null,
+    fingerprint text not null,
+    response jsonb,
+    claimed_at timestamptz not null default now(),
+    completed_at timestamptz,
+    primary key (scope, idempotency_key)
+);
+
+create index if not exists idempotency_keys_claimed_at_idx
+    on idempotency_keys (claimed_at);
+
+create or replace function idempotency_claim(
+    p_scope text,
+    p_key text,
+    p_fingerprint text,
+    p_stale_seconds integer default 120,
+    p_ttl_seconds integer default 86400
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_row idempotency_keys;
+begin
+    delete from idempotency_keys
+    where claimed_at < now() - make_interval(secs => p_ttl_seconds);
+
+    insert into idempotency_keys (scope, idempotency_key, fingerprint)
+    values (p_scope, p_key, p_fingerprint)
+    on conflict (scope, idempotency_key) do nothing;
+
+    if found then
+        return jsonb_build_object('state', 'claimed');
+    end if;
+
+    select * into v_row
+    from idempotency_keys
+    where scope = p_scope and idempotency_key = p_key
+    for update;
+
+    if v_row.fingerprint <> p_fingerprint then
+        return jsonb_build_object('state', 'mismatch');
+    end if;
+
+    if v_row.completed_at is not null then
+        return jsonb_build_object('state', 'done', 'response', v_row.response);
+    end if;
+
+    if v_row.claimed_at < now() - make_interval(secs => p_stale_seconds) then
+        update idempotency_keys set claimed_at = now()
+        where scope = p_scope and idempotency_key = p_key;
+        return jsonb_build_object('state', 'claimed');
+    end if;
+
+    return jsonb_build_object('state', 'pending');
+end;
+$$;
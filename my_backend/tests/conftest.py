@@ -0,0 +1,13 @@
+# tests/conftest.py
+#
+# Run from my_backend/:  python -m pytest -q
+# No test talks to Supabase; modules that would are given fakes.
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# A fixed secret so tokens verify the same way in every test
+os.environ.setdefault("JWT_SECRET", "test-secret-that-is-at-least-32-bytes-long")
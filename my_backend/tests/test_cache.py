@@ -0,0 +1,87 @@
+import threading
+import time
+
+from app.utils.cache import AggregateCache
+
+
+def test_hit_is_served_without_recomputing():
+    cache = AggregateCache(ttl_seconds=60)
+    calls = []
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "v") == "v"
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "w") == "v"
+    assert len(calls) == 1
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = AggregateCache(ttl_seconds=60)
+    calls = []
+    gate = threading.Event()
+
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return "v"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join(5)
+
+    assert results == ["v"] * 8
+    assert len(calls) == 1
+
+
+def test_hit_on_another_key_does_not_wait_for_a_computation():
+    cache = AggregateCache(ttl_seconds=60)
+    cache.get_or_compute("warm", lambda: "w")
+    gate = threading.Event()
+    worker = threading.Thread(target=lambda: cache.get_or_compute("cold", lambda: gate.wait(5)))
+    worker.start()
+
+    started = time.monotonic()
+    assert cache.get_or_compute("warm", lambda: "x") == "w"
+    assert time.monotonic() - started < 1
+    gate.set()
+    worker.join(5)
+
+
+def test_waiters_get_the_leaders_error_and_nothing_is_stored():
+    cache = AggregateCache(ttl_seconds=60)
+    gate = threading.Event()
+    errors = []
+
+    def fail():
+        gate.wait(5)
+        raise RuntimeError("boom")
+
+    def call():
+        try:
+            cache.get_or_compute("k", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(errors) == 3
+    assert cache.get_or_compute("k", lambda: "ok") == "ok"
+
+
+def test_value_computed_across_an_invalidation_is_not_stored():
+    cache = AggregateCache(ttl_seconds=60)
+
+    def compute():
+        cache.invalidate()
+        return "stale"
+
+    assert cache.get_or_compute("k", compute) == "stale"
+    assert cache.get_or_compute("k", lambda: "fresh") == "fresh"
@@ -0,0 +1,72 @@
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils import data_version, etag
+
+
+@pytest.fixture
+def client():
+    calls = []
+    router = APIRouter()
+
+    @router.get("/items", dependencies=[etag.versioned("Products")])
+    def items(category: str = "all"):
+        calls.append(category)
+        return {"category": category}
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    client.calls = calls
+    return client
+
+
+def test_matching_if_none_match_gets_304_without_running_handler(client):
+    first = client.get("/items")
+    tag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    second = client.get("/items", headers={"If-None-Match": tag})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == tag
+    assert client.calls == ["all"]
+
+
+def test_weak_and_listed_tags_match(client):
+    tag = client.get("/items").headers["ETag"]
+    res = client.get("/items", headers={"If-None-Match": f'"other", W/{tag}'})
+    assert res.status_code == 304
+
+
+def test_write_to_a_tracked_table_changes_the_tag(client):
+    tag = client.get("/items").headers["ETag"]
+    data_version.bump("Products")
+    res = client.get("/items", headers={"If-None-Match": tag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != tag
+
+
+def test_untracked_table_does_not_change_the_tag(client):
+    tag = client.get("/items").headers["ETag"]
+    data_version.bump("Clients")
+    assert client.get("/items", headers={"If-None-Match": tag}).status_code == 304
+
+
+def test_query_string_is_part_of_the_tag(client):
+    assert client.get("/items?category=a").headers["ETag"] != client.get("/items?category=b").headers["ETag"]
+
+
+def test_tag_rolls_over_with_max_age(client, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(etag.time, "time", lambda: clock[0])
+    tag = client.get("/items").headers["ETag"]
+    clock[0] += etag.MAX_AGE_SECONDS
+    assert client.get("/items").headers["ETag"] != tag
+
+
+def test_new_deploy_changes_the_tag(client, monkeypatch):
+    tag = client.get("/items").headers["ETag"]
+    monkeypatch.setattr(etag, "DEPLOY_ID", "next-release")
+    assert client.get("/items", headers={"If-None-Match": tag}).status_code == 200
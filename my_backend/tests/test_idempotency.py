@@ -0,0 +1,98 @@
+import pytest
+from fastapi import HTTPException
+
+from app.utils import idempotency
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """In-memory stand-in for the idempotency_keys table and idempotency_claim()."""
+    rows = {}
+
+    def claim(scope, key, fingerprint):
+        row = rows.get((scope, key))
+        if row is None:
+            rows[(scope, key)] = {"fingerprint": fingerprint, "response": None, "done": False}
+            return {"state": "claimed"}
+        if row["fingerprint"] != fingerprint:
+            return {"state": "mismatch"}
+        if row["done"]:
+            return {"state": "done", "response": row["response"]}
+        return {"state": "pending"}
+
+    def complete(scope, key, response):
+        rows[(scope, key)].update(response=response, done=True)
+
+    def release(scope, key):
+        if not rows[(scope, key)]["done"]:
+            del rows[(scope, key)]
+
+    monkeypatch.setattr(idempotency, "_claim", claim)
+    monkeypatch.setattr(idempotency, "_complete", complete)
+    monkeypatch.setattr(idempotency, "_release", release)
+    return rows
+
+
+def test_without_key_always_runs_handler(store):
+    calls = []
+    for _ in range(2):
+        idempotency.run(None, "po", {"a": 1}, lambda: calls.append(1) or "ok")
+    assert len(calls) == 2
+    assert store == {}
+
+
+def test_retry_returns_stored_response_without_rerunning(store):
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return {"po_id": 7}
+
+    first = idempotency.run("k1", "po", {"a": 1}, handler)
+    second = idempotency.run("k1", "po", {"a": 1}, handler)
+
+    assert first == second == {"po_id": 7}
+    assert len(calls) == 1
+
+
+def test_same_key_in_another_scope_runs_again(store):
+    calls = []
+    idempotency.run("k1", "create", {"a": 1}, lambda: calls.append(1))
+    idempotency.run("k1", "update:7", {"a": 1}, lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_key_reused_for_different_body_is_rejected(store):
+    idempotency.run("k1", "po", {"a": 1}, lambda: "ok")
+    with pytest.raises(HTTPException) as exc:
+        idempotency.run("k1", "po", {"a": 2}, lambda: "ok")
+    assert exc.value.status_code == 422
+
+
+def test_failed_attempt_is_released_and_can_be_retried(store):
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        idempotency.run("k1", "po", {"a": 1}, fail)
+    assert store == {}
+
+    assert idempotency.run("k1", "po", {"a": 1}, lambda: "ok") == "ok"
+
+
+def test_in_progress_elsewhere_gives_409_after_waiting(store, monkeypatch):
+    monkeypatch.setattr(idempotency, "WAIT_SECONDS", 0)
+    store[("po", "k1")] = {"fingerprint": idempotency._fingerprint({"a": 1}), "response": None, "done": False}
+
+    with pytest.raises(HTTPException) as exc:
+        idempotency.run("k1", "po", {"a": 1}, lambda: "ok")
+    assert exc.value.status_code == 409
+    assert exc.value.headers["Retry-After"] == "1"
+
+
+def test_store_failure_still_returns_the_response(store, monkeypatch):
+    def broken(scope, key, response):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(idempotency, "_complete", broken)
+    assert idempotency.run("k1", "po", {"a": 1}, lambda: "ok") == "ok"
@@ -0,0 +1,51 @@
+import socket
+import threading
+import time
+
+from app.utils import invalidation_bus
+
+
+def test_unix_socket_file_is_named_after_the_origin(tmp_path):
+    transport = invalidation_bus._UnixSocketTransport(tmp_path)
+    host, pid, token = invalidation_bus.ORIGIN.rsplit(":", 2)
+    assert transport.path.name == f"{host[:32]}-{pid}-{token}.sock"
+    assert transport.path.exists()
+
+
+def test_unix_send_reaches_live_peers_and_removes_only_dead_files(tmp_path):
+    transport = invalidation_bus._UnixSocketTransport(tmp_path)
+
+    live = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    live.bind(str(tmp_path / "otherhost-1-aaaaaaaa.sock"))
+    live.settimeout(1)
+    # A crashed worker's file: nothing is bound to it any more
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    dead.bind(str(tmp_path / "otherhost-2-bbbbbbbb.sock"))
+    dead.close()
+
+    transport.send(b"payload")
+
+    assert live.recv(100) == b"payload"
+    assert (tmp_path / "otherhost-1-aaaaaaaa.sock").exists()
+    assert not (tmp_path / "otherhost-2-bbbbbbbb.sock").exists()
+    live.close()
+
+
+def test_postgres_publish_does_not_wait_for_the_database():
+    unblock = threading.Event()
+
+    class StuckTransport(invalidation_bus._PostgresTransport):
+        def _connect(self):
+            unblock.wait(5)
+            raise OSError("unreachable")
+
+    transport = StuckTransport("postgresql://unreachable")
+
+    started = time.monotonic()
+    for _ in range(invalidation_bus.PG_SEND_QUEUE_SIZE + 10):
+        transport.send(b"{}")
+    assert time.monotonic() - started < 1
+    # Drain without printing an error per queued broadcast
+    with transport._queue.mutex:
+        transport._queue.queue.clear()
+    unblock.set()
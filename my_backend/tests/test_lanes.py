@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.utils import lanes
+
+
+@pytest.fixture
+def lane(monkeypatch):
+    """A one-thread lane with room for one waiting request."""
+    lane = lanes._Lane("test", workers=1, max_queue=1, retry_after=7)
+    monkeypatch.setitem(lanes._lanes, "test", lane)
+    yield lane
+    lane.executor.shutdown(wait=False)
+
+
+def test_every_lane_has_a_bounded_queue():
+    assert all(cfg["max_queue"] is not None for cfg in lanes.LANES.values())
+
+
+def test_full_lane_rejects_with_429_and_retry_after(lane):
+    lane.enter()
+    lane.enter()
+    with pytest.raises(HTTPException) as exc:
+        lane.enter()
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "7"
+    assert lane.metrics["rejected"] == 1
+
+
+def test_route_returns_429_when_lane_is_full(lane):
+    router = APIRouter(route_class=lanes.route_class("test"))
+
+    @router.get("/x")
+    def x():
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    assert client.get("/x").status_code == 200
+    lane.active = lane.workers + lane.max_queue
+    res = client.get("/x")
+    assert res.status_code == 429
+    assert res.headers["Retry-After"] == "7"
+
+
+def test_sync_endpoint_runs_on_the_lane_and_records_wait(lane):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return threading.current_thread().name
+
+    run = lanes._in_lane(blocking, lane)
+
+    async def scenario():
+        first = asyncio.ensure_future(run())
+        second = asyncio.ensure_future(run())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        await asyncio.sleep(0.05)
+        assert lane.snapshot()["waiting"] == 1
+        release.set()
+        return await asyncio.gather(first, second)
+
+    names = asyncio.run(scenario())
+
+    assert all(name.startswith("lane-test") for name in names)
+    assert lane.active == 0
+    assert lane.metrics["completed"] == 2
+    # The second request waited for the only thread
+    assert lane.metrics["max_wait_ms"] >= 40
+
+
+def test_failed_endpoint_still_leaves_the_lane(lane):
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(lanes._in_lane(fail, lane)())
+    assert lane.active == 0
+
+
+def test_cancelled_request_keeps_its_slot_until_the_thread_finishes(lane):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+
+    run = lanes._in_lane(blocking, lane)
+
+    async def scenario():
+        task = asyncio.ensure_future(run())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        # Client disconnected: the await is cancelled, the thread is still busy
+        task.cancel()
+        await asyncio.sleep(0.05)
+        still_active = lane.active
+        release.set()
+        await asyncio.get_running_loop().run_in_executor(None, lane.executor.submit(lambda: None).result)
+        await asyncio.sleep(0.05)
+        return still_active
+
+    assert asyncio.run(scenario()) == 1
+    assert lane.active == 0
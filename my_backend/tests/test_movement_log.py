@@ -0,0 +1,136 @@
+import json
+import os
+
+import pytest
+
+from app.utils import movement_log
+
+
+class FakeTable:
+    def __init__(self, db):
+        self.db = db
+
+    def upsert(self, rows, **kwargs):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        if self.db.fail:
+            raise RuntimeError("db down")
+        for row in self.rows:
+            self.db.rows.setdefault(row["log_id"], row)
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.rows = {}
+        self.fail = False
+
+    def table(self, name):
+        assert name == "Stock_movement"
+        return FakeTable(self)
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    """Fresh write-behind state with its journal under tmp_path."""
+    monkeypatch.setattr(movement_log, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(movement_log, "LEGACY_JOURNAL_PATH", tmp_path / "stock_movement_journal.jsonl")
+    monkeypatch.setattr(movement_log, "WRITE_BEHIND", True)
+    monkeypatch.setattr(movement_log, "_pending", [])
+    monkeypatch.setattr(movement_log, "_pending_since", [])
+    monkeypatch.setattr(movement_log, "_sealed", [])
+    monkeypatch.setattr(movement_log, "_segment", None)
+    monkeypatch.setattr(movement_log, "_segment_path", None)
+    monkeypatch.setattr(movement_log, "_metrics", dict(movement_log._metrics, recovered=0, flushed=0))
+    # No background flusher; tests flush explicitly
+    monkeypatch.setattr(movement_log, "_ensure_worker", lambda: None)
+    db = FakeSupabase()
+    monkeypatch.setattr(movement_log, "supabase", db)
+    return db
+
+
+def _write_segment(path, rows, torn_tail=False):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    text = "".join(json.dumps(r) + "\n" for r in rows)
+    if torn_tail:
+        text += '{"log_id": "half'
+    path.write_text(text, encoding="utf-8")
+
+
+def test_log_is_journaled_before_it_returns(journal):
+    movement_log.log({"Stock_id": "S1", "Movement_type": "Sold"})
+
+    segments = list(movement_log.JOURNAL_DIR.glob("*.jsonl"))
+    assert len(segments) == 1
+    rows = movement_log._read_segment(segments[0])
+    assert rows[0]["Stock_id"] == "S1" and rows[0]["log_id"]
+    assert journal.rows == {}
+
+
+def test_flush_writes_rows_and_removes_segments(journal):
+    movement_log.log({"Stock_id": "S1"})
+    movement_log.log({"Stock_id": "S2"})
+
+    assert movement_log.flush() == 2
+    assert sorted(r["Stock_id"] for r in journal.rows.values()) == ["S1", "S2"]
+    assert list(movement_log.JOURNAL_DIR.glob("*.jsonl")) == []
+    assert movement_log.get_metrics()["pending"] == 0
+
+
+def test_failed_flush_keeps_rows_and_journal(journal):
+    movement_log.log({"Stock_id": "S1"})
+    journal.fail = True
+
+    assert movement_log.flush() == 0
+    assert movement_log.get_metrics()["pending"] == 1
+    assert len(list(movement_log.JOURNAL_DIR.glob("*.jsonl"))) == 1
+
+    journal.fail = False
+    assert movement_log.flush() == 1
+    assert list(movement_log.JOURNAL_DIR.glob("*.jsonl")) == []
+
+
+def test_recover_adopts_segments_of_dead_workers(journal):
+    # pid 0x7fffffff does not exist; the torn last line was never acknowledged
+    orphan = movement_log.JOURNAL_DIR / "2147483647-deadbeef-1.jsonl"
+    _write_segment(orphan, [{"log_id": "a", "Stock_id": "S1"}, {"log_id": "b", "Stock_id": "S2"}], torn_tail=True)
+
+    movement_log._recover()
+
+    assert not orphan.exists()
+    assert movement_log.get_metrics()["recovered"] == 2
+    assert movement_log.flush() == 2
+    assert set(journal.rows) == {"a", "b"}
+    assert list(movement_log.JOURNAL_DIR.glob("*.jsonl")) == []
+
+
+def test_recover_leaves_live_workers_segments_alone(journal):
+    live = movement_log.JOURNAL_DIR / f"{os.getpid()}-otherwkr-1.jsonl"
+    _write_segment(live, [{"log_id": "a", "Stock_id": "S1"}])
+
+    movement_log._recover()
+
+    assert live.exists()
+    assert movement_log.get_metrics()["pending"] == 0
+
+
+def test_recover_adopts_the_legacy_journal(journal):
+    _write_segment(movement_log.LEGACY_JOURNAL_PATH, [{"log_id": "a", "Stock_id": "S1"}])
+
+    movement_log._recover()
+
+    assert not movement_log.LEGACY_JOURNAL_PATH.exists()
+    assert movement_log.flush() == 1
+    assert set(journal.rows) == {"a"}
+
+
+def test_resending_flushed_rows_does_not_duplicate(journal):
+    # A worker that died after the insert but before deleting its segment
+    journal.rows["a"] = {"log_id": "a", "Stock_id": "S1"}
+    _write_segment(movement_log.JOURNAL_DIR / "2147483647-deadbeef-1.jsonl", [{"log_id": "a", "Stock_id": "S1"}])
+
+    movement_log._recover()
+    movement_log.flush()
+
+    assert list(journal.rows) == ["a"]
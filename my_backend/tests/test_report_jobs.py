@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import report_jobs
+
+
+@pytest.fixture
+def jobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_jobs, "JOBS_DIR", tmp_path)
+    monkeypatch.setattr(report_jobs, "_queued", 0)
+    return tmp_path
+
+
+def _wait_done(job_id):
+    for _ in range(200):
+        job = report_jobs.get_job(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_identical_submissions_share_one_job(jobs_dir):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [{"a": 1}]
+
+    first = report_jobs.submit("sales", {}, compute, data_version=(1, 2))
+    second = report_jobs.submit("sales", {}, compute, data_version=(1, 2))
+
+    assert first["job_id"] == second["job_id"]
+    assert _wait_done(first["job_id"])["rows"] == 1
+    assert report_jobs.submit("sales", {}, compute, data_version=(1, 2))["job_id"] == first["job_id"]
+    assert len(calls) == 1
+
+
+def test_new_data_version_or_params_gets_a_new_job(jobs_dir):
+    base = report_jobs.submit("movement", {}, lambda: [], data_version=(1,))
+    assert report_jobs.submit("movement", {}, lambda: [], data_version=(2,))["job_id"] != base["job_id"]
+    assert report_jobs.submit("movement", {"full_history": True}, lambda: [], data_version=(1,))["job_id"] != base["job_id"]
+
+
+def test_job_ids_differ_across_processes(jobs_dir, monkeypatch):
+    # A restarted worker starts its data versions at 0 again
+    before = report_jobs.submit("sales", {}, lambda: [], data_version=(0,))
+    monkeypatch.setattr(report_jobs, "_PROCESS_EPOCH", "restarted")
+    after = report_jobs.submit("sales", {}, lambda: [], data_version=(0,))
+    assert before["job_id"] != after["job_id"]
+
+
+def test_job_ids_roll_over_with_the_dedup_window(jobs_dir, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(report_jobs.time, "time", lambda: clock[0])
+    first = report_jobs.submit("sales", {}, lambda: [], data_version=(0,))
+    clock[0] += report_jobs.DEDUP_WINDOW_SECONDS
+    assert report_jobs.submit("sales", {}, lambda: [], data_version=(0,))["job_id"] != first["job_id"]
+
+
+def test_failed_job_is_not_reused(jobs_dir):
+    def fail():
+        raise RuntimeError("boom")
+
+    job = report_jobs.submit("sales", {}, fail)
+    assert _wait_done(job["job_id"])["status"] == "failed"
+
+    retry = report_jobs.submit("sales", {}, lambda: [])
+    assert retry["job_id"] == job["job_id"]
+    assert _wait_done(retry["job_id"])["status"] == "done"
+
+
+def test_full_queue_rejects_with_429(jobs_dir, monkeypatch):
+    monkeypatch.setattr(report_jobs, "_queued", report_jobs.MAX_QUEUED)
+    with pytest.raises(HTTPException) as exc:
+        report_jobs.submit("sales", {}, lambda: [])
+    assert exc.value.status_code == 429
@@ -0,0 +1,69 @@
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from app.utils import security
+
+USER = {"user_id": 1, "email": "staff@example.com", "role": "staff"}
+
+
+def test_valid_token_returns_its_claims():
+    claims = security.verify_token(security.create_access_token(USER))
+    assert claims["sub"] == "1"
+    assert claims["email"] == USER["email"]
+    assert claims["role"] == "staff"
+
+
+@pytest.mark.parametrize("token", [
+    "not-a-jwt",
+    jwt.encode({"sub": "1", "exp": int(time.time()) + 60}, "some-other-secret-of-32-bytes-length", algorithm="HS256"),
+    jwt.encode({"sub": "1", "exp": int(time.time()) - 1}, security._secret, algorithm="HS256"),
+    jwt.encode({"sub": "1"}, security._secret, algorithm="HS256"),
+])
+def test_invalid_tokens_are_rejected(token):
+    with pytest.raises(HTTPException) as exc:
+        security.verify_token(token)
+    assert exc.value.status_code == 401
+
+
+def test_cached_token_is_rejected_once_expired(monkeypatch):
+    monkeypatch.setattr(security, "ACCESS_TOKEN_TTL_SECONDS", 1)
+    token = security.create_access_token(USER)
+    security.verify_token(token)  # now in the verified-token cache
+    time.sleep(1.1)
+    with pytest.raises(HTTPException):
+        security.verify_token(token)
+
+
+def test_missing_bearer_is_401():
+    with pytest.raises(HTTPException) as exc:
+        security.get_current_user(None)
+    assert exc.value.status_code == 401
+
+
+def test_require_admin():
+    assert security.require_admin({"role": "admin"})["role"] == "admin"
+    with pytest.raises(HTTPException) as exc:
+        security.require_admin({"role": "staff"})
+    assert exc.value.status_code == 403
+
+
+def test_stream_ticket_is_not_a_login_token_and_vice_versa():
+    token = security.create_access_token(USER)
+    ticket = security.create_stream_ticket(security.verify_token(token))
+
+    assert security.verify_stream_ticket(ticket)["sub"] == "1"
+    with pytest.raises(HTTPException):
+        security.verify_token(ticket)
+    with pytest.raises(HTTPException):
+        security.verify_stream_ticket(token)
+
+
+def test_password_verification():
+    stored = security.hash_password("correct horse")
+    assert security.verify_password(stored, "correct horse")
+    assert not security.verify_password(stored, "wrong")
+    # Unknown account: same work, always False
+    assert not security.verify_password(None, "correct horse")
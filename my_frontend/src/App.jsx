@@ -24,10 +24,10 @@ import Reports from "./pages/Reports";
 import Deliverystockscanpage from "./pages/Deliverystockscanpage";
 import Deliverylist from "./pages/Deliverylist";
 import ReturnsPage from "./pages/ReturnsPage";  // <-- create this file
+import { isTokenValid } from "./services/apiAuth";
 
 const ProtectedRoute = ({ children }) => {
-  const token = sessionStorage.getItem("token");
-  if (token !== "admin-logged-in") {
+  if (!isTokenValid()) {
     return <Navigate to="/login" replace />;
   }
   return children;
@@ -3,6 +3,9 @@ import ReactDOM from 'react-dom/client';
 import { BrowserRouter } from 'react-router-dom';
 import App from './App';
 import './styles/global.css';
+import { installAuthFetch } from './services/apiAuth';
+
+installAuthFetch();
 
 ReactDOM.createRoot(document.getElementById('root')).render(
   <React.StrictMode>
@@ -17,8 +17,11 @@ import {
 } from "lucide-react";
 import "../styles/home.css";
 import { categoryColor, metricColor } from "../styles/colorTokens";
+import { subscribeStockEvents } from "../services/stockEvents";
 
 const API_BASE = import.meta.env.VITE_API_BASE || "http://127.0.0.1:8000";
+// Live stock events reload the dashboard at most this often
+const DASHBOARD_RELOAD_MS = 20000;
 
 /* ---------------- CHART HELPERS ---------------- */
 const formatNumber = (value) => Number(value || 0).toLocaleString("en-IN");
@@ -361,6 +364,26 @@ export default function Home() {
       }
     }
     loadDashboard();
+
+    // Live updates: reload when stock moves anywhere, at most once per
+    // DASHBOARD_RELOAD_MS; events in between are coalesced into that reload.
+    // The jitter keeps open dashboards from all reloading at the same moment.
+    let reloadTimer = null;
+    let lastReload = Date.now();
+    const unsubscribe = subscribeStockEvents(null, () => {
+      if (reloadTimer) return;
+      const wait = Math.max(1000, lastReload + DASHBOARD_RELOAD_MS - Date.now());
+      reloadTimer = setTimeout(() => {
+        reloadTimer = null;
+        lastReload = Date.now();
+        loadDashboard();
+      }, wait + Math.random() * 2000);
+    });
+
+    return () => {
+      clearTimeout(reloadTimer);
+      unsubscribe();
+    };
   }, []);
 
   const stockStatusLegend = useMemo(() => {
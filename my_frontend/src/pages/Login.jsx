@@ -4,6 +4,8 @@ import { FcGoogle } from "react-icons/fc";
 import { useState } from "react";
 import { supabase } from "../supabaseClient";
 
+const API_BASE = import.meta.env.VITE_API_BASE || "http://127.0.0.1:8000";
+
 export default function Login() {
   const navigate = useNavigate();
 
@@ -20,7 +22,7 @@ export default function Login() {
     }
 
     try {
-      const response = await fetch("http://localhost:8000/auth/login", {
+      const response = await fetch(`${API_BASE}/auth/login`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ email, password }),
@@ -155,6 +155,8 @@ const ReportCard = ({
   dateTo,
   dateKeys = [],
   onDateChange,
+  fullHistory = false,
+  onFullHistoryChange,
 }) => {
   const [page, setPage] = useState(1);
   const [pageWindowStart, setPageWindowStart] = useState(1);
@@ -267,6 +269,16 @@ const ReportCard = ({
               </button>
             ) : null}
           </div>
+          {onFullHistoryChange && (
+            <label className="report-history-toggle">
+              <input
+                type="checkbox"
+                checked={fullHistory}
+                onChange={(e) => onFullHistoryChange(e.target.checked)}
+              />
+              Include archived months
+            </label>
+          )}
           {dateKeys.length > 0 && (
             <div className="date-row">
               <input
@@ -402,6 +414,8 @@ export default function Reports() {
   const [searchTerm, setSearchTerm] = useState("");
   const [dateFrom, setDateFrom] = useState("");
   const [dateTo, setDateTo] = useState("");
+  // Movement history defaults to the hot months; archived months are opt-in
+  const [fullHistory, setFullHistory] = useState(false);
   const location = useLocation();
 
   useEffect(() => {
@@ -447,17 +461,18 @@ export default function Reports() {
   };
 
   useEffect(() => {
-    // Stock summary for category & sold charts
-    fetchStockSummaryData();
-
-    // ✅ Low stock MUST be loaded globally for Quick Stats
-    fetch(`${API_BASE}/reports/low-stock`)
+    // Stock summary for category & sold charts, and low stock (MUST be loaded
+    // globally for Quick Stats), in one bundled request
+    fetch(`${API_BASE}/reports/bundle?types=stock-summary,low-stock`)
       .then((res) => {
-        if (!res.ok) throw new Error("Failed to load low stock");
+        if (!res.ok) throw new Error("Failed to load stock summary / low stock");
         return res.json();
       })
-      .then((data) => setLowStockAlerts(data))
-      .catch((err) => console.error("Low stock error:", err));
+      .then((data) => {
+        setStockSummary(data["stock-summary"]);
+        setLowStockAlerts(data["low-stock"]);
+      })
+      .catch((err) => console.error("Stock summary / low stock error:", err));
   }, []);
 
 
@@ -677,14 +692,11 @@ export default function Reports() {
       // LOW STOCK ALERTS
 
       if (activeReport === "batch-wise") {
-        const res = await fetch(`${API_BASE}/reports/batch-wise`);
+        // Item-wise data is preloaded alongside to power the batch detail modal
+        const res = await fetch(`${API_BASE}/reports/bundle?types=batch-wise,item-wise`);
         const data = await res.json();
-        setBatchWiseStock(data);
-
-        // Preload item-wise data to power batch detail modal
-        const itemRes = await fetch(`${API_BASE}/reports/item-wise`);
-        const itemData = await itemRes.json();
-        setItemWiseStock(itemData);
+        setBatchWiseStock(data["batch-wise"]);
+        setItemWiseStock(data["item-wise"]);
       }
       if (activeReport === "item-wise") {
         const res = await fetch(`${API_BASE}/reports/item-wise`);
@@ -702,7 +714,9 @@ export default function Reports() {
         setReturnsReport(data);
       }
       if (activeReport === "movement") {
-        const res = await fetch(`${API_BASE}/reports/movement`);
+        const res = await fetch(
+          `${API_BASE}/reports/movement${fullHistory ? "?full_history=true" : ""}`
+        );
         const data = await res.json();
         setMovementHistory(data);
       }
@@ -721,7 +735,7 @@ export default function Reports() {
     }
 
     loadReport();
-  }, [activeReport]);
+  }, [activeReport, fullHistory]);
 
   const openBatchDetails = (batchCode) => {
     if (!batchCode) return;
@@ -950,13 +964,15 @@ export default function Reports() {
       key: "movement",
       label: "Movement",
       title: "MOVEMENT HISTORY REPORT",
-      description: "Scan trail with movement type, user, and undo notes.",
+      description:
+        "Scan trail with movement type, user, and undo notes. Recent months by default; include archived months for older scans.",
       columns: movementColumns,
       rows: movementHistory,
       filename: "movement-history",
       stockFilter: false,
       disableStockFilter: true,
       dateKeys: ["scanDate"],
+      historyToggle: true,
     },
 
     {
@@ -1150,6 +1166,8 @@ export default function Reports() {
           setDateFrom(from);
           setDateTo(to);
         }}
+        fullHistory={fullHistory}
+        onFullHistoryChange={selectedReport.historyToggle ? setFullHistory : undefined}
       />
 
       {batchDetail && (
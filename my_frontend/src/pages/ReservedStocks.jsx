@@ -3,6 +3,7 @@ import React, { useMemo, useState, useEffect } from "react";
 import "../styles/manageStock.css";
 import CategoryPills from "../components/CategoryPills";
 import RowActionsMenu from "../components/RowActionsMenu";
+import { subscribeStockEvents } from "../services/stockEvents";
 // import { supabase } from "../supabaseClient"; // REMOVED
 // import { clearReservedSale } from "../services/stockActions"; // REMOVED
 
@@ -30,7 +31,13 @@ export default function ReservedStocks() {
     const handler = () => loadAllData();
     window.addEventListener("stock-updated", handler);
 
-    return () => window.removeEventListener("stock-updated", handler);
+    // Reload when another device marks out / sells / returns in this category
+    const unsubscribe = subscribeStockEvents([activeTab], handler);
+
+    return () => {
+      window.removeEventListener("stock-updated", handler);
+      unsubscribe();
+    };
   }, [activeTab]);
 
   async function loadAllData() {
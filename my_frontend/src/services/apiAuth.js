@@ -0,0 +1,51 @@
+// src/services/apiAuth.js
+
+/* -----------------------------------------------------------
+    Attach the login token to every backend request
+----------------------------------------------------------- */
+const BACKEND_ORIGINS = [
+  import.meta.env.VITE_API_BASE,
+  "http://127.0.0.1:8000",
+  "http://localhost:8000",
+].filter(Boolean);
+
+export function getToken() {
+  return sessionStorage.getItem("token");
+}
+
+// JWT payload is base64url JSON; only used to skip obviously expired tokens
+export function isTokenValid(token = getToken()) {
+  if (!token) return false;
+  try {
+    const payload = JSON.parse(
+      atob(token.split(".")[1].replace(/-/g, "+").replace(/_/g, "/"))
+    );
+    return !payload.exp || payload.exp * 1000 > Date.now();
+  } catch {
+    return false;
+  }
+}
+
+export function installAuthFetch() {
+  const originalFetch = window.fetch.bind(window);
+
+  window.fetch = (input, init = {}) => {
+    const url = typeof input === "string" ? input : input.url;
+    const token = getToken();
+
+    if (token && BACKEND_ORIGINS.some((origin) => url.startsWith(origin))) {
+      const headers = new Headers(init.headers || (typeof input === "string" ? {} : input.headers));
+      if (!headers.has("Authorization")) {
+        headers.set("Authorization", `Bearer ${token}`);
+      }
+      return originalFetch(input, { ...init, headers }).then((res) => {
+        if (res.status === 401) {
+          sessionStorage.removeItem("token");
+        }
+        return res;
+      });
+    }
+
+    return originalFetch(input, init);
+  };
+}
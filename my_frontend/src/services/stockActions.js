@@ -102,6 +102,7 @@ async function addToReturnList(stockId, reason, tag, overrideDo = null) {
   Product_name,
   Size,
   Batch_code,
+  Category,
   Client_id,
   Delivery_order_no,
   Po_item_id,
@@ -130,6 +131,7 @@ const payload = {
   size: prod.Size,
   colour,                 // ✅ NOW STORED
   batch_code: prod.Batch_code,
+  category: prod.Category,
   client_id: prod.Client_id,
   client_name: prod.Clients?.Client_name || null,
   do_number: overrideDo ?? prod.Delivery_order_no,
@@ -0,0 +1,65 @@
+// src/services/stockEvents.js
+const API_BASE = import.meta.env.VITE_API_BASE || "http://127.0.0.1:8000";
+const EVENT_TYPES = ["mark_out", "sale", "return", "undo", "sync", "resync"];
+// Wait before reopening a stream the browser gave up on (e.g. expired ticket)
+const REOPEN_MS = 5000;
+
+// The login token never goes in the URL: it is exchanged (as a header, see
+// apiAuth.js) for a short-lived ticket that only opens the event stream
+async function fetchTicket() {
+  const res = await fetch(`${API_BASE}/events/ticket`, { method: "POST" });
+  if (!res.ok) throw new Error("Failed to get a stream ticket");
+  return (await res.json()).ticket;
+}
+
+/* -----------------------------------------------------------
+    Live stock events (server-sent events)
+    onEvent(event) is called for every mark_out / sale / return / undo
+    in the given categories (all categories when none are given).
+    "sync" / "resync" mean: reload everything.
+    Returns an unsubscribe function.
+----------------------------------------------------------- */
+export function subscribeStockEvents(categories, onEvent) {
+  let source = null;
+  let reopenTimer = null;
+  let closed = false;
+
+  const handler = (e) => {
+    try {
+      onEvent(JSON.parse(e.data));
+    } catch (err) {
+      console.error("Stock event error:", err);
+    }
+  };
+
+  async function open() {
+    const params = new URLSearchParams();
+    if (categories && categories.length) params.set("categories", categories.join(","));
+    try {
+      const ticket = await fetchTicket();
+      if (ticket) params.set("ticket", ticket);
+    } catch (err) {
+      console.error("Stock event error:", err);
+      reopenTimer = setTimeout(open, REOPEN_MS);
+      return;
+    }
+    if (closed) return;
+
+    source = new EventSource(`${API_BASE}/events/stock?${params}`);
+    EVENT_TYPES.forEach((type) => source.addEventListener(type, handler));
+    source.onerror = () => {
+      // Network blips are retried by the browser; a rejected ticket closes the stream
+      if (source.readyState !== EventSource.CLOSED || closed) return;
+      reopenTimer = setTimeout(open, REOPEN_MS);
+      // Events may have been missed while disconnected
+      handler({ data: JSON.stringify({ type: "resync", at: Date.now() / 1000 }) });
+    };
+  }
+  open();
+
+  return () => {
+    closed = true;
+    clearTimeout(reopenTimer);
+    if (source) source.close();
+  };
+}